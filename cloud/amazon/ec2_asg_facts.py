@@ -205,6 +205,13 @@ try:
 except ImportError:
     HAS_BOTO3 = False
 
+from multiprocessing.pool import ThreadPool
+
+# DescribeAutoScalingGroups accepts at most this many names per call
+ASG_NAMES_PER_CALL = 50
+# Number of DescribeAutoScalingGroups calls made at the same time
+DESCRIBE_THREADS = 4
+
 def match_asg_tags(tags_to_match, asg):
     for key, value in tags_to_match.iteritems():
         for tag in asg['Tags']:
@@ -298,7 +305,18 @@ def find_asgs(conn, module, name=None, tags=None):
     """
 
     try:
-        asgs = conn.describe_auto_scaling_groups()
+        if tags:
+            # let DescribeTags find the groups, only those are described
+            asg_names = find_asg_names_by_tags(conn, tags)
+            if name is not None:
+                name_prog = re.compile(r'^' + name)
+                asg_names = [x for x in asg_names if name_prog.search(x)]
+            asgs = describe_asgs(conn, asg_names)
+        elif name is not None and re.match(r'^[\w\-.]+\$$', name):
+            # a complete name match
+            asgs = describe_asgs(conn, [name[:-1]])
+        else:
+            asgs = describe_asgs(conn)
     except ClientError as e:
         module.fail_json(msg=e.message, **camel_dict_to_snake_dict(e.response))
 
@@ -308,7 +326,7 @@ def find_asgs(conn, module, name=None, tags=None):
         # if the user didn't specify a name
         name_prog = re.compile(r'^' + name)
 
-    for asg in asgs['AutoScalingGroups']:
+    for asg in asgs:
         if name:
             matched_name = name_prog.search(asg['AutoScalingGroupName'])
         else:
@@ -325,6 +343,61 @@ def find_asgs(conn, module, name=None, tags=None):
     return matched_asgs
 
 
+def find_asg_names_by_tags(conn, tags):
+    """
+    Return the sorted names of the auto scaling groups carrying all of the
+    tags, with one paginated DescribeTags query per tag.
+    """
+    names = None
+    paginator = conn.get_paginator('describe_tags')
+    for key, value in tags.items():
+        tagged = set()
+        filters = [{'Name': 'key', 'Values': [key]}, {'Name': 'value', 'Values': [value]}]
+        for page in paginator.paginate(Filters=filters):
+            for tag in page['Tags']:
+                if tag['ResourceType'] == 'auto-scaling-group':
+                    tagged.add(tag['ResourceId'])
+        if names is None:
+            names = tagged
+        else:
+            names &= tagged
+    return sorted(names or [])
+
+
+def describe_asgs(conn, names=None):
+    """
+    Describe all auto scaling groups, following every page, or only the
+    named ones, in batches of ASG_NAMES_PER_CALL described concurrently.
+    """
+    paginator = conn.get_paginator('describe_auto_scaling_groups')
+
+    def describe(batch):
+        asgs = []
+        kwargs = {}
+        if batch is not None:
+            kwargs['AutoScalingGroupNames'] = batch
+        for page in paginator.paginate(**kwargs):
+            asgs.extend(page['AutoScalingGroups'])
+        return asgs
+
+    if names is None:
+        return describe(None)
+    if not names:
+        return []
+
+    batches = [names[i:i + ASG_NAMES_PER_CALL] for i in range(0, len(names), ASG_NAMES_PER_CALL)]
+    if len(batches) == 1:
+        return describe(batches[0])
+
+    pool = ThreadPool(min(DESCRIBE_THREADS, len(batches)))
+    try:
+        pages = pool.map(describe, batches)
+    finally:
+        pool.close()
+        pool.join()
+    return [asg for page in pages for asg in page]
+
+
 def main():
 
     argument_spec = ec2_argument_spec()
@@ -82,10 +82,44 @@ try:
     import boto.ec2.elb
     from boto.ec2.tag import Tag
     from boto.exception import BotoServerError
+    from boto.resultset import ResultSet
     HAS_BOTO = True
 except ImportError:
     HAS_BOTO = False
 
+import threading
+from multiprocessing.pool import ThreadPool
+
+# DescribeTags accepts at most this many load balancer names per call
+TAG_NAMES_PER_CALL = 20
+# Number of ELBs whose tags and instance health are fetched at the same time
+ELB_INFO_THREADS = 4
+
+
+class ElbTagDescription(object):
+    """ One member of a DescribeTags response: a load balancer name and its tags """
+
+    def __init__(self, connection=None):
+        self.load_balancer_name = None
+        self.tag_set = []
+
+    @property
+    def tags(self):
+        return dict((tag.Key, getattr(tag, 'Value', '')) for tag in self.tag_set if hasattr(tag, 'Key'))
+
+    def startElement(self, name, attrs, connection):
+        if name == 'Tags':
+            # the tags are members too, they need a result set of their own
+            # or the first nested </member> would end this description
+            self.tag_set = ResultSet([('member', Tag)])
+            return self.tag_set
+        return None
+
+    def endElement(self, name, value, connection):
+        if name == 'LoadBalancerName':
+            self.load_balancer_name = value
+
+
 class ElbInformation(object):
     """ Handles ELB information """
 
@@ -99,13 +133,24 @@ class ElbInformation(object):
         self.names = names
         self.region = region
         self.aws_connect_params = aws_connect_params
-        self.connection = self._get_elb_connection()
-
-    def _get_tags(self, elbname):
-        params = {'LoadBalancerNames.member.1': elbname}
+        # boto connections are not thread safe, every thread gets its own
+        self._local = threading.local()
+        self._local.connection = self._get_elb_connection()
+
+    @property
+    def connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = self._get_elb_connection()
+        return self._local.connection
+
+    def _get_tags(self, elbnames):
+        """ Return the tags of up to TAG_NAMES_PER_CALL ELBs by name """
+        params = {}
+        for i, elbname in enumerate(elbnames):
+            params['LoadBalancerNames.member.%d' % (i + 1)] = elbname
         try:
-            elb_tags = self.connection.get_list('DescribeTags', params, [('member', Tag)])
-            return dict((tag.Key, tag.Value) for tag in elb_tags if hasattr(tag, 'Key'))
+            descriptions = self.connection.get_list('DescribeTags', params, [('member', ElbTagDescription)])
+            return dict((d.load_balancer_name, d.tags) for d in descriptions)
         except:
             return {}
 
@@ -159,7 +204,7 @@ class ElbInformation(object):
             health_check_dict['ping_path'] = path
         return health_check_dict
 
-    def _get_elb_info(self, elb):
+    def _get_elb_info(self, elb, tags=None):
         elb_info = {
             'name': elb.name,
             'zones': elb.availability_zones,
@@ -179,17 +224,14 @@ class ElbInformation(object):
             'instances_outofservice': [],
             'instances_outofservice_count': 0,
             'instances_inservice_percent': 0.0,
-            'tags': self._get_tags(elb.name)
+            'tags': tags or {}
         }
 
         if elb.vpc_id:
             elb_info['vpc_id'] = elb.vpc_id
 
         if elb.instances:
-            try:
-                instance_health = self.connection.describe_instance_health(elb.name)
-            except BotoServerError as err:
-                self.module.fail_json(msg=err.message)
+            instance_health = self.connection.describe_instance_health(elb.name)
             elb_info['instances_inservice'] = [inst.instance_id for inst in instance_health if inst.state == 'InService']
             elb_info['instances_inservice_count'] = len(elb_info['instances_inservice'])
             elb_info['instances_outofservice'] = [inst.instance_id for inst in instance_health if inst.state == 'OutOfService']
@@ -200,23 +242,53 @@ class ElbInformation(object):
         return elb_info
 
 
+    def _get_all_load_balancers(self, names=None):
+        """ Follow the markers of DescribeLoadBalancers through every page """
+        elbs = []
+        marker = None
+        while True:
+            page = self.connection.get_all_load_balancers(load_balancer_names=names, marker=marker)
+            elbs.extend(page)
+            marker = getattr(page, 'next_marker', None)
+            if not marker:
+                return elbs
+
+    def _get_elb_infos(self, elbs):
+        """ Get the tags and the instance health of a batch of ELBs """
+        tags = self._get_tags([elb.name for elb in elbs])
+        return [self._get_elb_info(elb, tags.get(elb.name)) for elb in elbs]
+
     def list_elbs(self):
         elb_array = []
 
         try:
-            all_elbs = self.connection.get_all_load_balancers()
+            if self.names:
+                try:
+                    elb_array = self._get_all_load_balancers(self.names)
+                except BotoServerError as err:
+                    if err.error_code != 'LoadBalancerNotFound':
+                        raise
+                    # some of them don't exist, look for the others
+                    elb_array = [lb for lb in self._get_all_load_balancers() if lb.name in self.names]
+            else:
+                elb_array = self._get_all_load_balancers()
         except BotoServerError as err:
             self.module.fail_json(msg = "%s: %s" % (err.error_code, err.error_message))
 
-        if all_elbs:
-            if self.names:
-                for existing_lb in all_elbs:
-                    if existing_lb.name in self.names:
-                        elb_array.append(existing_lb)
-            else:
-                elb_array = all_elbs
-                    
-        return list(map(self._get_elb_info, elb_array))
+        batches = [elb_array[i:i + TAG_NAMES_PER_CALL] for i in range(0, len(elb_array), TAG_NAMES_PER_CALL)]
+        if not batches:
+            return []
+
+        pool = ThreadPool(min(ELB_INFO_THREADS, len(batches)))
+        try:
+            elb_infos = pool.map(self._get_elb_infos, batches)
+        except BotoServerError as err:
+            self.module.fail_json(msg=err.message)
+        finally:
+            pool.close()
+            pool.join()
+
+        return [elb_info for batch in elb_infos for elb_info in batch]
 
 def main():
     argument_spec = ec2_argument_spec()
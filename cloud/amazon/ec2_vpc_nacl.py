@@ -132,6 +132,8 @@ try:
 except ImportError:
     HAS_BOTO3 = False
 
+from multiprocessing.pool import ThreadPool
+
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.ec2 import boto3_conn, ec2_argument_spec, get_aws_connection_info
 
@@ -151,6 +153,9 @@ DEFAULT_EGRESS = dict(DEFAULT_RULE_FIELDS.items() + [('Egress', True)])
 # http://www.iana.org/assignments/protocol-numbers/protocol-numbers.xhtml
 PROTOCOL_NUMBERS = {'all': -1, 'icmp': 1, 'tcp': 6, 'udp': 17, }
 
+# Number of entry changes sent at the same time; botocore retries throttled calls
+ENTRY_CHANGE_THREADS = 4
+
 
 #Utility methods
 def icmp_present(entry):
@@ -252,30 +257,42 @@ def tags_changed(nacl_id, client, module):
     return changed
 
 
+def rule_key(rule):
+    """ Hashable form of a rule, equal for equal rules """
+    return tuple(sorted((k, rule_key(v) if isinstance(v, dict) else v) for k, v in rule.items()))
+
+
 def rules_changed(aws_rules, param_rules, Egress, nacl_id, client, module):
-    changed = False
     rules = list()
     for entry in param_rules:
         rules.append(process_rule_entry(entry, Egress))
-    if rules == aws_rules:
-        return changed
-    else:
-        removed_rules = [x for x in aws_rules if x not in rules]
-        if removed_rules:
-            params = dict()
-            for rule in removed_rules:
-                params['NetworkAclId'] = nacl_id
-                params['RuleNumber'] = rule['RuleNumber']
-                params['Egress'] = Egress
-                delete_network_acl_entry(params, client, module)
-            changed = True
-        added_rules = [x for x in rules if x not in aws_rules]
-        if added_rules:
-            for rule in added_rules:
-                rule['NetworkAclId'] = nacl_id
-                create_network_acl_entry(rule, client, module)
-            changed = True
-    return changed
+
+    aws_keys = set(rule_key(x) for x in aws_rules)
+    keys = set(rule_key(x) for x in rules)
+    if aws_keys == keys:
+        return False
+
+    removed_rules = dict((x['RuleNumber'], x) for x in aws_rules if rule_key(x) not in keys)
+    added_rules = [x for x in rules if rule_key(x) not in aws_keys]
+
+    # a rule number that is both removed and added is replaced in place
+    calls = []
+    for rule in added_rules:
+        rule['NetworkAclId'] = nacl_id
+        if removed_rules.pop(rule['RuleNumber'], None):
+            calls.append((client.replace_network_acl_entry, rule))
+        else:
+            calls.append((client.create_network_acl_entry, rule))
+    for rule_number in removed_rules:
+        params = dict()
+        params['NetworkAclId'] = nacl_id
+        params['RuleNumber'] = rule_number
+        params['Egress'] = Egress
+        calls.append((client.delete_network_acl_entry, params))
+
+    # the calls touch distinct rule numbers, so their order does not matter
+    apply_entry_changes(calls, module)
+    return True
 
 
 def process_rule_entry(entry, Egress):
@@ -304,14 +321,16 @@ def restore_default_associations(assoc_ids, default_nacl_id, client, module):
 
 
 def construct_acl_entries(nacl, client, module):
+    calls = []
     for entry in module.params.get('ingress'):
         params = process_rule_entry(entry, Egress=False)
         params['NetworkAclId'] = nacl['NetworkAcl']['NetworkAclId']
-        create_network_acl_entry(params, client, module)
+        calls.append((client.create_network_acl_entry, params))
     for rule in module.params.get('egress'):
         params = process_rule_entry(rule, Egress=True)
         params['NetworkAclId'] = nacl['NetworkAcl']['NetworkAclId']
-        create_network_acl_entry(params, client, module)
+        calls.append((client.create_network_acl_entry, params))
+    apply_entry_changes(calls, module)
 
 
 ## Module invocations
@@ -374,14 +393,6 @@ def create_network_acl(vpc_id, client, module):
     return nacl
 
 
-def create_network_acl_entry(params, client, module):
-    try:
-        result = client.create_network_acl_entry(**params)
-    except botocore.exceptions.ClientError as e:
-        module.fail_json(msg=str(e))
-    return result
-
-
 def create_tags(nacl_id, client, module):
     try:
         delete_tags(nacl_id, client, module)
@@ -397,11 +408,22 @@ def delete_network_acl(nacl_id, client, module):
         module.fail_json(msg=str(e))
 
 
-def delete_network_acl_entry(params, client, module):
+def apply_entry_changes(calls, module):
+    def call(item):
+        method, params = item
+        try:
+            method(**params)
+        except botocore.exceptions.ClientError as e:
+            return str(e)
+
+    pool = ThreadPool(max(1, min(ENTRY_CHANGE_THREADS, len(calls))))
     try:
-        client.delete_network_acl_entry(**params)
-    except botocore.exceptions.ClientError as e:
-        module.fail_json(msg=str(e))
+        errors = [error for error in pool.map(call, calls) if error]
+    finally:
+        pool.close()
+        pool.join()
+    if errors:
+        module.fail_json(msg=errors[0])
 
 
 def delete_tags(nacl_id, client, module):
@@ -112,6 +112,9 @@ EXAMPLES = '''
 '''
 
 import re
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 try:
     import boto.ec2
@@ -146,6 +149,10 @@ CIDR_RE = re.compile('^(\d{1,3}\.){3}\d{1,3}\/\d{1,2}$')
 SUBNET_RE = re.compile('^subnet-[A-z0-9]+$')
 ROUTE_TABLE_RE = re.compile('^rtb-[A-z0-9]+$')
 
+# Number of route changes sent at the same time, and how often a throttled one is retried
+ROUTE_CHANGE_THREADS = 4
+ROUTE_CHANGE_RETRIES = 5
+
 
 def find_subnets(vpc_conn, vpc_id, identified_subnets):
     """
@@ -321,16 +328,68 @@ def index_of_matching_route(route_spec, routes_to_match):
             return i
 
 
+def apply_route_change(vpc_conn, change):
+    """
+    Make one create_route, replace_route or delete_route call, backing
+    off while the API is throttling requests.
+    """
+    method_name, args, kwargs = change
+    method = getattr(vpc_conn, method_name)
+    for attempt in range(ROUTE_CHANGE_RETRIES):
+        try:
+            return method(*args, **kwargs)
+        except EC2ResponseError as e:
+            if e.error_code == 'DryRunOperation':
+                return
+            if e.error_code != 'RequestLimitExceeded' or attempt == ROUTE_CHANGE_RETRIES - 1:
+                # errors were ignored when the calls were made one by one
+                return
+            time.sleep(2 ** attempt)
+
+
+def apply_route_changes(connect, changes):
+    """
+    Make the route changes concurrently. boto connections are not thread
+    safe, so every worker opens its own one with connect.
+    """
+    if not changes:
+        return
+    local = threading.local()
+
+    def apply_in_worker(change):
+        if not hasattr(local, 'vpc_conn'):
+            try:
+                local.vpc_conn = connect()
+            except (boto.exception.NoAuthHandlerFound, AnsibleAWSError) as e:
+                raise AnsibleRouteTableException(str(e))
+        return apply_route_change(local.vpc_conn, change)
+
+    pool = ThreadPool(min(ROUTE_CHANGE_THREADS, len(changes)))
+    try:
+        pool.map(apply_in_worker, changes)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def ensure_routes(vpc_conn, route_table, route_specs, propagating_vgw_ids,
-                  check_mode):
-    routes_to_match = list(route_table.routes)
+                  check_mode, connect):
+    # index the routes by destination, a route table has at most one per destination
+    routes_to_match = {}
+    for route in route_table.routes:
+        routes_to_match.setdefault(route.destination_cidr_block, []).append(route)
+
     route_specs_to_create = []
     for route_spec in route_specs:
-        i = index_of_matching_route(route_spec, routes_to_match)
+        if 'destination_cidr_block' in route_spec:
+            candidates = routes_to_match.get(route_spec['destination_cidr_block'], [])
+        else:
+            candidates = [route for routes in routes_to_match.values() for route in routes]
+        i = index_of_matching_route(route_spec, candidates)
         if i is None:
             route_specs_to_create.append(route_spec)
         else:
-            del routes_to_match[i]
+            routes_to_match[candidates[i].destination_cidr_block].remove(candidates[i])
 
     # NOTE: As of boto==2.38.0, the origin of a route is not available
     # (for example, whether it came from a gateway with route propagation
@@ -339,7 +398,7 @@ def ensure_routes(vpc_conn, route_table, route_specs, propagating_vgw_ids,
     # The current logic will leave non-propagated routes using propagating
     # VGWs in place.
     routes_to_delete = []
-    for r in routes_to_match:
+    for r in [route for routes in routes_to_match.values() for route in routes]:
         if r.gateway_id:
             if r.gateway_id != 'local' and not r.gateway_id.startswith('vpce-'):
                 if not propagating_vgw_ids or r.gateway_id not in propagating_vgw_ids:
@@ -349,23 +408,23 @@ def ensure_routes(vpc_conn, route_table, route_specs, propagating_vgw_ids,
 
     changed = bool(routes_to_delete or route_specs_to_create)
     if changed:
-        for route in routes_to_delete:
-            try:
-                vpc_conn.delete_route(route_table.id,
-                                      route.destination_cidr_block,
-                                      dry_run=check_mode)
-            except EC2ResponseError as e:
-                if e.error_code == 'DryRunOperation':
-                    pass
-
+        # a destination that is both deleted and created gets its target
+        # replaced in a single call, which also leaves no window without it
+        cidrs_to_delete = set(route.destination_cidr_block for route in routes_to_delete)
+        changes = []
         for route_spec in route_specs_to_create:
-            try:
-                vpc_conn.create_route(route_table.id,
-                                      dry_run=check_mode,
-                                      **route_spec)
-            except EC2ResponseError as e:
-                if e.error_code == 'DryRunOperation':
-                    pass
+            route_spec = dict(route_spec)
+            cidr = route_spec.pop('destination_cidr_block')
+            if cidr in cidrs_to_delete:
+                cidrs_to_delete.remove(cidr)
+                changes.append(('replace_route', (route_table.id, cidr), dict(dry_run=check_mode, **route_spec)))
+            else:
+                changes.append(('create_route', (route_table.id, cidr), dict(dry_run=check_mode, **route_spec)))
+        for cidr in cidrs_to_delete:
+            changes.append(('delete_route', (route_table.id, cidr), dict(dry_run=check_mode)))
+
+        # every change is for a different destination, so they can be made in any order
+        apply_route_changes(connect, changes)
 
     return {'changed': bool(changed)}
 
@@ -547,7 +606,9 @@ def ensure_route_table_present(connection, module):
 
     if routes is not None:
         try:
-            result = ensure_routes(connection, route_table, routes, propagating_vgw_ids, module.check_mode)
+            region, ec2_url, aws_connect_params = get_aws_connection_info(module)
+            connect = lambda: connect_to_aws(boto.vpc, region, **aws_connect_params)
+            result = ensure_routes(connection, route_table, routes, propagating_vgw_ids, module.check_mode, connect)
             changed = changed or result['changed']
         except EC2ResponseError as e:
             module.fail_json(msg=e.message)
@@ -96,6 +96,20 @@ options:
       - List of VPC security group IDs to associate with the Lambda function. Required when vpc_subnet_ids is used.
     required: false
     default: None
+  regions:
+    description:
+      - List of regions to manage the function in at the same time, instead of the single I(region). The deployment
+        package is hashed and read only once for all of them.
+    required: false
+    default: None
+    version_added: "2.3"
+  digest_cache:
+    description:
+      - Path of a file caching the SHA-256 digest of I(zip_file) by its path, size and modification time, so that an
+        unchanged package is not hashed again on the next run.
+    required: false
+    default: None
+    version_added: "2.3"
 notes:
   - 'Currently this module only supports uploaded code via S3'
 author:
@@ -128,6 +142,21 @@ tasks:
     - name: ByeBye
       zip_file: bye-code.zip
 
+# Deploy the same function to several regions at once
+- name: multi-region deployment
+  lambda:
+    name: HelloWorld
+    state: present
+    zip_file: hello-code.zip
+    runtime: 'python2.7'
+    role: 'arn:aws:iam::987654321012:role/lambda_basic_execution'
+    handler: 'hello_python.my_handler'
+    regions:
+    - us-east-1
+    - eu-west-1
+    - ap-southeast-2
+    digest_cache: ~/.ansible/lambda-digests.json
+
 # Basic Lambda function deletion
 tasks:
 - name: Delete Lambda functions HelloWorld and ByeBye
@@ -140,6 +169,11 @@ tasks:
 '''
 
 RETURN = '''
+results:
+  description: the result for every region, with the region name, when I(regions) is given
+  returned: success, when regions is given
+  type: list
+  version_added: "2.3"
 output:
   description: the data returned by create_function in boto3
   returned: success
@@ -170,6 +204,11 @@ output:
 # Import from Python standard library
 import base64
 import hashlib
+import json
+import os
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 
 try:
     import botocore
@@ -194,59 +233,102 @@ def get_current_function(connection, function_name, qualifier=None):
         return None
 
 
-def sha256sum(filename):
+# Size of the reads when hashing deployment packages
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class AnsibleLambdaException(Exception):
+    pass
+
+
+def load_digest_cache(digest_cache):
+    try:
+        with open(digest_cache) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_digest_cache(digest_cache, cache):
+    dirname = os.path.dirname(os.path.abspath(digest_cache))
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    fd, tmpname = tempfile.mkstemp(dir=dirname)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f)
+    os.rename(tmpname, digest_cache)
+
+
+def sha256sum(filename, digest_cache=None):
+    stat = os.stat(filename)
+    key = os.path.abspath(filename)
+
+    cache = {}
+    if digest_cache:
+        cache = load_digest_cache(digest_cache)
+        cached = cache.get(key)
+        if cached and cached.get('size') == stat.st_size and cached.get('mtime') == stat.st_mtime:
+            return cached['sha256']
+
     hasher = hashlib.sha256()
     with open(filename, 'rb') as f:
-        hasher.update(f.read())
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
 
     code_hash = hasher.digest()
     code_b64 = base64.b64encode(code_hash)
     hex_digest = code_b64.decode('utf-8')
 
-    return hex_digest
+    if digest_cache:
+        cache[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': hex_digest}
+        save_digest_cache(digest_cache, cache)
 
+    return hex_digest
 
-def main():
-    argument_spec = ec2_argument_spec()
-    argument_spec.update(dict(
-        name=dict(type='str', required=True),
-        state=dict(type='str', default='present', choices=['present', 'absent']),
-        runtime=dict(type='str', required=True),
-        role=dict(type='str', default=None),
-        handler=dict(type='str', default=None),
-        zip_file=dict(type='str', default=None, aliases=['src']),
-        s3_bucket=dict(type='str'),
-        s3_key=dict(type='str'),
-        s3_object_version=dict(type='str', default=None),
-        description=dict(type='str', default=''),
-        timeout=dict(type='int', default=3),
-        memory_size=dict(type='int', default=128),
-        vpc_subnet_ids=dict(type='list', default=None),
-        vpc_security_group_ids=dict(type='list', default=None),
-        )
-    )
 
-    mutually_exclusive = [['zip_file', 's3_key'],
-                          ['zip_file', 's3_bucket'],
-                          ['zip_file', 's3_object_version']]
+class DeploymentPackage(object):
+    """
+    A local zip file, hashed and read at most once however many regions
+    the function is deployed to.
+    """
+
+    def __init__(self, filename, digest_cache=None):
+        self.filename = filename
+        self.digest_cache = digest_cache
+        self._lock = threading.Lock()
+        self._checksum = None
+        self._content = None
+
+    def checksum(self):
+        with self._lock:
+            if self._checksum is None:
+                self._checksum = sha256sum(self.filename, self.digest_cache)
+            return self._checksum
+
+    def content(self):
+        with self._lock:
+            if self._content is None:
+                try:
+                    with open(self.filename, 'rb') as f:
+                        self._content = f.read()
+                except IOError as e:
+                    raise AnsibleLambdaException(str(e))
+            return self._content
 
-    required_together = [['s3_key', 's3_bucket', 's3_object_version'],
-                         ['vpc_subnet_ids', 'vpc_security_group_ids']]
 
-    module = AnsibleModule(argument_spec=argument_spec,
-                           supports_check_mode=True,
-                           mutually_exclusive=mutually_exclusive,
-                           required_together=required_together)
+def ensure_function(module, client, role_arn, package):
+    """
+    Bring the function in the region of client to the requested state.
+    Returns the module result for that region.
+    """
 
     name = module.params.get('name')
     state = module.params.get('state').lower()
     runtime = module.params.get('runtime')
-    role = module.params.get('role')
     handler = module.params.get('handler')
     s3_bucket = module.params.get('s3_bucket')
     s3_key = module.params.get('s3_key')
     s3_object_version = module.params.get('s3_object_version')
-    zip_file = module.params.get('zip_file')
     description = module.params.get('description')
     timeout = module.params.get('timeout')
     memory_size = module.params.get('memory_size')
@@ -256,34 +338,6 @@ def main():
     check_mode = module.check_mode
     changed = False
 
-    if not HAS_BOTOCORE:
-        module.fail_json(msg='Python module "botocore" is missing, please install it')
-
-    if not HAS_BOTO3:
-        module.fail_json(msg='Python module "boto3" is missing, please install it')
-
-    region, ec2_url, aws_connect_kwargs = get_aws_connection_info(module, boto3=True)
-    if not region:
-        module.fail_json(msg='region must be specified')
-
-    try:
-        client = boto3_conn(module, conn_type='client', resource='lambda',
-                            region=region, endpoint=ec2_url, **aws_connect_kwargs)
-    except (botocore.exceptions.ClientError, botocore.exceptions.ValidationError) as e:
-        module.fail_json(msg=str(e))
-
-    if role.startswith('arn:aws:iam'):
-        role_arn = role
-    else:
-        # get account ID and assemble ARN
-        try:
-            iam_client = boto3_conn(module, conn_type='client', resource='iam',
-                                region=region, endpoint=ec2_url, **aws_connect_kwargs)
-            account_id = iam_client.get_user()['User']['Arn'].split(':')[4]
-            role_arn = 'arn:aws:iam::{0}:role/{1}'.format(account_id, role)
-        except (botocore.exceptions.ClientError, botocore.exceptions.ValidationError) as e:
-            module.fail_json(msg=str(e))
-
     # Get function configuration if present, False otherwise
     current_function = get_current_function(client, name)
 
@@ -311,15 +365,15 @@ def main():
 
         # Check for unsupported mutation
         if current_config['Runtime'] != runtime:
-            module.fail_json(msg='Cannot change runtime. Please recreate the function')
+            raise AnsibleLambdaException('Cannot change runtime. Please recreate the function')
 
         # If VPC configuration is desired
         if vpc_subnet_ids or vpc_security_group_ids:
             if len(vpc_subnet_ids) < 1:
-                    module.fail_json(msg='At least 1 subnet is required')
+                raise AnsibleLambdaException('At least 1 subnet is required')
 
             if len(vpc_security_group_ids) < 1:
-                module.fail_json(msg='At least 1 security group is required')
+                raise AnsibleLambdaException('At least 1 security group is required')
 
             if 'VpcConfig' in current_config:
                 # Compare VPC config with current config
@@ -347,7 +401,7 @@ def main():
                     current_version = response['Version']
                 changed = True
             except (botocore.exceptions.ParamValidationError, botocore.exceptions.ClientError) as e:
-                module.fail_json(msg=str(e))
+                raise AnsibleLambdaException(str(e))
 
         # Update code configuration
         code_kwargs = {'FunctionName': name, 'Publish': True}
@@ -362,18 +416,13 @@ def main():
                 code_kwargs.update({'S3ObjectVersion': s3_object_version})
 
         # Compare local checksum, update remote code when different
-        elif zip_file:
-            local_checksum = sha256sum(zip_file)
+        elif package:
+            local_checksum = package.checksum()
             remote_checksum = current_config['CodeSha256']
 
             # Only upload new code when local code is different compared to the remote code
             if local_checksum != remote_checksum:
-                try:
-                    with open(zip_file, 'rb') as f:
-                        encoded_zip = f.read()
-                    code_kwargs.update({'ZipFile': encoded_zip})
-                except IOError as e:
-                    module.fail_json(msg=str(e))
+                code_kwargs.update({'ZipFile': package.content()})
 
         # Upload new code if needed (e.g. code checksum has changed)
         if len(code_kwargs) > 2:
@@ -383,36 +432,30 @@ def main():
                     current_version = response['Version']
                 changed = True
             except (botocore.exceptions.ParamValidationError, botocore.exceptions.ClientError) as e:
-                module.fail_json(msg=str(e))
+                raise AnsibleLambdaException(str(e))
 
         # Describe function code and configuration
         response = get_current_function(client, name, qualifier=current_version)
         if not response:
-            module.fail_json(msg='Unable to get function information after updating')
+            raise AnsibleLambdaException('Unable to get function information after updating')
 
         # We're done
-        module.exit_json(changed=changed, **camel_dict_to_snake_dict(response))
+        return dict(changed=changed, **camel_dict_to_snake_dict(response))
 
     # Function doesn't exists, create new Lambda function
     elif state == 'present':
+        current_version = None
         if s3_bucket and s3_key:
             # If function is stored on S3
             code = {'S3Bucket': s3_bucket,
                     'S3Key': s3_key}
             if s3_object_version:
                 code.update({'S3ObjectVersion': s3_object_version})
-        elif zip_file:
+        elif package:
             # If function is stored in local zipfile
-            try:
-                with open(zip_file, 'rb') as f:
-                    zip_content = f.read()
-
-                code = {'ZipFile': zip_content}
-            except IOError as e:
-                module.fail_json(msg=str(e))
-
+            code = {'ZipFile': package.content()}
         else:
-            module.fail_json(msg='Either S3 object or path to zipfile required')
+            raise AnsibleLambdaException('Either S3 object or path to zipfile required')
 
         func_kwargs = {'FunctionName': name,
                        'Description': description,
@@ -428,10 +471,10 @@ def main():
         # If VPC configuration is given
         if vpc_subnet_ids or vpc_security_group_ids:
             if len(vpc_subnet_ids) < 1:
-                module.fail_json(msg='At least 1 subnet is required')
+                raise AnsibleLambdaException('At least 1 subnet is required')
 
             if len(vpc_security_group_ids) < 1:
-                module.fail_json(msg='At least 1 security group is required')
+                raise AnsibleLambdaException('At least 1 security group is required')
 
             func_kwargs.update({'VpcConfig': {'SubnetIds': vpc_subnet_ids,
                                 'SecurityGroupIds': vpc_security_group_ids}})
@@ -443,12 +486,12 @@ def main():
                 current_version = response['Version']
             changed = True
         except (botocore.exceptions.ParamValidationError, botocore.exceptions.ClientError) as e:
-            module.fail_json(msg=str(e))
+            raise AnsibleLambdaException(str(e))
 
         response = get_current_function(client, name, qualifier=current_version)
         if not response:
-            module.fail_json(msg='Unable to get function information after creating')
-        module.exit_json(changed=changed, **camel_dict_to_snake_dict(response))
+            raise AnsibleLambdaException('Unable to get function information after creating')
+        return dict(changed=changed, **camel_dict_to_snake_dict(response))
 
     # Delete existing Lambda function
     if state == 'absent' and current_function:
@@ -457,13 +500,122 @@ def main():
                 client.delete_function(FunctionName=name)
             changed = True
         except (botocore.exceptions.ParamValidationError, botocore.exceptions.ClientError) as e:
+            raise AnsibleLambdaException(str(e))
+
+    # Function already absent, do nothing
+    return dict(changed=changed)
+
+
+def main():
+    argument_spec = ec2_argument_spec()
+    argument_spec.update(dict(
+        name=dict(type='str', required=True),
+        state=dict(type='str', default='present', choices=['present', 'absent']),
+        runtime=dict(type='str', required=True),
+        role=dict(type='str', default=None),
+        handler=dict(type='str', default=None),
+        zip_file=dict(type='str', default=None, aliases=['src']),
+        s3_bucket=dict(type='str'),
+        s3_key=dict(type='str'),
+        s3_object_version=dict(type='str', default=None),
+        description=dict(type='str', default=''),
+        timeout=dict(type='int', default=3),
+        memory_size=dict(type='int', default=128),
+        vpc_subnet_ids=dict(type='list', default=None),
+        vpc_security_group_ids=dict(type='list', default=None),
+        regions=dict(type='list', default=None),
+        digest_cache=dict(type='path', default=None),
+        )
+    )
+
+    mutually_exclusive = [['zip_file', 's3_key'],
+                          ['zip_file', 's3_bucket'],
+                          ['zip_file', 's3_object_version']]
+
+    required_together = [['s3_key', 's3_bucket', 's3_object_version'],
+                         ['vpc_subnet_ids', 'vpc_security_group_ids']]
+
+    module = AnsibleModule(argument_spec=argument_spec,
+                           supports_check_mode=True,
+                           mutually_exclusive=mutually_exclusive,
+                           required_together=required_together)
+
+    role = module.params.get('role')
+    zip_file = module.params.get('zip_file')
+    regions = module.params.get('regions')
+
+    if not HAS_BOTOCORE:
+        module.fail_json(msg='Python module "botocore" is missing, please install it')
+
+    if not HAS_BOTO3:
+        module.fail_json(msg='Python module "boto3" is missing, please install it')
+
+    region, ec2_url, aws_connect_kwargs = get_aws_connection_info(module, boto3=True)
+    if regions:
+        region = regions[0]
+    if not region:
+        module.fail_json(msg='region must be specified')
+
+    try:
+        client = boto3_conn(module, conn_type='client', resource='lambda',
+                            region=region, endpoint=ec2_url, **aws_connect_kwargs)
+    except (botocore.exceptions.ClientError, botocore.exceptions.ValidationError) as e:
+        module.fail_json(msg=str(e))
+
+    role_arn = role
+    if role and role.startswith('arn:aws:iam'):
+        role_arn = role
+    elif role:
+        # get account ID and assemble ARN
+        try:
+            iam_client = boto3_conn(module, conn_type='client', resource='iam',
+                                region=region, endpoint=ec2_url, **aws_connect_kwargs)
+            account_id = iam_client.get_user()['User']['Arn'].split(':')[4]
+            role_arn = 'arn:aws:iam::{0}:role/{1}'.format(account_id, role)
+        except (botocore.exceptions.ClientError, botocore.exceptions.ValidationError) as e:
             module.fail_json(msg=str(e))
 
-        module.exit_json(changed=changed)
+    package = None
+    if zip_file:
+        package = DeploymentPackage(zip_file, module.params.get('digest_cache'))
 
-    # Function already absent, do nothing
-    elif state == 'absent':
-        module.exit_json(changed=changed)
+    if not regions:
+        try:
+            result = ensure_function(module, client, role_arn, package)
+        except AnsibleLambdaException as e:
+            module.fail_json(msg=str(e))
+        module.exit_json(**result)
+
+    # the clients are made here, boto3_conn may fail the module
+    clients = [client]
+    for other_region in regions[1:]:
+        try:
+            clients.append(boto3_conn(module, conn_type='client', resource='lambda',
+                                      region=other_region, endpoint=ec2_url, **aws_connect_kwargs))
+        except (botocore.exceptions.ClientError, botocore.exceptions.ValidationError) as e:
+            module.fail_json(msg=str(e))
+
+    def ensure_in_region(region_client):
+        try:
+            result = ensure_function(module, region_client[1], role_arn, package)
+        except (AnsibleLambdaException, botocore.exceptions.ClientError) as e:
+            result = dict(failed=True, msg=str(e))
+        result['region'] = region_client[0]
+        return result
+
+    pool = ThreadPool(len(regions))
+    try:
+        results = pool.map(ensure_in_region, list(zip(regions, clients)))
+    finally:
+        pool.close()
+        pool.join()
+
+    changed = any(result.get('changed') for result in results)
+    failed = [result for result in results if result.get('failed')]
+    if failed:
+        module.fail_json(msg='Failed in %s: %s' % (', '.join(result['region'] for result in failed), failed[0]['msg']),
+                         changed=changed, results=results)
+    module.exit_json(changed=changed, results=results)
 
 
 from ansible.module_utils.basic import *
@@ -116,6 +116,31 @@ options:
         'tags',
         ]
     default: 'list'
+  all_pages:
+    description:
+      - "Used with query: record_sets. Follow the next record markers inside the module and return the
+        record sets of every page instead of only the first one. max_items then sets the page size."
+    required: false
+    default: false
+    version_added: "2.3"
+  subdomain:
+    description:
+      - "Used with query: record_sets. Only list the record sets of this name and the names below it.
+        Route53 lists names sorted with their labels reversed, so listing starts at this name and stops
+        after the last record below it instead of going through the whole zone. Implies all_pages."
+    required: false
+    version_added: "2.3"
+  record_types:
+    description:
+      - "Used with query: record_sets. Only return record sets of these types. Implies all_pages."
+    required: false
+    version_added: "2.3"
+  dest:
+    description:
+      - "Used with query: record_sets. Write the record sets to this file, one compact JSON object per
+        line, instead of returning them. Only the number of record sets is returned. Implies all_pages."
+    required: false
+    version_added: "2.3"
 author: Karen Cheng(@Etherdaemon)
 extends_documentation_fragment: aws
 '''
@@ -142,6 +167,15 @@ EXAMPLES = '''
     max_items: 20
   register: record_sets
 
+- name: Export all A records below internal.example.com to a JSON-lines file
+  route53_facts:
+    query: record_sets
+    hosted_zone_id: ZZZ1111112222
+    subdomain: internal.example.com
+    record_types: [ 'A' ]
+    dest: /var/backups/route53/internal.jsonl
+  register: record_sets_export
+
 - name: List first 20 health checks
   route53_facts:
     query: health_check
@@ -176,9 +210,16 @@ try:
 except ImportError:
     HAS_BOTO3 = False
 
+import json
+import os
+import tempfile
+
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.ec2 import boto3_conn, ec2_argument_spec, get_aws_connection_info
 
+# Page size when listing all record sets, the most Route53 returns at once
+RECORD_SETS_PAGE_SIZE = '300'
+
 
 def get_hosted_zone(client, module):
     params = dict()
@@ -334,10 +375,88 @@ def record_sets_details(client, module):
     elif module.params.get('type'):
         params['StartRecordType'] = module.params.get('type')
 
+    if (module.params.get('all_pages') or module.params.get('subdomain') or
+            module.params.get('record_types') or module.params.get('dest')):
+        return all_record_sets_details(client, module, params)
+
     results = client.list_resource_record_sets(**params)
     return results
 
 
+def normalize_record_name(name):
+    return name.lower().rstrip('.')
+
+
+def iter_record_sets(client, params, subdomain=None):
+    """
+    Yield the record sets of every page, starting at params. With a
+    subdomain listing starts at it and ends after the last name below it.
+    """
+    params = dict(params)
+    if subdomain:
+        subdomain = normalize_record_name(subdomain)
+        if 'StartRecordName' not in params:
+            params['StartRecordName'] = subdomain
+
+    while True:
+        page = client.list_resource_record_sets(**params)
+        for record in page['ResourceRecordSets']:
+            if subdomain:
+                name = normalize_record_name(record['Name'])
+                if name != subdomain and not name.endswith('.' + subdomain):
+                    # names below the subdomain are listed together, this is past them
+                    return
+            yield record
+
+        if not page.get('IsTruncated'):
+            return
+        params['StartRecordName'] = page['NextRecordName']
+        for key in ('Type', 'Identifier'):
+            if 'NextRecord' + key in page:
+                params['StartRecord' + key] = page['NextRecord' + key]
+            else:
+                params.pop('StartRecord' + key, None)
+
+
+def all_record_sets_details(client, module, params):
+    params = dict(params)
+    if not module.params.get('max_items'):
+        params['MaxItems'] = RECORD_SETS_PAGE_SIZE
+
+    record_types = module.params.get('record_types')
+    records = iter_record_sets(client, params, module.params.get('subdomain'))
+    if record_types:
+        records = (record for record in records if record['Type'] in record_types)
+
+    dest = module.params.get('dest')
+    if not dest:
+        record_sets = list(records)
+        return dict(ResourceRecordSets=record_sets, IsTruncated=False, record_count=len(record_sets))
+
+    # stream the records to the file instead of keeping them all in memory
+    record_count = 0
+    tmpfd, tmpname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)))
+    try:
+        f = os.fdopen(tmpfd, 'w')
+        try:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':'), sort_keys=True))
+                f.write('\n')
+                record_count += 1
+        finally:
+            f.close()
+    except Exception:
+        os.remove(tmpname)
+        raise
+
+    changed = not os.path.exists(dest) or module.sha1(dest) != module.sha1(tmpname)
+    if changed:
+        module.atomic_move(tmpname, dest)
+    else:
+        os.remove(tmpname)
+    return dict(dest=dest, record_count=record_count, changed=changed)
+
+
 def health_check_details(client, module):
     health_check_invocations = {
         'list': list_health_checks,
@@ -403,6 +522,10 @@ def main():
             'count',
             'tags',
         ], default='list'),
+        all_pages=dict(type='bool', default=False),
+        subdomain=dict(),
+        record_types=dict(type='list'),
+        dest=dict(type='path'),
         )
     )
 
@@ -35,9 +35,22 @@ options:
     description:
       - Host name of the instance. C(name) can only contain ASCII letters.
       - Name will be generated (UUID) by CloudStack if not specified and can not be changed afterwards.
-      - Either C(name) or C(display_name) is required.
+      - Either C(name), C(display_name) or C(names) is required.
+    required: false
+    default: null
+  names:
+    description:
+      - List of host names of instances to manage in a single task, instead of C(name).
+      - The instances are listed once, the async jobs needed to bring each of them to C(state) are all
+        submitted, then polled together with a backoff growing from 1 to 16 seconds between rounds.
+      - Missing instances are deployed with their name as display name. Existing instances that
+        need settings changes are updated one after the other, as without C(names).
+      - The lookups of service offering, template or ISO, disk offering and networks are done once for all instances.
+      - Not supported with C(state=restored). Mutually exclusive with C(name), C(display_name),
+        C(ip_address), C(ip6_address) and C(ip_to_networks).
     required: false
     default: null
+    version_added: "2.3"
   display_name:
     description:
       - Custom display name of the instances.
@@ -297,6 +310,15 @@ EXAMPLES = '''
     name: web-vm-1
     state: absent
   delegate_to: localhost
+
+# Restart a whole group of instances at once
+- cs_instance:
+    names:
+      - web-vm-1
+      - web-vm-2
+      - web-vm-3
+    state: restarted
+  delegate_to: localhost
 '''
 
 RETURN = '''
@@ -416,13 +438,23 @@ instance_name:
   returned: success
   type: string
   sample: i-44-3992-VM
+instances:
+  description: List of the instances, each with the keys documented above, when using C(names).
+  returned: success
+  type: list
+  sample: '[ { "name": "web-vm-1", "state": "Running", ... } ]'
 '''
 
 import base64
+import time
 
 # import cloudstack common
 from ansible.module_utils.cloudstack import *
 
+# seconds between two rounds of async job queries, doubled after each round
+POLL_INTERVAL = 1
+POLL_MAX_INTERVAL = 16
+
 
 class AnsibleCloudStackInstance(AnsibleCloudStack):
 
@@ -443,19 +475,27 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         self.instance = None
         self.template = None
         self.iso = None
+        self.service_offering_id = None
+        self.disk_offering_id = None
+        self.networks = None
 
 
     def get_service_offering_id(self):
+        if self.service_offering_id:
+            return self.service_offering_id
+
         service_offering = self.module.params.get('service_offering')
 
         service_offerings = self.cs.listServiceOfferings()
         if service_offerings:
             if not service_offering:
-                return service_offerings['serviceoffering'][0]['id']
+                self.service_offering_id = service_offerings['serviceoffering'][0]['id']
+                return self.service_offering_id
 
             for s in service_offerings['serviceoffering']:
                 if service_offering in [ s['name'], s['id'] ]:
-                    return s['id']
+                    self.service_offering_id = s['id']
+                    return self.service_offering_id
         self.module.fail_json(msg="Service offering '%s' not found" % service_offering)
 
 
@@ -505,14 +545,34 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         if not disk_offering:
             return None
 
+        if self.disk_offering_id:
+            return self.disk_offering_id
+
         disk_offerings = self.cs.listDiskOfferings()
         if disk_offerings:
             for d in disk_offerings['diskoffering']:
                 if disk_offering in [ d['displaytext'], d['name'], d['id'] ]:
-                    return d['id']
+                    self.disk_offering_id = d['id']
+                    return self.disk_offering_id
         self.module.fail_json(msg="Disk offering '%s' not found" % disk_offering)
 
 
+    def get_instances(self):
+        vpc_id = self.get_vpc(key='id')
+        args = {
+            'account': self.get_account(key='name'),
+            'domainid': self.get_domain(key='id'),
+            'projectid': self.get_project(key='id'),
+            'vpcid': vpc_id,
+        }
+        instances = self.cs.listVirtualMachines(**args)
+        if not instances:
+            return []
+        if vpc_id:
+            return instances['virtualmachine']
+        return [v for v in instances['virtualmachine'] if not self.is_vm_in_vpc(vm=v)]
+
+
     def get_instance(self):
         instance = self.instance
         if not instance:
@@ -582,14 +642,16 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         if not network_names:
             return None
 
-        args = {
-            'account': self.get_account(key='name'),
-            'domainid': self.get_domain(key='id'),
-            'projectid': self.get_project(key='id'),
-            'zoneid': self.get_zone(key='id'),
-            'vpcid': self.get_vpc(key='id'),
-        }
-        networks = self.cs.listNetworks(**args)
+        if self.networks is None:
+            args = {
+                'account': self.get_account(key='name'),
+                'domainid': self.get_domain(key='id'),
+                'projectid': self.get_project(key='id'),
+                'zoneid': self.get_zone(key='id'),
+                'vpcid': self.get_vpc(key='id'),
+            }
+            self.networks = self.cs.listNetworks(**args)
+        networks = self.networks
         if not networks:
             self.module.fail_json(msg="No networks available")
 
@@ -647,8 +709,7 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         return res
 
 
-    def deploy_instance(self, start_vm=True):
-        self.result['changed'] = True
+    def get_deploy_args(self, start_vm=True):
         networkids = self.get_network_ids()
         if networkids is not None:
             networkids = ','.join(networkids)
@@ -687,6 +748,12 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         template_iso = self.get_template_or_iso()
         if 'hypervisor' not in template_iso:
             args['hypervisor'] = self.get_hypervisor()
+        return args
+
+
+    def deploy_instance(self, start_vm=True):
+        self.result['changed'] = True
+        args = self.get_deploy_args(start_vm=start_vm)
 
         instance = None
         if not self.module.check_mode:
@@ -914,6 +981,126 @@ class AnsibleCloudStackInstance(AnsibleCloudStack):
         return instance
 
 
+    def poll_jobs(self, jobs, key=None):
+        """Poll the async jobs, a dict of API responses by name, in a single
+        loop; return the job results by name and the error messages."""
+        results = {}
+        errors = []
+        pending = {}
+        for name, job in jobs.items():
+            if 'jobid' in job:
+                pending[name] = job['jobid']
+            else:
+                results[name] = job
+
+        interval = POLL_INTERVAL
+        while pending:
+            for name, jobid in list(pending.items()):
+                res = self.cs.queryAsyncJobResult(jobid=jobid)
+                if res['jobstatus'] != 0 and 'jobresult' in res:
+                    del pending[name]
+                    if 'errortext' in res['jobresult']:
+                        errors.append("%s: %s" % (name, res['jobresult']['errortext']))
+                    elif key and key in res['jobresult']:
+                        results[name] = res['jobresult'][key]
+                    else:
+                        results[name] = res['jobresult']
+            if pending:
+                time.sleep(interval)
+                interval = min(interval * 2, POLL_MAX_INTERVAL)
+        return results, errors
+
+
+    def batch_instances(self, names, state):
+        """Bring all the named instances to state, submitting all the async
+        jobs before polling them together."""
+        instances = {}
+        for v in self.get_instances():
+            for key in [ v['name'].lower(), v['displayname'].lower(), v['id'] ]:
+                instances.setdefault(key, v)
+
+        start_vm = state != 'stopped'
+        deploy_args = None
+        final = {}
+        jobs = {}
+        deployed = []
+        errors = []
+        for name in names:
+            instance = instances.get(name.lower())
+            final[name] = instance
+            call = None
+
+            if state in ['absent', 'destroyed']:
+                if instance and instance['state'].lower() not in ['expunging', 'destroying', 'destroyed']:
+                    call = (self.cs.destroyVirtualMachine, {'id': instance['id']})
+
+            elif state in ['expunged']:
+                if instance and instance['state'].lower() not in ['expunging']:
+                    call = (self.cs.destroyVirtualMachine, {'id': instance['id'], 'expunge': True})
+
+            elif not instance:
+                if deploy_args is None:
+                    deploy_args = self.get_deploy_args(start_vm=start_vm)
+                args = dict(deploy_args)
+                args['name'] = name
+                args['displayname'] = name
+                call = (self.cs.deployVirtualMachine, args)
+                deployed.append(name)
+
+            else:
+                # settings changes stop and start the instance themselves,
+                # they are applied one instance after the other
+                self.instance = instance
+                instance = self.recover_instance(instance=instance)
+                instance = self.update_instance(instance=instance, start_vm=start_vm)
+                if instance:
+                    instance = self.ensure_tags(resource=instance, resource_type='UserVm')
+                final[name] = instance
+                self.instance = None
+
+                instance_state = (instance or {}).get('state', '').lower()
+                if state in ['started', 'restarted'] and instance_state in ['stopped', 'stopping']:
+                    call = (self.cs.startVirtualMachine, {'id': instance['id']})
+                elif state in ['restarted'] and instance_state in ['running', 'starting']:
+                    call = (self.cs.rebootVirtualMachine, {'id': instance['id']})
+                elif state in ['stopped'] and instance_state in ['running', 'starting']:
+                    call = (self.cs.stopVirtualMachine, {'id': instance['id']})
+
+            if call:
+                self.result['changed'] = True
+                if not self.module.check_mode:
+                    res = call[0](**call[1])
+                    if 'errortext' in res:
+                        errors.append("%s: %s" % (name, res['errortext']))
+                    else:
+                        jobs[name] = res
+
+        if self.module.params.get('poll_async'):
+            results, job_errors = self.poll_jobs(jobs, 'virtualmachine')
+            errors.extend(job_errors)
+            for name, instance in results.items():
+                if state not in ['absent', 'destroyed', 'expunged'] and name in deployed:
+                    instance = self.ensure_tags(resource=instance, resource_type='UserVm')
+                final[name] = instance
+        else:
+            final.update(jobs)
+
+        result = self.result
+        instances = []
+        for name in names:
+            instance = final[name]
+            if instance and 'state' in instance and instance['state'].lower() == 'error':
+                errors.append("Instance named '%s' in error state." % name)
+            self.result = {}
+            instances.append(self.get_result(instance))
+        self.result = result
+        self.result['instances'] = instances
+
+        if errors:
+            self.module.fail_json(msg="Failed: '%s'" % "', '".join(errors), **self.result)
+        return self.result
+
+
     def get_result(self, instance):
         super(AnsibleCloudStackInstance, self).get_result(instance)
         if instance:
@@ -938,6 +1125,7 @@ def main():
     argument_spec = cs_argument_spec()
     argument_spec.update(dict(
         name = dict(default=None),
+        names = dict(type='list', default=None),
         display_name = dict(default=None),
         group = dict(default=None),
         state = dict(choices=['present', 'deployed', 'started', 'stopped', 'restarted', 'restored', 'absent', 'destroyed', 'expunged'], default='present'),
@@ -980,10 +1168,15 @@ def main():
         argument_spec=argument_spec,
         required_together=required_together,
         required_one_of = (
-            ['display_name', 'name'],
+            ['display_name', 'name', 'names'],
         ),
         mutually_exclusive = (
             ['template', 'iso'],
+            ['names', 'name'],
+            ['names', 'display_name'],
+            ['names', 'ip_address'],
+            ['names', 'ip6_address'],
+            ['names', 'ip_to_networks'],
         ),
         supports_check_mode=True
     )
@@ -992,6 +1185,13 @@ def main():
         acs_instance = AnsibleCloudStackInstance(module)
 
         state = module.params.get('state')
+        names = module.params.get('names')
+
+        if names is not None:
+            if state in ['restored']:
+                module.fail_json(msg="names is not supported with state=restored")
+            result = acs_instance.batch_instances(names, state)
+            module.exit_json(**result)
 
         if state in ['absent', 'destroyed']:
             instance = acs_instance.absent_instance()
@@ -281,17 +281,44 @@ except ImportError:
 HAS_PYVMOMI = False
 try:
     import pyVmomi
-    from pyVmomi import vim
+    from pyVmomi import vim, vmodl
     HAS_PYVMOMI = True
 except ImportError:
     pass
 
+import hashlib
 import os
+import tempfile
 import time
 from netaddr import IPNetwork, IPAddress
 
 from ansible.module_utils.urls import fetch_url
 
+# Number of objects per RetrievePropertiesEx page
+PROPERTY_PAGE_SIZE = 1000
+
+# Size of the reads when streaming files from and to guests
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingReader(object):
+
+    ''' File wrapper hashing and counting what is read from it, for streamed uploads '''
+
+    def __init__(self, f, checksum_alg=None):
+        self.f = f
+        self.size = 0
+        self.digest = None
+        if checksum_alg:
+            self.digest = hashlib.new(checksum_alg)
+
+    def read(self, size=TRANSFER_CHUNK_SIZE):
+        chunk = self.f.read(size)
+        self.size += len(chunk)
+        if self.digest:
+            self.digest.update(chunk)
+        return chunk
+
 class PyVmomiHelper(object):
 
     def __init__(self, module):
@@ -305,110 +332,114 @@ class PyVmomiHelper(object):
         self.smartconnect()
         self.datacenter = None
         self.folders = None
+        self.folder_map = None
         self.foldermap = None
+        self.inventory = None
+        self.vms_by_name = None
 
     def smartconnect(self):
         self.content = connect_to_api(self.module)
 
-    def _build_folder_tree(self, folder, tree={}, treepath=None):
+    def get_inventory(self):
 
-        tree = {'virtualmachines': [],
-                        'subfolders': {},
-                        'vimobj': folder,
-                        'name': folder.name}
+        ''' Fetch the names and parents of all datacenters, folders and vms at once '''
 
-        children = None
-        if hasattr(folder, 'childEntity'):
-            children = folder.childEntity
+        if self.inventory is None:
+            self.inventory = collect_properties(self.content, self.content.rootFolder, {
+                vim.Datacenter: ['name', 'vmFolder'],
+                vim.Folder: ['name', 'parent'],
+                vim.VirtualMachine: ['name', 'config.uuid', 'parent'],
+            })
 
-        if children:
-            for child in children:
-                if child == folder or child in tree:
-                    continue
-                if isinstance(child, vim.Folder):
-                    ctree = self._build_folder_tree(child)
-                    tree['subfolders'][child] = dict.copy(ctree)
-                elif isinstance(child, vim.VirtualMachine):
-                    tree['virtualmachines'].append(child)
-        else:
-            if isinstance(folder, vim.VirtualMachine):
-                return folder
-        return tree
+            self.vms_by_name = {}
+            for obj, props in self.inventory:
+                if isinstance(obj, vim.VirtualMachine):
+                    self.vms_by_name.setdefault(props.get('name'), []).append(obj)
 
+        return self.inventory
 
-    def _build_folder_map(self, folder, vmap={}, inpath='/'):
+    def getvms_by_name(self, name):
+        self.get_inventory()
+        return self.vms_by_name.get(name, [])
 
-        ''' Build a searchable index for vms+uuids+folders '''
+    def _build_folder_map(self, root):
 
-        if isinstance(folder, tuple):
-            folder = folder[1]
+        ''' Build a searchable index for vms+uuids+folders below root '''
 
-        if not 'names' in vmap:
-            vmap['names'] = {}
-        if not 'uuids' in vmap:
-            vmap['uuids'] = {}
-        if not 'paths' in vmap:
-            vmap['paths'] = {}
+        vmap = {
+            'names': {},
+            'uuids': {},
+            'paths': {},
+            # helpful for isolating folder objects later on
+            'path_by_fvim': {},
+            'fvim_by_path': {},
+            # helpful for isolating vm objects later on
+            'path_by_vvim': {},
+            'vvim_by_path': {},
+        }
+
+        properties = dict(self.get_inventory())
+
+        def folder_path(folder):
+            if folder in vmap['path_by_fvim']:
+                return vmap['path_by_fvim'][folder]
+            if folder == root:
+                thispath = '/vm'
+            elif folder in properties and isinstance(folder, vim.Folder):
+                parentpath = folder_path(properties[folder].get('parent'))
+                if parentpath is None:
+                    return None
+                thispath = parentpath + '/' + properties[folder]['name']
+            else:
+                # not below this datacenter's vm folder
+                return None
+
+            # store object by path and store path by object
+            vmap['fvim_by_path'][thispath] = folder
+            vmap['path_by_fvim'][folder] = thispath
+            vmap['paths'].setdefault(thispath, [])
+            vmap['vvim_by_path'].setdefault(thispath, [])
+            return thispath
+
+        folder_path(root)
+        for obj, props in self.inventory:
+            if isinstance(obj, vim.Folder):
+                folder_path(obj)
+            elif isinstance(obj, vim.VirtualMachine):
+                thispath = folder_path(props.get('parent'))
+                if thispath is None:
+                    continue
+                name = props.get('name')
+                uuid = props.get('config.uuid')
+                vmap['names'].setdefault(name, []).append(uuid)
+                vmap['uuids'][uuid] = name
+                vmap['paths'][thispath].append(uuid)
+                vmap['vvim_by_path'][thispath].append(obj)
+                vmap['path_by_vvim'][obj] = thispath
 
-        if inpath == '/':
-            thispath = '/vm'
-        else:
-            thispath = os.path.join(inpath, folder['name'])
-
-        if thispath not in vmap['paths']:
-            vmap['paths'][thispath] = []
-
-        # helpful for isolating folder objects later on
-        if not 'path_by_fvim' in vmap:
-            vmap['path_by_fvim'] = {}
-        if not 'fvim_by_path' in vmap:
-            vmap['fvim_by_path'] = {}
-        # store object by path and store path by object
-        vmap['fvim_by_path'][thispath] = folder['vimobj']
-        vmap['path_by_fvim'][folder['vimobj']] = thispath
-
-        # helpful for isolating vm objects later on
-        if not 'path_by_vvim' in vmap:
-            vmap['path_by_vvim'] = {}
-        if not 'vvim_by_path' in vmap:
-            vmap['vvim_by_path'] = {}
-        if thispath not in vmap['vvim_by_path']:
-            vmap['vvim_by_path'][thispath] = []
-    
-
-        for item in folder.items():
-            k = item[0]
-            v = item[1]
-
-            if k == 'name':
-                pass
-            elif k == 'subfolders':
-                for x in v.items():
-                    vmap = self._build_folder_map(x, vmap=vmap, inpath=thispath)
-            elif k == 'virtualmachines':
-                for x in v:
-                    if not x.config.name in vmap['names']:
-                        vmap['names'][x.config.name] = []
-                    vmap['names'][x.config.name].append(x.config.uuid)
-                    vmap['uuids'][x.config.uuid] = x.config.name
-                    vmap['paths'][thispath].append(x.config.uuid)
-
-                    if x not in vmap['vvim_by_path'][thispath]:
-                        vmap['vvim_by_path'][thispath].append(x)
-                    if x not in vmap['path_by_vvim']:
-                        vmap['path_by_vvim'][x] = thispath
         return vmap
 
     def getfolders(self):
 
         if not self.datacenter:
             self.get_datacenter()
-        self.folders = self._build_folder_tree(self.datacenter.vmFolder)
-        self.folder_map = self._build_folder_map(self.folders)
+        properties = dict(self.get_inventory())
+        if self.datacenter in properties:
+            root = properties[self.datacenter]['vmFolder']
+        else:
+            root = self.datacenter.vmFolder
+        self.folder_map = self._build_folder_map(root)
+        self.folders = self.folder_map['fvim_by_path']
         return (self.folders, self.folder_map)
 
     def compile_folder_path_for_object(self, vobj):
         ''' make a /vm/foo/bar/baz like folder path for an object '''
+        if self.folder_map:
+            if vobj in self.folder_map['path_by_vvim']:
+                return self.folder_map['path_by_vvim'][vobj]
+            if vobj in self.folder_map['path_by_fvim']:
+                return self.folder_map['path_by_fvim'][vobj]
+
         paths = []
         if isinstance(vobj, vim.Folder):
             paths.append(vobj.name)
@@ -430,10 +461,9 @@ class PyVmomiHelper(object):
     def getvm(self, name=None, uuid=None, folder=None, name_match=None):
 
         # https://www.vmware.com/support/developer/vc-sdk/visdk2xpubs/ReferenceGuide/vim.SearchIndex.html
-        # self.si.content.searchIndex.FindByInventoryPath('DC1/vm/test_folder')
+        # https://www.vmware.com/support/developer/vc-sdk/visdk41pubs/ApiReference/vmodl.query.PropertyCollector.html
 
         vm = None
-        folder_path = None
         searchpath = None
 
         if uuid:
@@ -444,76 +474,40 @@ class PyVmomiHelper(object):
             if self.params['folder'].endswith('/'):
                 self.params['folder'] = self.params['folder'][0:-1]
 
-            # Build the absolute folder path to pass into the search method
+            if not self.folder_map:
+                self.getfolders()
+
+            # Build the absolute folder path to look up in the folder map
             if self.params['folder'].startswith('/vm'):
-                searchpath = '%s' % self.params['datacenter']
-                searchpath += self.params['folder']
+                searchpath = self.params['folder']
             elif self.params['folder'].startswith('/'):
-                searchpath = '%s' % self.params['datacenter']
-                searchpath += '/vm' + self.params['folder']
+                searchpath = '/vm' + self.params['folder']
             else:
                 # need to look for matching absolute path
-                if not self.folders:
-                    self.getfolders()
-                paths = self.folder_map['paths'].keys()
-                paths = [x for x in paths if x.endswith(self.params['folder'])]
+                paths = [x for x in self.folder_map['paths'].keys() if x.endswith(self.params['folder'])]
                 if len(paths) > 1:
                     self.module.fail_json(msg='%s matches more than one folder. Please use the absolute path starting with /vm/' % self.params['folder'])
                 elif paths:
                     searchpath = paths[0]
 
             if searchpath:
-                # get all objects for this path ...
-                fObj = self.content.searchIndex.FindByInventoryPath(searchpath)
-                if fObj:
-                    if isinstance(fObj, vim.Datacenter):
-                        fObj = fObj.vmFolder
-                    for cObj in fObj.childEntity:
-                        if not isinstance(cObj, vim.VirtualMachine):
-                            continue
-                        if cObj.name == name:
-                            vm = cObj
-                            break
+                for vobj in self.folder_map['vvim_by_path'].get(searchpath, []):
+                    if vobj in self.getvms_by_name(name):
+                        vm = vobj
+                        break
 
         if not vm:
-
-            # FIXME - this is unused if folder has a default value
-            vmList = get_all_objs(self.content, [vim.VirtualMachine])
-
-            # narrow down by folder
-            if folder:
-                if not self.folders:
-                    self.getfolders()
-
-                # compare the folder path of each VM against the search path
-                for item in vmList.items():
-                    vobj = item[0]
-                    if not isinstance(vobj.parent, vim.Folder):
-                        continue
-                    if self.compile_folder_path_for_object(vobj) == searchpath:
-                        return vobj
-
+            matches = self.getvms_by_name(name)
             if name_match:
-                if name_match == 'first':
-                    vm = get_obj(self.content, [vim.VirtualMachine], name)
-                elif name_match == 'last':
-                    matches = []
-                    vmList = get_all_objs(self.content, [vim.VirtualMachine])
-                    for thisvm in vmList:
-                        if thisvm.config.name == name:
-                            matches.append(thisvm)
-                    if matches:
-                        vm = matches[-1]
-            else:            
-                matches = []
-                vmList = get_all_objs(self.content, [vim.VirtualMachine])
-                for thisvm in vmList:
-                    if thisvm.config.name == name:
-                        matches.append(thisvm)
-                    if len(matches) > 1:
-                        module.fail_json(msg='more than 1 vm exists by the name %s. Please specify a uuid, or a folder, or a datacenter or name_match' % name)
-                    if matches:
-                        vm = matches[0]
+                if name_match == 'first' and matches:
+                    vm = matches[0]
+                elif name_match == 'last' and matches:
+                    vm = matches[-1]
+            else:
+                if len(matches) > 1:
+                    self.module.fail_json(msg='more than 1 vm exists by the name %s. Please specify a uuid, or a folder, or a datacenter or name_match' % name)
+                if matches:
+                    vm = matches[0]
 
         return vm
 
@@ -648,11 +642,13 @@ class PyVmomiHelper(object):
         #   - static IPs
 
         # FIXME: need to search for this in the same way as guests to ensure accuracy
-        template = get_obj(self.content, [vim.VirtualMachine], self.params['template'])
+        template = None
+        templates = self.getvms_by_name(self.params['template'])
+        if templates:
+            template = templates[0]
         if not template:
             self.module.fail_json(msg="Could not find a template named %s" % self.params['template'])
 
-        datacenters = get_all_objs(self.content, [vim.Datacenter])
         datacenter = get_obj(self.content, [vim.Datacenter], 
                              self.params['datacenter'])
         if not datacenter:
@@ -712,14 +708,10 @@ class PyVmomiHelper(object):
         # Find the associated resourcepool for the host system
         #   * FIXME: find resourcepool for clusters too
         resource_pool = None
-        resource_pools = get_all_objs(self.content, [vim.ResourcePool])
-        for rp in resource_pools.items():
-            if not rp[0]:
-                continue
-            if not hasattr(rp[0], 'parent'):
-                continue
-            if rp[0].parent == hostsystem.parent:
-                resource_pool = rp[0]    
+        resource_pools = collect_properties(self.content, self.content.rootFolder, {vim.ResourcePool: ['parent']})
+        for rp, props in resource_pools:
+            if props.get('parent') == hostsystem.parent:
+                resource_pool = rp
                 break
         if resource_pool:
             relospec.pool = resource_pool
@@ -928,32 +920,33 @@ class PyVmomiHelper(object):
     def wait_for_task(self, task):
         # https://www.vmware.com/support/developer/vc-sdk/visdk25pubs/ReferenceGuide/vim.Task.html
         # https://www.vmware.com/support/developer/vc-sdk/visdk25pubs/ReferenceGuide/vim.TaskInfo.html
-        # https://github.com/virtdevninja/pyvmomi-community-samples/blob/master/samples/tools/tasks.py
-        while task.info.state not in ['success', 'error']:
-            time.sleep(1)
-
-    def wait_for_vm_ip(self, vm, poll=100, sleep=5):            
-        ips = None
-        facts = {}
-        thispoll = 0
-        while not ips and thispoll <= poll:
-            newvm = self.getvm(uuid=vm.config.uuid)
-            facts = self.gather_facts(newvm)
-            if facts['ipv4'] or facts['ipv6']:
-                ips = True
-            else:
-                time.sleep(sleep)
-                thispoll += 1
+        self.wait_for_tasks([task])
 
-        return facts
+    def wait_for_tasks(self, tasks):
+        ''' Block until every task has succeeded or failed '''
+        wait_for_updates(self.content, tasks, 'info.state',
+                         lambda state: state in ['success', 'error'])
 
+    def wait_for_vm_ip(self, vm, poll=100, sleep=5):
+        self.wait_for_vms_ip([vm], timeout=poll * sleep)
+        return self.gather_facts(vm)
 
-    def fetch_file_from_guest(self, vm, username, password, src, dest):
+    def wait_for_vms_ip(self, vms, timeout=None):
+        ''' Block until the guest tools of every vm report an ip address, or timeout seconds passed '''
+        return wait_for_updates(self.content, vms, 'guest.ipAddress',
+                                lambda ipaddress: bool(ipaddress), timeout=timeout)
+
+
+    def fetch_file_from_guest(self, vm, username, password, src, dest, checksum_alg=None, checksum=None):
 
         ''' Use VMWare's filemanager api to fetch a file over http '''
 
         result = {'failed': False}
 
+        # a checksum to verify is computed with sha1 unless told otherwise
+        if checksum and not checksum_alg:
+            checksum_alg = 'sha1'
+
         tools_status = vm.guest.toolsStatus
         if (tools_status == 'toolsNotInstalled' or
                 tools_status == 'toolsNotRunning'):
@@ -979,7 +972,7 @@ class PyVmomiHelper(object):
                              timeout=10, headers=None)
 
         # save all of the transfer data
-        for k,v in info.iteritems():
+        for k,v in info.items():
             result[k] = v
 
         # exit early if xfer failed
@@ -987,23 +980,56 @@ class PyVmomiHelper(object):
             result['failed'] = True
             return result
 
-        # attempt to read the content and write it
+        # stream the content to a temporary file next to dest, so that
+        # neither memory nor a partial dest grow with the file size
+        digest = None
+        if checksum_alg:
+            digest = hashlib.new(checksum_alg)
+        size = 0
         try:
-            with open(dest, 'wb') as f:
-                f.write(rsp.read())        
+            tmpfd, tmpname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)))
+            try:
+                with os.fdopen(tmpfd, 'wb') as f:
+                    for chunk in iter(lambda: rsp.read(TRANSFER_CHUNK_SIZE), b''):
+                        size += len(chunk)
+                        if digest:
+                            digest.update(chunk)
+                        f.write(chunk)
+            except Exception:
+                os.remove(tmpname)
+                raise
         except Exception as e:
             result['failed'] = True
             result['msg'] = str(e)
+            return result
+
+        if digest:
+            result['checksum'] = digest.hexdigest()
+        if size != fti.size:
+            result['failed'] = True
+            result['msg'] = "received %d of %d bytes" % (size, fti.size)
+        elif checksum and result['checksum'] != checksum.lower():
+            result['failed'] = True
+            result['msg'] = "%s checksum is %s instead of %s" % (checksum_alg, result['checksum'], checksum)
+
+        if result['failed']:
+            os.remove(tmpname)
+        else:
+            self.module.atomic_move(tmpname, dest)
 
         return result
 
 
-    def push_file_to_guest(self, vm, username, password, src, dest, overwrite=True):
+    def push_file_to_guest(self, vm, username, password, src, dest, overwrite=True, checksum_alg=None, checksum=None):
 
         ''' Use VMWare's filemanager api to push a file over http '''
 
         result = {'failed': False}
 
+        # a checksum to verify is computed with sha1 unless told otherwise
+        if checksum and not checksum_alg:
+            checksum_alg = 'sha1'
+
         tools_status = vm.guest.toolsStatus
         if (tools_status == 'toolsNotInstalled' or
                 tools_status == 'toolsNotRunning'):
@@ -1016,38 +1042,49 @@ class PyVmomiHelper(object):
             username=username, password=password
         )
 
-        # the api requires a filesize in bytes
+        # the api requires a filesize in bytes, the data itself is streamed
+        # from the file while it is sent
         filesize = None
-        fdata = None
         try:
-            #filesize = os.path.getsize(src)
-            filesize = os.stat(src).st_size
-            fdata = None
-            with open(src, 'rb') as f:
-                fdata = f.read()
+            fsrc = open(src, 'rb')
+            filesize = os.fstat(fsrc.fileno()).st_size
             result['local_filesize'] = filesize
         except Exception as e:
             result['failed'] = True
             result['msg'] = "Unable to read src file: %s" % str(e)
             return result
 
-        # https://www.vmware.com/support/developer/converter-sdk/conv60_apireference/vim.vm.guest.FileManager.html#initiateFileTransferToGuest
-        file_attribute = vim.vm.guest.FileManager.FileAttributes()
-        url = self.content.guestOperationsManager.fileManager. \
-                InitiateFileTransferToGuest(vm, creds, dest, file_attribute, 
-                                            filesize, overwrite)
-
-        # PUT the filedata to the url ...
-        rsp, info = fetch_url(self.module, url, method="put", data=fdata,
-                             use_proxy=False, force=True, last_mod_time=None, 
-                             timeout=10, headers=None)
-
-        result['msg'] = str(rsp.read())
+        try:
+            # https://www.vmware.com/support/developer/converter-sdk/conv60_apireference/vim.vm.guest.FileManager.html#initiateFileTransferToGuest
+            file_attribute = vim.vm.guest.FileManager.FileAttributes()
+            url = self.content.guestOperationsManager.fileManager. \
+                    InitiateFileTransferToGuest(vm, creds, dest, file_attribute, 
+                                                filesize, overwrite)
+
+            # PUT the filedata to the url ...
+            fdata = HashingReader(fsrc, checksum_alg)
+            rsp, info = fetch_url(self.module, url, method="put", data=fdata,
+                                 use_proxy=False, force=True, last_mod_time=None, 
+                                 timeout=10, headers={'Content-Length': str(filesize)})
+        finally:
+            fsrc.close()
+
+        if rsp:
+            result['msg'] = str(rsp.read())
 
         # save all of the transfer data
-        for k,v in info.iteritems():
+        for k,v in info.items():
             result[k] = v
 
+        if fdata.digest:
+            result['checksum'] = fdata.digest.hexdigest()
+        if fdata.size != filesize:
+            result['failed'] = True
+            result['msg'] = "%s changed size while it was sent (%d of %d bytes)" % (src, fdata.size, filesize)
+        elif checksum and result['checksum'] != checksum.lower():
+            result['failed'] = True
+            result['msg'] = "%s checksum is %s instead of %s" % (checksum_alg, result['checksum'], checksum)
+
         return result
 
 
@@ -1205,25 +1242,114 @@ class PyVmomiHelper(object):
 
         return result
 
-def get_obj(content, vimtype, name):
+def collect_properties(content, root, properties, page_size=PROPERTY_PAGE_SIZE):
     """
-    Return an object by name, if name is None the
-    first found object is returned
+    Retrieve the given properties of all objects of the given types below
+    root with the PropertyCollector, page_size objects per round trip,
+    instead of one round trip per object and property.
+    properties maps a vim type to a list of property paths, the result is
+    a list of (object, {path: value}) tuples. Unset properties are missing.
     """
-    obj = None
     container = content.viewManager.CreateContainerView(
-        content.rootFolder, vimtype, True)
-    for c in container.view:
-        if name:
-            if c.name == name:
-                obj = c
+        root, list(properties.keys()), True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False,
+            type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=container, skip=True, selectSet=[traversal_spec])
+        property_specs = [
+            vmodl.query.PropertyCollector.PropertySpec(type=vimtype, pathSet=paths, all=False)
+            for vimtype, paths in properties.items()
+        ]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec], propSet=property_specs)
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+
+        objects = []
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        while result:
+            for obj in result.objects:
+                objects.append((obj.obj, dict((prop.name, prop.val) for prop in obj.propSet)))
+            if not result.token:
                 break
-        else:
-            obj = c
-            break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        container.Destroy()
+
+    return objects
 
-    container.Destroy()
-    return obj
+
+def wait_for_updates(content, objects, path, done, timeout=None):
+    """
+    Block until done(value) is true for the property path of all objects
+    (all of the same type), or until timeout seconds have passed. Instead
+    of polling every object, a filter on a private PropertyCollector is
+    waited on with WaitForUpdatesEx, which only returns when a watched
+    property changes. Returns the last value seen for every object.
+    """
+    if not objects:
+        return {}
+
+    collector = content.propertyCollector.CreatePropertyCollector()
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objects],
+        propSet=[vmodl.query.PropertyCollector.PropertySpec(type=type(objects[0]), pathSet=[path], all=False)])
+    property_filter = collector.CreateFilter(filter_spec, True)
+
+    values = dict((obj, None) for obj in objects)
+    pending = set(objects)
+    deadline = None
+    if timeout is not None:
+        deadline = time.time() + timeout
+
+    try:
+        version = ''
+        while pending:
+            options = vmodl.query.PropertyCollector.WaitOptions()
+            if deadline is not None:
+                remaining = int(deadline - time.time())
+                if remaining <= 0:
+                    break
+                options.maxWaitSeconds = remaining
+
+            update = collector.WaitForUpdatesEx(version, options)
+            if update is None:
+                # maxWaitSeconds passed without changes
+                continue
+            version = update.version
+
+            for filter_update in update.filterSet:
+                for object_update in filter_update.objectSet:
+                    obj = object_update.obj
+                    if object_update.kind == 'leave':
+                        # deleted, it is not going to change any more
+                        pending.discard(obj)
+                        continue
+                    for change in object_update.changeSet:
+                        if change.name != path:
+                            continue
+                        values[obj] = change.val
+                        if done(change.val):
+                            pending.discard(obj)
+    finally:
+        property_filter.Destroy()
+        collector.Destroy()
+
+    return values
+
+
+def get_obj(content, vimtype, name):
+    """
+    Return an object by name, if name is None the
+    first found object is returned
+    """
+    for obj, props in collect_properties(content, content.rootFolder,
+                                         dict((x, ['name']) for x in vimtype)):
+        if not name or props.get('name') == name:
+            return obj
+    return None
 
 
 def main():
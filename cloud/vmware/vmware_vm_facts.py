@@ -54,23 +54,70 @@ except ImportError:
     HAS_PYVMOMI = False
 
 
+# Number of objects per RetrievePropertiesEx page
+PROPERTY_PAGE_SIZE = 1000
+
+
+def collect_properties(content, root, properties, page_size=PROPERTY_PAGE_SIZE):
+    """
+    Retrieve the given properties of all objects of the given types below
+    root with the PropertyCollector, page_size objects per round trip,
+    instead of one round trip per object and property.
+    properties maps a vim type to a list of property paths, the result is
+    a list of (object, {path: value}) tuples. Unset properties are missing.
+    """
+    container = content.viewManager.CreateContainerView(
+        root, list(properties.keys()), True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False,
+            type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=container, skip=True, selectSet=[traversal_spec])
+        property_specs = [
+            vmodl.query.PropertyCollector.PropertySpec(type=vimtype, pathSet=paths, all=False)
+            for vimtype, paths in properties.items()
+        ]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec], propSet=property_specs)
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+
+        objects = []
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        while result:
+            for obj in result.objects:
+                objects.append((obj.obj, dict((prop.name, prop.val) for prop in obj.propSet)))
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        container.Destroy()
+
+    return objects
+
+
 # https://github.com/vmware/pyvmomi-community-samples/blob/master/samples/getallvms.py
 def get_all_virtual_machines(content):
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
+    virtual_machines = collect_properties(content, content.rootFolder, {
+        vim.VirtualMachine: [
+            'summary.config.name',
+            'summary.config.guestFullName',
+            'summary.runtime.powerState',
+            'summary.guest.ipAddress',
+        ]
+    })
     _virtual_machines = {}
 
-    for vm in virtual_machines:
-        _ip_address = ""
-        summary = vm.summary
-        if summary.guest is not None:
-            _ip_address = summary.guest.ipAddress
-            if _ip_address is None:
-                _ip_address = ""
+    for vm, summary in virtual_machines:
+        _ip_address = summary.get('summary.guest.ipAddress')
+        if _ip_address is None:
+            _ip_address = ""
 
         virtual_machine = {
-            summary.config.name: {
-                "guest_fullname": summary.config.guestFullName,
-                "power_state": summary.runtime.powerState,
+            summary.get('summary.config.name'): {
+                "guest_fullname": summary.get('summary.config.guestFullName'),
+                "power_state": summary.get('summary.runtime.powerState'),
                 "ip_address": _ip_address
             }
         }
@@ -115,6 +115,36 @@ options:
         required: false
         default: True
         version_added: "2.1"
+    values:
+        description:
+          - a dictionary of keys, relative to C(key), and their values that
+            the tree under C(key) should contain. The current tree is read with
+            a single recursive request and only the differences are written,
+            using the transaction endpoint of consul 0.7+ with up to 64
+            operations per transaction.
+          - each operation is checked against the ModifyIndex read from the
+            tree, so keys modified concurrently are not overwritten and fail
+            the task instead. Each transaction is atomic, the whole sync is not.
+          - mutually exclusive with C(value) and C(src).
+        required: false
+        default: None
+        version_added: "2.3"
+    src:
+        description:
+          - a directory on the remote host whose files should be synced
+            under C(key), like C(values). The path of each file relative to
+            C(src) is its key and its content is its value.
+          - mutually exclusive with C(value) and C(values).
+        required: false
+        default: None
+        version_added: "2.3"
+    purge:
+        description:
+          - when syncing with C(values) or C(src), remove the keys under
+            C(key) that are not part of the synced tree.
+        required: false
+        default: false
+        version_added: "2.3"
 """
 
 
@@ -141,12 +171,30 @@ EXAMPLES = '''
       value: 20160509
       session: "{{ sessionid }}"
       state: acquire
+
+  - name: sync an application configuration tree, removing stale keys
+    consul_kv:
+      key: config/myapp
+      values:
+        db/host: db.example.com
+        db/port: 5432
+        features/beta: 'false'
+      purge: yes
+
+  - name: sync the files of a directory on the agent host under a prefix
+    consul_kv:
+      key: config/myapp
+      src: /etc/myapp/consul
 '''
 
+import base64
+import json
+import os
 import sys
 
 try:
     import consul
+    import requests
     from requests.exceptions import ConnectionError
     python_consul_installed = True
 except ImportError:
@@ -154,6 +202,10 @@ except ImportError:
 
 from requests.exceptions import ConnectionError
 
+# maximum number of operations consul accepts in a single transaction
+TXN_MAX_OPS = 64
+
+
 def execute(module):
 
     state = module.params.get('state')
@@ -161,6 +213,8 @@ def execute(module):
     if state == 'acquire' or state == 'release':
         lock(module, state)
     if state == 'present':
+        if module.params.get('values') is not None or module.params.get('src'):
+            sync_tree(module)
         add_value(module)
     else:
         remove_value(module)
@@ -244,6 +298,128 @@ def remove_value(module):
                      data=existing)
 
 
+def to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if not isinstance(value, basestring):
+        value = str(value)
+    return value.encode('utf-8')
+
+
+def read_tree(src):
+    ''' read the files under src into a dictionary of relative key to content '''
+    values = {}
+    for root, dirs, files in os.walk(src):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, src).replace(os.sep, '/')
+            f = open(path, 'rb')
+            try:
+                values[rel] = f.read()
+            finally:
+                f.close()
+    return values
+
+
+def diff_tree(prefix, existing, values, flags, purge):
+    ''' compute the transaction operations turning the existing entries under
+    prefix into values '''
+    current = dict((entry['Key'], entry) for entry in existing or [])
+    operations = []
+    added, updated, removed = [], [], []
+
+    for rel in sorted(values):
+        key = prefix + rel.lstrip('/')
+        value = to_bytes(values[rel])
+        entry = current.pop(key, None)
+        if entry is None:
+            # cas against index 0 only creates the key if it is still absent
+            index = 0
+            added.append(key)
+        elif (entry['Value'] or b'') != value or \
+                (flags is not None and entry.get('Flags') != flags):
+            index = entry['ModifyIndex']
+            updated.append(key)
+        else:
+            continue
+        operation = {'Verb': 'cas', 'Key': key, 'Index': index,
+                     'Value': base64.b64encode(value).decode('ascii')}
+        if flags is not None:
+            operation['Flags'] = flags
+        operations.append({'KV': operation})
+
+    if purge:
+        for key in sorted(current):
+            # keys ending with a slash are folders created by the ui
+            if key.endswith('/'):
+                continue
+            operations.append({'KV': {'Verb': 'delete-cas', 'Key': key,
+                                      'Index': current[key]['ModifyIndex']}})
+            removed.append(key)
+
+    return operations, added, updated, removed
+
+
+def apply_txn(module, operations):
+    ''' apply the operations with the transaction endpoint, TXN_MAX_OPS at a time '''
+    url = '%s://%s:%s/v1/txn' % (module.params.get('scheme'),
+                                 module.params.get('host'),
+                                 module.params.get('port'))
+    params = {}
+    if module.params.get('token'):
+        params['token'] = module.params.get('token')
+
+    session = requests.Session()
+    for start in range(0, len(operations), TXN_MAX_OPS):
+        chunk = operations[start:start + TXN_MAX_OPS]
+        response = session.put(url, params=params, data=json.dumps(chunk),
+                               verify=module.params.get('validate_certs'))
+        if response.status_code == 409:
+            errors = response.json().get('Errors') or []
+            module.fail_json(
+                msg='transaction rolled back, %d of %d operations applied before it: %s' % (
+                    start, len(operations),
+                    ', '.join('%s: %s' % (chunk[e['OpIndex']]['KV']['Key'], e['What'])
+                              for e in errors)))
+        elif response.status_code != 200:
+            module.fail_json(msg='transaction failed with status %s: %s' % (
+                response.status_code, response.text))
+
+
+def sync_tree(module):
+    ''' make the tree under key match values or the files in src, reading it
+    with one recursive request and writing the differences in transactions '''
+    consul_api = get_consul_api(module)
+
+    key = module.params.get('key')
+    values = module.params.get('values')
+    src = module.params.get('src')
+    flags = module.params.get('flags')
+    if flags is not None:
+        flags = int(flags)
+
+    if src:
+        if not os.path.isdir(src):
+            module.fail_json(msg='src %s is not a directory' % src)
+        values = read_tree(src)
+
+    prefix = key.rstrip('/') + '/'
+    index, existing = consul_api.kv.get(prefix, recurse=True)
+
+    operations, added, updated, removed = diff_tree(
+        prefix, existing, values, flags, module.params.get('purge'))
+
+    if operations:
+        apply_txn(module, operations)
+
+    module.exit_json(changed=bool(operations),
+                     index=index,
+                     key=key,
+                     added=added,
+                     updated=updated,
+                     removed=removed)
+
+
 def get_consul_api(module, token=None):
     return consul.Consul(host=module.params.get('host'),
                          port=module.params.get('port'),
@@ -271,10 +447,15 @@ def main():
         state=dict(default='present', choices=['present', 'absent', 'acquire', 'release']),
         token=dict(required=False, no_log=True),
         value=dict(required=False),
+        values=dict(required=False, type='dict'),
+        src=dict(required=False, type='path'),
+        purge=dict(required=False, type='bool', default=False),
         session=dict(required=False)
     )
 
-    module = AnsibleModule(argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec,
+                           mutually_exclusive=[['value', 'values', 'src']],
+                           supports_check_mode=False)
 
     test_dependencies(module)
 
@@ -89,6 +89,31 @@ options:
         hostname matching (exists in >= python3.5.0).
     required: false
     default: false
+  skip_unchanged:
+    description:
+      - List the existing objects of each kind and namespace of the data once,
+        compare them locally with the data and only send the writes that are
+        needed. An object matches when every field set in the data has the
+        same value on the existing object.
+      - With C(present) existing objects are left alone, with C(update) and
+        C(replace) only the objects that differ are written and with C(absent)
+        only the existing objects are deleted.
+      - The writes are sent by C(threads) workers, each over a persistent HTTP
+        connection. Namespaces and other cluster wide objects are written
+        first, then service accounts, secrets, services and the like, then pods
+        and replication controllers; deletions happen in the reverse order.
+      - Every object of the data must have a kind and a metadata name.
+      - Requires Python 2.6 or later, and Python 2.7.9 or later with
+        C(validate_certs), which then uses the default CA bundle of the system.
+    required: false
+    default: false
+    version_added: "2.3"
+  threads:
+    description:
+      - Number of concurrent API requests when C(skip_unchanged) is set.
+    required: false
+    default: 4
+    version_added: "2.3"
 
 author: "Eric Johnson (@erjohnso) <erjohnso@google.com>"
 '''
@@ -130,6 +155,17 @@ EXAMPLES = '''
     file_reference: /path/to/create_namespace.yaml
     state: present
 
+# Replace only the objects of a large manifest that changed
+- name: Apply application manifests
+  kubernetes:
+    api_endpoint: 123.45.67.89
+    url_username: admin
+    url_password: redacted
+    file_reference: /path/to/application.yaml
+    state: replace
+    skip_unchanged: true
+    threads: 8
+
 '''
 
 RETURN = '''
@@ -155,6 +191,14 @@ api_response:
 '''
 
 import base64
+import socket
+import threading
+
+try:
+    import httplib
+except ImportError:
+    # Python 3
+    import http.client as httplib
 
 try:
     import yaml
@@ -162,6 +206,13 @@ try:
 except ImportError:
     has_lib_yaml = False
 
+if has_lib_yaml:
+    # the libyaml based loader is several times faster on large manifests
+    try:
+        from yaml import CLoader as YamlLoader
+    except ImportError:
+        from yaml import Loader as YamlLoader
+
 ############################################################################
 ############################################################################
 # For API coverage, this Anislbe module provides capability to operate on
@@ -218,6 +269,16 @@ KIND_URL = {
 }
 USER_AGENT = "ansible-k8s-module/0.0.1"
 
+# Objects of the kinds in a wave may depend on the kinds of the previous
+# waves (namespaces, service accounts, secrets...), so skip_unchanged writes
+# the waves one after the other, and deletes them in the reverse order.
+KIND_WAVES = [
+    ["namespace", "node", "persistentvolume"],
+    ["endpoints", "limitrange", "persistentvolumeclaim", "podtemplate",
+     "resourcequota", "secret", "service", "serviceaccount"],
+    ["binding", "pod", "replicationcontroller"],
+]
+
 
 # TODO(erjohnso): SSL Certificate validation is currently unsupported.
 # It can be made to work when the following are true:
@@ -312,6 +373,200 @@ def k8s_update_resource(module, url, data):
     return True, body
 
 
+class K8sApiClient(object):
+    """Send API requests over one persistent connection per thread."""
+
+    def __init__(self, module, transport, api_endpoint):
+        self.module = module
+        self.transport = transport
+        if '/' in api_endpoint:
+            self.host, self.prefix = api_endpoint.split('/', 1)
+            self.prefix = '/' + self.prefix.rstrip('/')
+        else:
+            self.host, self.prefix = api_endpoint, ''
+        self.local = threading.local()
+        self.headers = {"User-Agent": module.params.get('http_agent'),
+                        "Accept": "application/json"}
+        username = module.params.get('url_username')
+        if username and not module.params.get('insecure'):
+            credentials = "%s:%s" % (username, module.params.get('url_password'))
+            self.headers["Authorization"] = "Basic %s" % base64.b64encode(
+                credentials.encode('utf-8')).decode('ascii')
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.transport == 'https':
+                kwargs = {}
+                if not self.module.params.get('validate_certs'):
+                    import ssl
+                    if hasattr(ssl, '_create_unverified_context'):
+                        kwargs['context'] = ssl._create_unverified_context()
+                conn = httplib.HTTPSConnection(self.host, **kwargs)
+            else:
+                conn = httplib.HTTPConnection(self.host)
+            self.local.conn = conn
+        return conn
+
+    def request(self, path, method="GET", headers=None, data=None):
+        all_headers = dict(self.headers)
+        all_headers.update(headers or {})
+        if data is not None:
+            data = json.dumps(data)
+        for attempt in (1, 2):
+            conn = self.connection()
+            try:
+                conn.request(method, self.prefix + path, data, all_headers)
+                response = conn.getresponse()
+                raw = response.read()
+                break
+            except (httplib.HTTPException, socket.error):
+                # the server may close an idle connection, reconnect once
+                conn.close()
+                self.local.conn = None
+                if attempt == 2:
+                    raise
+        body = None
+        if raw:
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                body = raw
+        return {'status': response.status, 'msg': response.reason}, body
+
+
+def k8s_object_matches(desired, existing):
+    if isinstance(desired, dict):
+        if not isinstance(existing, dict):
+            return False
+        for key, value in desired.items():
+            if not k8s_object_matches(value, existing.get(key)):
+                return False
+        return True
+    if isinstance(desired, list):
+        if not isinstance(existing, list) or len(desired) != len(existing):
+            return False
+        for d, e in zip(desired, existing):
+            if not k8s_object_matches(d, e):
+                return False
+        return True
+    return desired == existing
+
+
+def k8s_list_resources(client, path):
+    info, body = client.request(path)
+    if info['status'] >= 400:
+        return None, "failed to list %s: %s" % (path, info['msg'])
+    items = {}
+    for item in (body or {}).get('items') or []:
+        items[item['metadata']['name']] = item
+    return items, None
+
+
+def k8s_write_resource(client, op):
+    method, path, item, name = op
+    if method == "DELETE":
+        info, body = client.request(path + '/' + name, method="DELETE")
+        if info['status'] == 404:
+            return False, "Resource name '%s' already absent" % name, None
+        if info['status'] >= 400:
+            return False, None, "failed to delete the resource '%s': %s" % (name, info['msg'])
+        return True, "Successfully deleted resource name '%s'" % name, None
+
+    if method == "POST":
+        info, body = client.request(path, method="POST", data=item,
+                                    headers={"Content-Type": "application/json"})
+    elif method == "PUT":
+        info, body = client.request(path + '/' + name, method="PUT", data=item,
+                                    headers={"Content-Type": "application/json"})
+    else:
+        info, body = client.request(path + '/' + name, method="PATCH", data=item,
+                                    headers={"Content-Type": "application/strategic-merge-patch+json"})
+    if info['status'] == 409:
+        info, body = client.request(path + '/' + name)
+        return False, body, None
+    if info['status'] >= 400:
+        return False, None, "failed to write the resource '%s': %s" % (name, info['msg'])
+    return True, body, None
+
+
+def k8s_any_changed(results):
+    for result in results:
+        if result and result[0]:
+            return True
+    return False
+
+
+def k8s_sync_resources(module, client, data, state, threads):
+    """Write the objects of data that differ from the listed existing ones."""
+    waves = {}
+    for wave, kinds in enumerate(KIND_WAVES):
+        for kind in kinds:
+            waves[kind] = wave
+
+    targets = []
+    for item in data:
+        kind = (item or {}).get('kind', '').lower()
+        name = (item or {}).get('metadata', {}).get('name')
+        if kind not in KIND_URL:
+            module.fail_json(msg="invalid resource kind specified in the data: '%s'" % kind)
+        if name is None:
+            module.fail_json(msg="Missing a named resource in object metadata")
+        namespace = item['metadata'].get('namespace', "default")
+        targets.append((kind, name, KIND_URL[kind].replace("{namespace}", namespace), item))
+
+    try:
+        from multiprocessing.pool import ThreadPool
+    except ImportError:
+        module.fail_json(msg="skip_unchanged requires Python 2.6 or later")
+    pool = ThreadPool(min(threads, len(targets)) or 1)
+    try:
+        paths = sorted(set(t[2] for t in targets))
+        listed = pool.map(lambda path: k8s_list_resources(client, path), paths)
+        existing = {}
+        for path, (items, error) in zip(paths, listed):
+            if error:
+                module.fail_json(msg=error)
+            existing[path] = items
+
+        # the results keep the order of the data
+        results = [None] * len(targets)
+        ops = [[] for wave in KIND_WAVES]
+        for index, (kind, name, path, item) in enumerate(targets):
+            current = existing[path].get(name)
+            desired = dict((k, v) for k, v in item.items() if k not in ('apiVersion', 'kind', 'status'))
+            if state == 'absent':
+                if current is None:
+                    results[index] = (False, "Resource name '%s' already absent" % name, None)
+                    continue
+                method = "DELETE"
+            elif current is None and state == 'present':
+                method = "POST"
+            elif current is not None and (state == 'present' or k8s_object_matches(desired, current)):
+                results[index] = (False, current, None)
+                continue
+            elif state == 'replace':
+                method = "PUT"
+            else:
+                method = "PATCH"
+            ops[waves[kind]].append((index, (method, path, item, name)))
+
+        if state == 'absent':
+            ops.reverse()
+        for wave in ops:
+            written = pool.map(lambda op: k8s_write_resource(client, op[1]), wave)
+            for (index, op), result in zip(wave, written):
+                results[index] = result
+            errors = [r[2] for r in written if r[2]]
+            if errors:
+                module.fail_json(msg="; ".join(errors),
+                                 changed=k8s_any_changed(results))
+    finally:
+        pool.close()
+
+    return k8s_any_changed(results), [r[1] for r in results]
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
@@ -326,7 +581,9 @@ def main():
             api_endpoint=dict(required=True),
             file_reference=dict(required=False),
             inline_data=dict(required=False),
-            state=dict(default="present", choices=["present", "absent", "update", "replace"])
+            state=dict(default="present", choices=["present", "absent", "update", "replace"]),
+            skip_unchanged=dict(default=False, type='bool'),
+            threads=dict(default=4, type='int'),
         ),
         mutually_exclusive = (('file_reference', 'inline_data'),
                               ('url_username', 'insecure'),
@@ -347,13 +604,13 @@ def main():
 
     if inline_data:
         if not isinstance(inline_data, dict) and not isinstance(inline_data, list):
-            data = yaml.load(inline_data)
+            data = yaml.load(inline_data, Loader=YamlLoader)
         else:
             data = inline_data
     else:
         try:
             f = open(file_reference, "r")
-            data = [x for x in yaml.load_all(f)]
+            data = [x for x in yaml.load_all(f, Loader=YamlLoader)]
             f.close()
             if not data:
                 module.fail_json(msg="No valid data could be found.")
@@ -374,6 +631,26 @@ def main():
     if not isinstance(data, list):
         data = [ data ]
 
+    if module.params.get('skip_unchanged'):
+        if module.params.get('threads') < 1:
+            module.fail_json(msg="threads must be a positive number")
+        if transport == 'https' and module.params.get('validate_certs'):
+            try:
+                import ssl
+            except ImportError:
+                ssl = None
+            if not hasattr(ssl, 'create_default_context'):
+                module.fail_json(msg="validate_certs with skip_unchanged requires Python 2.7.9 or later")
+        data = [item for item in data if item]
+        client = K8sApiClient(module, transport, api_endpoint)
+        try:
+            changed, body = k8s_sync_resources(module, client, data, state,
+                                               module.params.get('threads'))
+        except (httplib.HTTPException, socket.error):
+            e = get_exception()
+            module.fail_json(msg="Failed to execute the API request: %s" % str(e))
+        module.exit_json(changed=changed, api_response=body)
+
     for item in data:
         namespace = "default"
         if item and 'metadata' in item:
@@ -405,6 +682,7 @@ def main():
 # import module snippets
 from ansible.module_utils.basic import *    # NOQA
 from ansible.module_utils.urls import *     # NOQA
+from ansible.module_utils.pycompat24 import get_exception
 
 
 if __name__ == '__main__':
@@ -33,7 +33,8 @@ options:
     name:
         description:
             - The path of the znode.
-        required: true
+            - Required unless C(values) is given.
+        required: false
     value:
         description:
             - The value assigned to the znode.
@@ -51,7 +52,9 @@ options:
         required: false
     timeout:
         description:
-            - The amount of time to wait for a node to appear.
+            - The amount of time to wait for a node to appear. The wait is
+              driven by a ZooKeeper watch, so it returns as soon as the node
+              is created.
         default: 300
         required: false
     recursive:
@@ -60,6 +63,20 @@ options:
         default: False
         required: false
         version_added: "2.1"
+    values:
+        description:
+            - A dictionary of znode paths and values to apply with C(state),
+              instead of C(name) and C(value).
+            - The current znodes are read with pipelined requests, then all the
+              changes are committed in a single ZooKeeper transaction, so either
+              all of them are applied or none. Updates and deletions are checked
+              against the version that was read.
+            - With C(state=present) missing parent znodes are created. With
+              C(state=absent) the values are ignored, the znodes are deleted
+              children first and must not have other children.
+        default: None
+        required: false
+        version_added: "2.3"
 requirements:
     - kazoo >= 2.1
     - python >= 2.6
@@ -98,8 +115,18 @@ EXAMPLES = """
     hosts: 'localhost:2181'
     name: /mypath
     state: absent
+
+# Creating or updating several znodes in one transaction
+- znode:
+    hosts: 'localhost:2181'
+    values:
+      /myapp/config/db_host: db.example.com
+      /myapp/config/db_port: 5432
+    state: present
 """
 
+import threading
+
 try:
     from kazoo.client import KazooClient
     from kazoo.exceptions import NoNodeError, ZookeeperError
@@ -113,12 +140,13 @@ def main():
     module = AnsibleModule(
         argument_spec=dict(
             hosts=dict(required=True, type='str'),
-            name=dict(required=True, type='str'),
+            name=dict(required=False, type='str'),
             value=dict(required=False, default=None, type='str'),
             op=dict(required=False, default=None, choices=['get', 'wait', 'list']),
             state=dict(choices=['present', 'absent']),
             timeout=dict(required=False, default=300, type='int'),
-            recursive=dict(required=False, default=False, type='bool')
+            recursive=dict(required=False, default=False, type='bool'),
+            values=dict(required=False, default=None, type='dict')
         ),
         supports_check_mode=False
     )
@@ -150,7 +178,10 @@ def main():
 
     command_type = 'op' if 'op' in module.params and module.params['op'] is not None else 'state'
     method = module.params[command_type]
-    result, result_dict = command_dict[command_type][method]()
+    if module.params['values'] is not None:
+        result, result_dict = zoo.bulk()
+    else:
+        result, result_dict = command_dict[command_type][method]()
     zoo.shutdown()
 
     if result:
@@ -166,6 +197,14 @@ def check_params(params):
     if params['state'] and params['op']:
         return {'success': False, 'msg': 'Please choose an operation (op) or a state, but not both.'}
 
+    if params['values'] is not None:
+        if params['name']:
+            return {'success': False, 'msg': 'Please choose a name or values, but not both.'}
+        if not params['state']:
+            return {'success': False, 'msg': 'Please define a state to apply the values.'}
+    elif not params['name']:
+        return {'success': False, 'msg': 'Please define a znode name or values.'}
+
     return {'success': True}
 
 
@@ -177,6 +216,11 @@ class KazooCommandProxy():
     def absent(self):
         return self._absent(self.module.params['name'])
 
+    def bulk(self):
+        if self.module.params['state'] == 'present':
+            return self._bulk_present(self.module.params['values'])
+        return self._bulk_absent(list(self.module.params['values']))
+
     def exists(self, znode):
         return self.zk.exists(znode)
 
@@ -237,19 +281,104 @@ class KazooCommandProxy():
             self.zk.create(path, value, makepath=True)
             return True, {'changed': True, 'msg': 'Created a new znode.', 'znode': path, 'value': value}
 
-    def _wait(self, path, timeout, interval=5):
-        lim = time.time() + timeout
-
-        while time.time() < lim:
-            if self.exists(path):
-                return True, {'msg': 'The node appeared before the configured timeout.',
-                              'znode': path, 'timeout': timeout}
+    def _bulk_get(self, paths):
+        # send all the requests before waiting for the first answer
+        requests = [(path, self.zk.get_async(path)) for path in paths]
+        nodes = {}
+        for path, request in requests:
+            try:
+                nodes[path] = request.get()
+            except NoNodeError:
+                pass
+        return nodes
+
+    def _bulk_commit(self, transaction, changes):
+        results = transaction.commit()
+        errors = ['%s: %s' % (path, result.__class__.__name__)
+                  for path, result in zip(changes, results) if isinstance(result, Exception)]
+        if errors:
+            return False, {'msg': 'The transaction was rolled back: %s' % ', '.join(errors)}
+        return True, None
+
+    def _bulk_present(self, values):
+        values = dict((path, _to_bytes(value)) for path, value in values.items())
+        nodes = self._bulk_get(sorted(values))
+
+        parents = set()
+        for path in values:
+            if path not in nodes:
+                parent = path.rsplit('/', 1)[0]
+                while parent and parent not in values:
+                    parents.add(parent)
+                    parent = parent.rsplit('/', 1)[0]
+        existing_parents = self._bulk_get(sorted(parents))
+
+        transaction = self.zk.transaction()
+        changes, created, updated = [], [], []
+        # parents sort before their children
+        for path in sorted(parents.union(values)):
+            if path in nodes or path in existing_parents:
+                if path in nodes and nodes[path][0] != values[path]:
+                    transaction.set_data(path, values[path], version=nodes[path][1].version)
+                    changes.append(path)
+                    updated.append(path)
             else:
-                time.sleep(interval)
+                transaction.create(path, values.get(path, b''))
+                changes.append(path)
+                created.append(path)
+
+        if changes:
+            success, result = self._bulk_commit(transaction, changes)
+            if not success:
+                return success, result
+        return True, {'changed': bool(changes), 'msg': 'Applied the znode values.',
+                      'created': created, 'updated': updated}
+
+    def _bulk_absent(self, paths):
+        nodes = self._bulk_get(paths)
+
+        transaction = self.zk.transaction()
+        changes = []
+        # children are deleted before their parents
+        for path in sorted(nodes, reverse=True):
+            transaction.delete(path, version=nodes[path][1].version)
+            changes.append(path)
+
+        if changes:
+            success, result = self._bulk_commit(transaction, changes)
+            if not success:
+                return success, result
+        return True, {'changed': bool(changes), 'msg': 'Deleted the znodes.', 'deleted': changes}
+
+    def _wait(self, path, timeout):
+        appeared = threading.Event()
+
+        def watcher(data, stat):
+            if stat is not None:
+                appeared.set()
+                # stop watching
+                return False
+
+        self.zk.DataWatch(path, watcher)
+        appeared.wait(timeout)
+
+        if appeared.is_set():
+            return True, {'msg': 'The node appeared before the configured timeout.',
+                          'znode': path, 'timeout': timeout}
 
         return False, {'msg': 'The node did not appear before the operation timed out.', 'timeout': timeout,
                        'znode': path}
 
+
+def _to_bytes(value):
+    if value is None:
+        return b''
+    if isinstance(value, bytes):
+        return value
+    if not hasattr(value, 'encode'):
+        value = str(value)
+    return value.encode('utf-8')
+
 from ansible.module_utils.basic import *
 
 if __name__ == '__main__':
@@ -70,9 +70,21 @@ options:
     name:
         description:
             - The name of the user to add or remove
-        required: true
+            - Required unless C(users) is given.
+        required: false
         default: null
         aliases: [ 'user' ]
+    users:
+        version_added: "2.3"
+        description:
+            - A list of users to reconcile in C(database) in a single run, as an alternative to C(name).
+            - Each item is a dictionary with a required C(name) key and optional C(password), C(roles),
+              C(state) and C(update_password) keys; missing keys default to the module level options.
+            - The existing users are listed once with the usersInfo command, then only the required
+              createUser, updateUser and dropUser commands are sent. This requires MongoDB 2.6+.
+            - Mutually exclusive with C(name).
+        required: false
+        default: null
     password:
         description:
             - The password to use for the user
@@ -162,6 +174,20 @@ EXAMPLES = '''
     roles: readWriteAnyDatabase
     state: present
 
+# Reconcile several 'burgers' users at once
+- mongodb_user:
+    database: burgers
+    update_password: on_create
+    users:
+      - name: ben
+        password: 12345
+        roles: read
+      - name: jim
+        password: 12345
+        roles: ['readWrite', 'dbAdmin']
+      - name: joe
+        state: absent
+
 # add a user to database in a replica set, the primary server is automatically discovered and written to
 - mongodb_user:
     database: burgers
@@ -189,6 +215,29 @@ EXAMPLES = '''
 
 '''
 
+RETURN = '''
+user:
+    description: The name of the user, when C(name) is used.
+    returned: when name is given
+    type: string
+    sample: "bob"
+created:
+    description: Users created, when C(users) is used.
+    returned: when users is given
+    type: list
+    sample: ["ben"]
+updated:
+    description: Users whose password or roles were updated, when C(users) is used.
+    returned: when users is given
+    type: list
+    sample: ["jim"]
+removed:
+    description: Users removed, when C(users) is used.
+    returned: when users is given
+    type: list
+    sample: ["joe"]
+'''
+
 import ssl as ssl_lib
 import ConfigParser
 from distutils.version import LooseVersion
@@ -247,17 +296,35 @@ def user_find(client, user, db_name):
     Returns:
         dict: when user exists, False otherwise.
     """
-    for mongo_user in client["admin"].system.users.find():
-        if mongo_user['user'] == user:
-            # NOTE: there is no 'db' field in mongo 2.4.
-            if 'db' not in mongo_user:
-                return mongo_user
-
-            if mongo_user["db"] == db_name:
-                return mongo_user
+    try:
+        users = client[db_name].command('usersInfo', {'user': user, 'db': db_name})['users']
+    except OperationFailure:
+        # NOTE: usersInfo does not exist in mongo 2.4, query the collection
+        # instead; there is no 'db' field in the documents either.
+        users = client["admin"].system.users.find({
+            'user': user,
+            '$or': [{'db': db_name}, {'db': {'$exists': False}}],
+        }).limit(1)
+
+    for mongo_user in users:
+        return mongo_user
     return False
 
 
+def users_list(client, db_name):
+    """List all the users of a database.
+
+    Args:
+        client (cursor): Mongodb cursor on admin database.
+        db_name (str): Users' database.
+
+    Returns:
+        dict: user documents keyed by user name.
+    """
+    users = client[db_name].command('usersInfo', 1)['users']
+    return dict((mongo_user['user'], mongo_user) for mongo_user in users)
+
+
 def user_add(module, client, db_name, user, password, roles):
     #pymongo's user_add is a _create_or_update_user so we won't know if it was changed or updated
     #without reproducing a lot of the logic in database.py of pymongo
@@ -278,6 +345,74 @@ def user_remove(module, client, db_name, user):
     else:
         module.exit_json(changed=False, user=user)
 
+def users_sync(module, client, db_name, users):
+    """Create, update or remove many users of a database.
+
+    The existing users are listed once, then only the commands needed
+    to reconcile them are sent.
+
+    Args:
+        module: Ansible module.
+        client (cursor): Mongodb cursor on admin database.
+        db_name (str): Users' database.
+        users (list): User dictionaries, see the C(users) option.
+
+    Returns:
+        dict: names of the created, updated and removed users.
+    """
+    result = dict(created=[], updated=[], removed=[])
+    existing = users_list(client, db_name)
+    commands = []
+
+    for item in users:
+        user = item['name']
+        password = item.get('password')
+        if password is None:
+            password = module.params['password']
+        roles = item.get('roles')
+        if roles is None:
+            roles = module.params['roles'] or []
+        if isinstance(roles, basestring):
+            roles = [r.strip() for r in roles.split(',')]
+        state = item.get('state') or module.params['state']
+        update_password = item.get('update_password') or module.params['update_password']
+        uinfo = existing.get(user)
+
+        if state == 'absent':
+            if uinfo:
+                commands.append(('dropUser', user, {}))
+                result['removed'].append(user)
+            continue
+
+        if uinfo is None:
+            if password is None:
+                module.fail_json(msg='password is required to create user %s' % user)
+            commands.append(('createUser', user, dict(pwd=password, roles=roles)))
+            result['created'].append(user)
+            continue
+
+        params = {}
+        if update_password == 'always':
+            if password is None:
+                module.fail_json(msg='password is required for user %s unless update_password is set to on_create' % user)
+            params['pwd'] = password
+        if check_if_roles_changed(uinfo, roles, db_name):
+            params['roles'] = roles
+        if params:
+            commands.append(('updateUser', user, params))
+            result['updated'].append(user)
+
+    if not module.check_mode:
+        db = client[db_name]
+        for command, user, params in commands:
+            try:
+                db.command(command, user, **params)
+            except Exception:
+                e = get_exception()
+                module.fail_json(msg='Unable to %s %s: %s' % (command, user, str(e)), **result)
+
+    return result
+
 def load_mongocnf():
     config = ConfigParser.RawConfigParser()
     mongocnf = os.path.expanduser('~/.mongodb.cnf')
@@ -345,7 +480,8 @@ def main():
             login_database=dict(default=None),
             replica_set=dict(default=None),
             database=dict(required=True, aliases=['db']),
-            name=dict(required=True, aliases=['user']),
+            name=dict(default=None, aliases=['user']),
+            users=dict(default=None, type='list'),
             password=dict(aliases=['pass']),
             ssl=dict(default=False, type='bool'),
             roles=dict(default=None, type='list'),
@@ -353,6 +489,8 @@ def main():
             update_password=dict(default="always", choices=["always", "on_create"]),
             ssl_cert_reqs=dict(default='CERT_REQUIRED', choices=['CERT_NONE', 'CERT_OPTIONAL', 'CERT_REQUIRED']),
         ),
+        mutually_exclusive=[['name', 'users']],
+        required_one_of=[['name', 'users']],
         supports_check_mode=True
     )
 
@@ -368,6 +506,7 @@ def main():
     replica_set = module.params['replica_set']
     db_name = module.params['database']
     user = module.params['name']
+    users = module.params['users']
     password = module.params['password']
     ssl = module.params['ssl']
     ssl_cert_reqs = None
@@ -413,6 +552,16 @@ def main():
         e = get_exception()
         module.fail_json(msg='unable to connect to database: %s' % str(e))
 
+    if users is not None:
+        for item in users:
+            if not isinstance(item, dict) or not item.get('name'):
+                module.fail_json(msg='each item of users must be a dictionary with a name key')
+        if LooseVersion(client.server_info()['version']) < LooseVersion('2.6'):
+            module.fail_json(msg='the users option requires MongoDB 2.6+')
+        result = users_sync(module, client, db_name, users)
+        changed = bool(result['created'] or result['updated'] or result['removed'])
+        module.exit_json(changed=changed, **result)
+
     if state == 'present':
         if password is None and update_password == 'always':
             module.fail_json(msg='password parameter required when adding a user unless update_password is set to on_create')
@@ -74,6 +74,22 @@ options:
     required: false
     default: false
     choices: [ "false", "true" ]
+  commit_batches:
+    description:
+      - When C(autocommit) is false, commit the import every C(commit_batches) C(GO) delimited batches
+        instead of in a single transaction at the end. C(0) keeps the single transaction.
+    required: false
+    default: 0
+    version_added: "2.3"
+  bulk_insert:
+    description:
+      - Merge runs of consecutive single line C(INSERT ... VALUES (...)) statements for the same table
+        and columns into multi-row C(INSERT) statements of up to 1000 rows, which greatly speeds up
+        data dumps written one row per statement.
+      - A failing row then fails the whole merged statement, so only use it with trusted dumps.
+    required: false
+    default: false
+    version_added: "2.3"
 notes:
    - Requires the pymssql Python package on the remote host. For Ubuntu, this
      is as easy as pip install pymssql (See M(pip).)
@@ -98,13 +114,26 @@ EXAMPLES = '''
     name: my_db
     state: import
     target: /tmp/dump.sql
+
+# Restore a large data dump, committing every 100 batches
+- mssql_db:
+    name: my_db
+    state: import
+    target: /tmp/data.sql
+    commit_batches: 100
+    bulk_insert: yes
 '''
 
 RETURN  = '''
-#
+batches:
+    description: Number of C(GO) delimited batches executed by an import.
+    returned: when state is import
+    type: int
+    sample: 42
 '''
 
 import os
+import re
 try:
     import pymssql
 except ImportError:
@@ -132,26 +161,112 @@ def db_delete(conn, cursor, db):
     cursor.execute("DROP DATABASE [%s]" % db)
     return not db_exists(conn, cursor, db)
 
-def db_import(conn, cursor, module, db, target):
-    if os.path.isfile(target):
-        backup = open(target, 'r')
-        try:
-            sqlQuery = "USE [%s]\n" % db
-            for line in backup:
-                if line is None:
-                    break
-                elif line.startswith('GO'):
-                    cursor.execute(sqlQuery)
-                    sqlQuery = "USE [%s]\n" % db
-                else:
-                    sqlQuery += line
-            cursor.execute(sqlQuery)
-            conn.commit()
-        finally:
-            backup.close()
-        return 0, "import successful", ""
-    else:
-        return 1, "cannot find target file", "cannot find target file"
+# SQL Server limit on the row constructors of a single INSERT statement
+INSERT_MAX_ROWS = 1000
+
+INSERT_RE = re.compile(r"""^\s*(INSERT\s+(?:INTO\s+)?(?:\[[^\]]*\]|"[^"]*"|[\w.#@$])+\s*"""
+                       r"""(?:\([^)]*\)\s*)?VALUES)\s*(\(.*)$""", re.IGNORECASE)
+
+
+def single_row(values):
+    """Return the row of a VALUES clause made of exactly one parenthesized
+    row and an optional semicolon, None for anything else."""
+    values = values.strip()
+    if values.endswith(';'):
+        values = values[:-1].rstrip()
+    depth = 0
+    quoted = False
+    for i, c in enumerate(values):
+        if c == "'":
+            # a doubled quote inside a string toggles twice
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                if i == len(values) - 1:
+                    return values
+                return None
+    return None
+
+
+def merge_inserts(lines):
+    """Merge consecutive single line, single row INSERT statements on the
+    same target into multi-row INSERT statements."""
+    output = []
+    prefix = None
+    rows = []
+
+    def flush():
+        if rows:
+            output.append("%s %s\n" % (prefix, ",\n".join(rows)))
+
+    for line in lines:
+        match = INSERT_RE.match(line)
+        row = None
+        # an odd number of quotes means the values continue on the next line
+        if match is not None and not line.count("'") % 2:
+            row = single_row(match.group(2))
+        if row is None:
+            flush()
+            prefix, rows = None, []
+            output.append(line)
+            continue
+        if match.group(1) != prefix or len(rows) >= INSERT_MAX_ROWS:
+            flush()
+            prefix, rows = match.group(1), []
+        rows.append(row)
+    flush()
+    return output
+
+
+def iter_batches(backup, bulk_insert=False):
+    """Yield (first line number, SQL text) for each GO delimited batch
+    of the file, reading it one line at a time."""
+    lines = []
+    start = 1
+    for lineno, line in enumerate(backup, 1):
+        if line.startswith('GO'):
+            if lines:
+                if bulk_insert:
+                    lines = merge_inserts(lines)
+                yield start, ''.join(lines)
+            lines = []
+            start = lineno + 1
+        else:
+            lines.append(line)
+    if lines:
+        if bulk_insert:
+            lines = merge_inserts(lines)
+        yield start, ''.join(lines)
+
+
+def db_import(conn, cursor, module, db, target, commit_batches=0, bulk_insert=False):
+    if not os.path.isfile(target):
+        return 1, "cannot find target file", "cannot find target file", 0
+
+    use = "USE [%s]\n" % db
+    batches = 0
+    backup = open(target, 'r')
+    try:
+        for lineno, sqlQuery in iter_batches(backup, bulk_insert):
+            if not sqlQuery.strip():
+                continue
+            try:
+                cursor.execute(use + sqlQuery)
+            except Exception as e:
+                msg = "error in batch %d starting at line %d: %s" % (batches + 1, lineno, e)
+                return 1, msg, msg, batches
+            batches += 1
+            if commit_batches and batches % commit_batches == 0:
+                conn.commit()
+        conn.commit()
+    finally:
+        backup.close()
+    return 0, "import successful, %d batches executed" % batches, "", batches
 
 
 def main():
@@ -164,6 +279,8 @@ def main():
             login_port=dict(default='1433'),
             target=dict(default=None),
             autocommit=dict(type='bool', default=False),
+            commit_batches=dict(type='int', default=0),
+            bulk_insert=dict(type='bool', default=False),
             state=dict(
                 default='present', choices=['present', 'absent', 'import'])
         )
@@ -176,6 +293,8 @@ def main():
     state = module.params['state']
     autocommit = module.params['autocommit']
     target = module.params["target"]
+    commit_batches = module.params['commit_batches']
+    bulk_insert = module.params['bulk_insert']
 
     login_user = module.params['login_user']
     login_password = module.params['login_password']
@@ -210,12 +329,12 @@ def main():
                 module.fail_json(msg="error deleting database: " + str(e))
         elif state == "import":
             conn.autocommit(autocommit)
-            rc, stdout, stderr = db_import(conn, cursor, module, db, target)
+            rc, stdout, stderr, batches = db_import(conn, cursor, module, db, target, commit_batches, bulk_insert)
 
             if rc != 0:
-                module.fail_json(msg="%s" % stderr)
+                module.fail_json(msg="%s" % stderr, batches=batches)
             else:
-                module.exit_json(changed=True, db=db, msg=stdout)
+                module.exit_json(changed=True, db=db, msg=stdout, batches=batches)
     else:
         if state == "present":
             try:
@@ -229,12 +348,12 @@ def main():
                 module.fail_json(msg="error creating database: " + str(e))
 
             conn.autocommit(autocommit)
-            rc, stdout, stderr = db_import(conn, cursor, module, db, target)
+            rc, stdout, stderr, batches = db_import(conn, cursor, module, db, target, commit_batches, bulk_insert)
 
             if rc != 0:
-                module.fail_json(msg="%s" % stderr)
+                module.fail_json(msg="%s" % stderr, batches=batches)
             else:
-                module.exit_json(changed=True, db=db, msg=stdout)
+                module.exit_json(changed=True, db=db, msg=stdout, batches=batches)
 
     module.exit_json(changed=changed, db=db)
 
@@ -61,6 +61,21 @@ options:
         - The password used to authenticate with.
     required: false
     default: null
+  cache_file:
+    description:
+      - Path of a facts snapshot written by M(vertica_facts) with the same C(cache_file).
+      - When the snapshot is younger than C(cache_ttl) and was taken from the same C(cluster),
+        C(port) and C(db), the current configuration parameters are read from it instead of being queried.
+      - The snapshot is removed as soon as the module changes the database.
+    required: false
+    default: null
+    version_added: "2.3"
+  cache_ttl:
+    description:
+      - Maximum age, in seconds, of the snapshot in C(cache_file).
+    required: false
+    default: 300
+    version_added: "2.3"
 notes:
   - The default authentication assumes that you are either logging in as or sudo'ing
     to the C(dbadmin) account on the host.
@@ -79,6 +94,10 @@ EXAMPLES = """
   vertica_configuration: name=failovertostandbyafter value='8 hours'
 """
 
+import json
+import os
+import time
+
 try:
     import pyodbc
 except ImportError:
@@ -133,6 +152,41 @@ def present(configuration_facts, cursor, parameter_name, current_value):
         configuration_facts.update(get_configuration_facts(cursor, parameter_name))
     return changed
 
+# The facts cache helpers are the same in every vertica module,
+# keep the copies in sync.
+
+def facts_cache_key(module):
+    return '{0}:{1}/{2}'.format(module.params['cluster'], module.params['port'],
+        module.params['db'] or '')
+
+def read_facts_cache(module, name=None):
+    path = module.params['cache_file']
+    if not path:
+        return None
+    try:
+        f = open(path)
+        try:
+            snapshot = json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return None
+    if snapshot.get('key') != facts_cache_key(module):
+        return None
+    if time.time() - snapshot.get('time', 0) > module.params['cache_ttl']:
+        return None
+    if name is None:
+        return snapshot['facts']
+    return snapshot['facts'].get(name)
+
+def drop_facts_cache(module):
+    path = module.params['cache_file']
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
 # module logic
 
 def main():
@@ -146,6 +200,8 @@ def main():
             port=dict(default='5433'),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
+            cache_file=dict(default=None, type='path'),
+            cache_ttl=dict(default=300, type='int'),
         ), supports_check_mode = True)
 
     if not pyodbc_found:
@@ -177,7 +233,9 @@ def main():
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
 
     try:
-        configuration_facts = get_configuration_facts(cursor)
+        configuration_facts = read_facts_cache(module, 'vertica_configuration')
+        if configuration_facts is None:
+            configuration_facts = get_configuration_facts(cursor)
         if module.check_mode:
             changed = not check(configuration_facts, parameter_name, current_value)
         else:
@@ -185,20 +243,26 @@ def main():
                 changed = present(configuration_facts, cursor, parameter_name, current_value)
             except pyodbc.Error:
                 e = get_exception()
+                drop_facts_cache(module)
                 module.fail_json(msg=str(e))
     except NotSupportedError:
         e = get_exception()
         module.fail_json(msg=str(e), ansible_facts={'vertica_configuration': configuration_facts})
     except CannotDropError:
         e = get_exception()
+        drop_facts_cache(module)
         module.fail_json(msg=str(e), ansible_facts={'vertica_configuration': configuration_facts})
     except SystemExit:
         # avoid catching this on python 2.4
         raise
     except Exception:
         e = get_exception()
+        drop_facts_cache(module)
         module.fail_json(msg=e)
 
+    if changed and not module.check_mode:
+        drop_facts_cache(module)
+
     module.exit_json(changed=changed, parameter=parameter_name, ansible_facts={'vertica_configuration': configuration_facts})
 
 
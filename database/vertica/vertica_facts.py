@@ -53,6 +53,25 @@ options:
       - The password used to authenticate with.
     required: false
     default: null
+  cache_file:
+    description:
+      - Path of a local snapshot of the gathered facts.
+      - When the snapshot is younger than C(cache_ttl) and was taken from the same C(cluster),
+        C(port) and C(db), the facts are returned from it without connecting to the database.
+        Otherwise the facts are gathered and the snapshot is rewritten.
+      - M(vertica_user), M(vertica_role), M(vertica_schema) and M(vertica_configuration) accept
+        the same C(cache_file) to read the current state from the snapshot, and remove it when
+        they change the database.
+      - The snapshot contains the users password hashes and is created readable by its owner only.
+    required: false
+    default: null
+    version_added: "2.3"
+  cache_ttl:
+    description:
+      - Maximum age, in seconds, of the snapshot in C(cache_file).
+    required: false
+    default: 300
+    version_added: "2.3"
 notes:
   - The default authentication assumes that you are either logging in as or sudo'ing
     to the C(dbadmin) account on the host.
@@ -69,8 +88,26 @@ author: "Dariusz Owczarek (@dareko)"
 EXAMPLES = """
 - name: gathering vertica facts
   vertica_facts: db=db_name
+
+- name: gathering vertica facts once for the whole play
+  vertica_facts:
+    db: db_name
+    cache_file: /tmp/vertica_facts_db_name.json
+    cache_ttl: 600
+
+- name: reusing the snapshot instead of querying the users again
+  vertica_user:
+    name: user_name
+    db: db_name
+    roles: schema_name_ro
+    cache_file: /tmp/vertica_facts_db_name.json
 """
 
+import json
+import os
+import tempfile
+import time
+
 try:
     import pyodbc
 except ImportError:
@@ -85,46 +122,49 @@ from ansible.module_utils.pycompat24 import get_exception
 class NotSupportedError(Exception):
     pass
 
+# rows fetched per round trip while gathering the catalogs
+FETCH_SIZE = 1000
+
 # module specific functions
 
+def fetch_rows(cursor):
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield row
+
 def get_schema_facts(cursor, schema=''):
     facts = {}
     cursor.execute("""
         select schema_name, schema_owner, create_time
         from schemata
-        where not is_system_schema and schema_name not in ('public')
+        where not is_system_schema and schema_name not in ('public', 'TxtIndex')
         and (? = '' or schema_name ilike ?)
     """, schema, schema)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            facts[row.schema_name.lower()] = {
-                'name': row.schema_name,
-                'owner': row.schema_owner,
-                'create_time': str(row.create_time),
-                'usage_roles': [],
-                'create_roles': []}
+    for row in fetch_rows(cursor):
+        facts[row.schema_name.lower()] = {
+            'name': row.schema_name,
+            'owner': row.schema_owner,
+            'create_time': str(row.create_time),
+            'usage_roles': [],
+            'create_roles': []}
     cursor.execute("""
         select g.object_name as schema_name, r.name as role_name,
         lower(g.privileges_description) privileges_description
         from roles r join grants g
-        on g.grantee = r.name and g.object_type='SCHEMA'
+        on g.grantee_id = r.role_id and g.object_type='SCHEMA'
         and g.privileges_description like '%USAGE%'
         and g.grantee not in ('public', 'dbadmin')
         and (? = '' or g.object_name ilike ?)
     """, schema, schema)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            schema_key = row.schema_name.lower()
-            if 'create' in row.privileges_description:
-                facts[schema_key]['create_roles'].append(row.role_name)
-            else:
-                facts[schema_key]['usage_roles'].append(row.role_name)
+    for row in fetch_rows(cursor):
+        schema_key = row.schema_name.lower()
+        if 'create' in row.privileges_description:
+            facts[schema_key]['create_roles'].append(row.role_name)
+        else:
+            facts[schema_key]['usage_roles'].append(row.role_name)
     return facts
 
 def get_user_facts(cursor, user=''):
@@ -138,27 +178,23 @@ def get_user_facts(cursor, user=''):
         where not u.is_super_user
         and (? = '' or u.user_name ilike ?)
      """, user, user)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            user_key = row.user_name.lower()
-            facts[user_key] = {
-                'name': row.user_name,
-                'locked': str(row.is_locked),
-                'password': row.password,
-                'expired': str(row.is_expired),
-                'profile': row.profile_name,
-                'resource_pool': row.resource_pool,
-                'roles': [],
-                'default_roles': []}
-            if row.is_locked:
-                facts[user_key]['locked_time'] = str(row.lock_time)
-            if row.all_roles:
-                facts[user_key]['roles'] = row.all_roles.replace(' ', '').split(',')
-            if row.default_roles:
-                facts[user_key]['default_roles'] = row.default_roles.replace(' ', '').split(',')
+    for row in fetch_rows(cursor):
+        user_key = row.user_name.lower()
+        facts[user_key] = {
+            'name': row.user_name,
+            'locked': str(row.is_locked),
+            'password': row.password,
+            'expired': str(row.is_expired),
+            'profile': row.profile_name,
+            'resource_pool': row.resource_pool,
+            'roles': [],
+            'default_roles': []}
+        if row.is_locked:
+            facts[user_key]['locked_time'] = str(row.lock_time)
+        if row.all_roles:
+            facts[user_key]['roles'] = row.all_roles.replace(' ', '').split(',')
+        if row.default_roles:
+            facts[user_key]['default_roles'] = row.default_roles.replace(' ', '').split(',')
     return facts
 
 def get_role_facts(cursor, role=''):
@@ -168,17 +204,13 @@ def get_role_facts(cursor, role=''):
         from roles r
         where (? = '' or r.name ilike ?)
     """, role, role)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            role_key = row.name.lower()
-            facts[role_key] = {
-                'name': row.name,
-                'assigned_roles': []}
-            if row.assigned_roles:
-                facts[role_key]['assigned_roles'] = row.assigned_roles.replace(' ', '').split(',')
+    for row in fetch_rows(cursor):
+        role_key = row.name.lower()
+        facts[role_key] = {
+            'name': row.name,
+            'assigned_roles': []}
+        if row.assigned_roles:
+            facts[role_key]['assigned_roles'] = row.assigned_roles.replace(' ', '').split(',')
     return facts
 
 def get_configuration_facts(cursor, parameter=''):
@@ -189,15 +221,11 @@ def get_configuration_facts(cursor, parameter=''):
         where c.node_name = 'ALL'
         and (? = '' or c.parameter_name ilike ?)
     """, parameter, parameter)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            facts[row.parameter_name.lower()] = {
-                'parameter_name': row.parameter_name,
-                'current_value': row.current_value,
-                'default_value': row.default_value}
+    for row in fetch_rows(cursor):
+        facts[row.parameter_name.lower()] = {
+            'parameter_name': row.parameter_name,
+            'current_value': row.current_value,
+            'default_value': row.default_value}
     return facts
 
 def get_node_facts(cursor, schema=''):
@@ -207,19 +235,67 @@ def get_node_facts(cursor, schema=''):
             catalog_path
         from nodes
     """)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            facts[row.node_address] = {
-                'node_name': row.node_name,
-                'export_address': row.export_address,
-                'node_state': row.node_state,
-                'node_type': row.node_type,
-                'catalog_path': row.catalog_path}
+    for row in fetch_rows(cursor):
+        facts[row.node_address] = {
+            'node_name': row.node_name,
+            'export_address': row.export_address,
+            'node_state': row.node_state,
+            'node_type': row.node_type,
+            'catalog_path': row.catalog_path}
     return facts
 
+# The facts cache helpers are the same in every vertica module,
+# keep the copies in sync.
+
+def facts_cache_key(module):
+    return '{0}:{1}/{2}'.format(module.params['cluster'], module.params['port'],
+        module.params['db'] or '')
+
+def read_facts_cache(module, name=None):
+    path = module.params['cache_file']
+    if not path:
+        return None
+    try:
+        f = open(path)
+        try:
+            snapshot = json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return None
+    if snapshot.get('key') != facts_cache_key(module):
+        return None
+    if time.time() - snapshot.get('time', 0) > module.params['cache_ttl']:
+        return None
+    if name is None:
+        return snapshot['facts']
+    return snapshot['facts'].get(name)
+
+def drop_facts_cache(module):
+    path = module.params['cache_file']
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def write_facts_cache(module, facts):
+    path = module.params['cache_file']
+    # mkstemp creates the file readable by its owner only
+    fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump({'key': facts_cache_key(module), 'time': time.time(), 'facts': facts}, f)
+        finally:
+            f.close()
+        os.rename(tmpfile, path)
+    except (IOError, OSError):
+        e = get_exception()
+        if os.path.exists(tmpfile):
+            os.unlink(tmpfile)
+        module.fail_json(msg="Unable to write %s: %s." % (path, str(e)))
+
 # module logic
 
 def main():
@@ -231,8 +307,16 @@ def main():
             db=dict(default=None),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
+            cache_file=dict(default=None, type='path'),
+            cache_ttl=dict(default=300, type='int'),
         ), supports_check_mode = True)
 
+    cache_file = module.params['cache_file']
+    if cache_file:
+        facts = read_facts_cache(module)
+        if facts is not None:
+            module.exit_json(changed=False, cached=True, ansible_facts=facts)
+
     if not pyodbc_found:
         module.fail_json(msg="The python pyodbc module is required.")
 
@@ -263,12 +347,14 @@ def main():
         role_facts = get_role_facts(cursor)
         configuration_facts = get_configuration_facts(cursor)
         node_facts = get_node_facts(cursor)
-        module.exit_json(changed=False,
-            ansible_facts={'vertica_schemas': schema_facts,
-                           'vertica_users': user_facts,
-                           'vertica_roles': role_facts,
-                           'vertica_configuration': configuration_facts,
-                           'vertica_nodes': node_facts})
+        facts = {'vertica_schemas': schema_facts,
+                 'vertica_users': user_facts,
+                 'vertica_roles': role_facts,
+                 'vertica_configuration': configuration_facts,
+                 'vertica_nodes': node_facts}
+        if cache_file:
+            write_facts_cache(module, facts)
+        module.exit_json(changed=False, cached=False, ansible_facts=facts)
     except NotSupportedError:
         e = get_exception()
         module.fail_json(msg=str(e))
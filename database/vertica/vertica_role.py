@@ -69,6 +69,21 @@ options:
       - The password used to authenticate with.
     required: false
     default: null
+  cache_file:
+    description:
+      - Path of a facts snapshot written by M(vertica_facts) with the same C(cache_file).
+      - When the snapshot is younger than C(cache_ttl) and was taken from the same C(cluster),
+        C(port) and C(db), the current roles are read from it instead of being queried.
+      - The snapshot is removed as soon as the module changes the database.
+    required: false
+    default: null
+    version_added: "2.3"
+  cache_ttl:
+    description:
+      - Maximum age, in seconds, of the snapshot in C(cache_file).
+    required: false
+    default: 300
+    version_added: "2.3"
 notes:
   - The default authentication assumes that you are either logging in as or sudo'ing
     to the C(dbadmin) account on the host.
@@ -90,6 +105,10 @@ EXAMPLES = """
   vertica_role: name=role_name assigned_role=other_role_name state=present
 """
 
+import json
+import os
+import time
+
 try:
     import pyodbc
 except ImportError:
@@ -172,6 +191,41 @@ def absent(role_facts, cursor, role, assigned_roles):
     else:
         return False
 
+# The facts cache helpers are the same in every vertica module,
+# keep the copies in sync.
+
+def facts_cache_key(module):
+    return '{0}:{1}/{2}'.format(module.params['cluster'], module.params['port'],
+        module.params['db'] or '')
+
+def read_facts_cache(module, name=None):
+    path = module.params['cache_file']
+    if not path:
+        return None
+    try:
+        f = open(path)
+        try:
+            snapshot = json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return None
+    if snapshot.get('key') != facts_cache_key(module):
+        return None
+    if time.time() - snapshot.get('time', 0) > module.params['cache_ttl']:
+        return None
+    if name is None:
+        return snapshot['facts']
+    return snapshot['facts'].get(name)
+
+def drop_facts_cache(module):
+    path = module.params['cache_file']
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
 # module logic
 
 def main():
@@ -186,6 +240,8 @@ def main():
             port=dict(default='5433'),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
+            cache_file=dict(default=None, type='path'),
+            cache_ttl=dict(default=300, type='int'),
         ), supports_check_mode = True)
 
     if not pyodbc_found:
@@ -221,7 +277,9 @@ def main():
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
 
     try:
-        role_facts = get_role_facts(cursor)
+        role_facts = read_facts_cache(module, 'vertica_roles')
+        if role_facts is None:
+            role_facts = get_role_facts(cursor)
         if module.check_mode:
             changed = not check(role_facts, role, assigned_roles)
         elif state == 'absent':
@@ -229,26 +287,33 @@ def main():
                 changed = absent(role_facts, cursor, role, assigned_roles)
             except pyodbc.Error:
                 e = get_exception()
+                drop_facts_cache(module)
                 module.fail_json(msg=str(e))
         elif state == 'present':
             try:
                 changed = present(role_facts, cursor, role, assigned_roles)
             except pyodbc.Error:
                 e = get_exception()
+                drop_facts_cache(module)
                 module.fail_json(msg=str(e))
     except NotSupportedError:
         e = get_exception()
         module.fail_json(msg=str(e), ansible_facts={'vertica_roles': role_facts})
     except CannotDropError:
         e = get_exception()
+        drop_facts_cache(module)
         module.fail_json(msg=str(e), ansible_facts={'vertica_roles': role_facts})
     except SystemExit:
         # avoid catching this on python 2.4
         raise
     except Exception:
         e = get_exception()
+        drop_facts_cache(module)
         module.fail_json(msg=e)
 
+    if changed and not module.check_mode:
+        drop_facts_cache(module)
+
     module.exit_json(changed=changed, role=role, ansible_facts={'vertica_roles': role_facts})
 
 
@@ -4,6 +4,7 @@
 # import module snippets
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.pycompat24 import get_exception
+from ansible.module_utils._text import to_bytes
 
 """
 (c) 2016, Ben Doherty <bendohmv@gmail.com>
@@ -44,9 +45,31 @@ options:
     required: true
   format:
     description:
-      - The type of compression to use. Can be 'gz', 'bz2', or 'zip'.
-    choices: [ 'gz', 'bz2', 'zip' ]
+      - The type of compression to use. Can be 'gz', 'bz2', 'xz', 'zip' or 'tar'.
+      - C(xz) requires the python C(lzma) module, which is only available on Python 3.
+    choices: [ 'gz', 'bz2', 'xz', 'zip', 'tar' ]
     default: 'gz'
+  threads:
+    description:
+      - Number of worker threads used to compress C(gz), C(bz2) and C(xz) output.
+      - When greater than 1 the compressed stream is split into independently compressed blocks
+        which are concatenated in order, the same layout produced by pigz, pbzip2 and C(xz -T).
+        Such files are readable by the standard gzip, bzip2 and xz tools.
+      - Use C(0) to start one thread per CPU on the target.
+      - Values other than C(1) require Python 2.6 or later on the target.
+      - Has no effect on C(zip) and C(tar) formats.
+    required: false
+    default: 1
+  incremental:
+    description:
+      - Keep a manifest of the size, modification time and SHA1 checksum of every archived
+        file in C(<dest>.manifest) and compare the source files against it on later runs.
+      - When nothing changed the archive is left untouched. When files were only added to a
+        C(tar) or C(zip) archive they are appended to it, otherwise the archive is rebuilt.
+      - Checksums are only computed for files whose size or modification time changed.
+    type: bool
+    required: false
+    default: false
   dest:
     description:
       - The file name of the destination archive. This is required when C(path) refers to multiple files by either specifying a glob, a directory or multiple paths in a list.
@@ -62,7 +85,7 @@ options:
 author: "Ben Doherty (@bendoh)"
 notes:
     - requires tarfile, zipfile, gzip, and bzip2 packages on target host
-    - can produce I(gzip), I(bzip2) and I(zip) compressed files or archives
+    - can produce I(gzip), I(bzip2), I(xz) and I(zip) compressed files or archives
 '''
 
 EXAMPLES = '''
@@ -81,6 +104,19 @@ EXAMPLES = '''
     path: /path/to/foo
     format: zip
 
+# Compress a large log tree using all CPUs on the target
+- archive:
+    path: /var/log/app
+    dest: /srv/backup/app-logs.tar.gz
+    threads: 0
+
+# Only rebuild the nightly archive when the tree changed
+- archive:
+    path: /srv/releases
+    dest: /srv/backup/releases.tar
+    format: tar
+    incremental: True
+
 # Create a bz2 archive of multiple files, rooted at /path
 - archive:
     path:
@@ -114,6 +150,10 @@ arcroot:
 expanded_paths:
     description: The list of matching paths from paths argument.
     type: list
+manifest:
+    description: The path of the manifest file used by incremental mode.
+    type: string
+    returned: when incremental=True
 '''
 
 import os
@@ -125,15 +165,218 @@ import bz2
 import filecmp
 import zipfile
 import tarfile
+import struct
+import zlib
+import tempfile
+
+try:
+    import json
+except ImportError:
+    try:
+        import simplejson as json
+    except ImportError:
+        # Let snippet from module_utils/basic.py return a proper error in this case
+        pass
+
+try:
+    from multiprocessing import cpu_count
+    from multiprocessing.pool import ThreadPool
+except ImportError:
+    HAS_MULTIPROCESSING = False
+else:
+    HAS_MULTIPROCESSING = True
+
+try:
+    import lzma
+except ImportError:
+    HAS_LZMA = False
+else:
+    HAS_LZMA = True
+
+# Amount of uncompressed input handed to a worker thread at a time
+BLOCK_SIZE = 1024 * 1024
+
+# gzip member header: magic, deflate, no flags, no mtime, no extra flags, unknown OS
+GZIP_HEADER = struct.pack('<BBBBLBB', 0x1f, 0x8b, 8, 0, 0, 0, 0xff)
+
+
+def compress_block(data, format):
+    """Compress one block into a self-contained gzip, bzip2 or xz stream."""
+    if format == 'gz':
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        body = compressor.compress(data) + compressor.flush()
+        trailer = struct.pack('<LL', zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+        return GZIP_HEADER + body + trailer
+    elif format == 'bz2':
+        return bz2.compress(data)
+    elif format == 'xz':
+        return lzma.compress(data)
+    raise ValueError("Invalid format %s" % format)
+
+
+class ParallelCompressor(object):
+    """Write-only file object compressing its input on a pool of threads.
+
+    Input is cut into BLOCK_SIZE blocks, each one is compressed independently
+    and the resulting streams are written to fileobj in input order.
+    zlib, bz2 and lzma release the GIL while compressing, so the blocks are
+    really compressed concurrently.
+    """
+
+    def __init__(self, fileobj, format, threads, blocksize=BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.format = format
+        self.threads = threads
+        self.blocksize = blocksize
+        self.pool = ThreadPool(threads)
+        self.pending = []
+        self.buf = []
+        self.buflen = 0
+
+    def write(self, data):
+        self.buf.append(data)
+        self.buflen += len(data)
+        while self.buflen >= self.blocksize:
+            self._submit()
+
+    def _submit(self):
+        data = to_bytes('').join(self.buf)
+        block, rest = data[:self.blocksize], data[self.blocksize:]
+        self.buf = rest and [rest] or []
+        self.buflen = len(rest)
+        self.pending.append(self.pool.apply_async(compress_block, (block, self.format)))
+
+        # Bound memory usage by keeping only a couple of blocks per thread in flight
+        while len(self.pending) > 2 * self.threads:
+            self.fileobj.write(self.pending.pop(0).get())
+
+    def close(self):
+        try:
+            if self.buflen or not self.pending:
+                self._submit()
+            while self.pending:
+                self.fileobj.write(self.pending.pop(0).get())
+        finally:
+            self.pool.close()
+            self.pool.join()
+            self.fileobj.close()
+
+
+def open_compressed(dest, format, threads):
+    """Return a writable file object producing a compressed file at dest."""
+    if threads > 1 and format in ('gz', 'bz2', 'xz'):
+        return ParallelCompressor(open(dest, 'wb'), format, threads)
+    if format == 'gz':
+        return gzip.open(dest, 'wb')
+    elif format == 'bz2':
+        return bz2.BZ2File(dest, 'wb')
+    elif format == 'xz':
+        return lzma.LZMAFile(dest, 'wb')
+    raise OSError("Invalid format")
+
+
+def load_manifest(manifest_path):
+    """Return the manifest stored at manifest_path, or None if it is unusable."""
+    try:
+        f = open(manifest_path, 'r')
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_manifest(module, manifest_path, manifest):
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(manifest_path) or '.')
+    f = os.fdopen(tmp_fd, 'w')
+    try:
+        json.dump(manifest, f, sort_keys=True)
+    finally:
+        f.close()
+    module.atomic_move(tmp_path, manifest_path)
+
+
+def build_manifest(module, paths, arcroot, previous=None, exclude=()):
+    """Map the archive name of every file and directory below paths to
+    [size, mtime, sha1] (None for directories).
+
+    Checksums are reused from the previous manifest for files whose size and
+    mtime did not change. The files in exclude, the archive itself and its
+    manifest, are left out as they are never archived.
+    """
+    previous = previous or {}
+    match_root = re.compile('^%s' % re.escape(arcroot))
+    excluded = set([os.path.abspath(p) for p in exclude if p])
+    manifest = {}
+
+    def add(fullpath, is_dir):
+        if os.path.abspath(fullpath) in excluded:
+            return
+        arcname = match_root.sub('', fullpath)
+        if is_dir:
+            manifest[arcname] = None
+            return
+
+        st = os.lstat(fullpath)
+        old = previous.get(arcname)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime:
+            checksum = old[2]
+        elif os.path.isfile(fullpath):
+            checksum = module.sha1(fullpath)
+        else:
+            checksum = None
+        manifest[arcname] = [st.st_size, st.st_mtime, checksum]
+
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path, topdown=True):
+                if not dirpath.endswith(os.sep):
+                    dirpath += os.sep
+                for dirname in dirnames:
+                    add(dirpath + dirname, True)
+                for filename in filenames:
+                    add(dirpath + filename, False)
+        else:
+            add(path, False)
+
+    return manifest
+
+
+def manifest_changes(previous, current):
+    """Return (added, modified) archive names between two manifests.
+
+    Files whose checksum did not change are not considered modified even if
+    their mtime did. Removed members count as modified.
+    """
+    added = []
+    modified = []
+    for arcname, entry in current.items():
+        if arcname not in previous:
+            added.append(arcname)
+            continue
+        old = previous[arcname]
+        if (old is None) != (entry is None):
+            modified.append(arcname)
+        elif entry is not None and (old[0] != entry[0] or old[2] != entry[2]):
+            modified.append(arcname)
+    for arcname in previous:
+        if arcname not in current:
+            modified.append(arcname)
+    return added, modified
+
 
 def main():
     module = AnsibleModule(
         argument_spec = dict(
             path = dict(type='list', required=True),
-            format  = dict(choices=['gz', 'bz2', 'zip', 'tar'], default='gz', required=False),
+            format  = dict(choices=['gz', 'bz2', 'xz', 'zip', 'tar'], default='gz', required=False),
             dest = dict(required=False, type='path'),
             remove = dict(required=False, default=False, type='bool'),
+            threads = dict(required=False, default=1, type='int'),
+            incremental = dict(required=False, default=False, type='bool'),
         ),
+        mutually_exclusive=[['incremental', 'remove']],
         add_file_common_args=True,
         supports_check_mode=True,
     )
@@ -143,9 +386,21 @@ def main():
     paths = params['path']
     dest = params['dest']
     remove = params['remove']
+    threads = params['threads']
+    incremental = params['incremental']
 
     expanded_paths = []
     format = params['format']
+
+    if format == 'xz' and not HAS_LZMA:
+        module.fail_json(msg='The lzma python module is required for format=xz')
+
+    if threads < 0:
+        module.fail_json(msg='threads must be 0 or a positive number')
+    elif threads != 1 and not HAS_MULTIPROCESSING:
+        module.fail_json(msg='The multiprocessing python module is required for threads other than 1')
+    elif threads == 0:
+        threads = cpu_count()
     globby = False
     changed = False
     state = 'absent'
@@ -187,6 +442,9 @@ def main():
     archive_paths = []
     missing = []
     arcroot = ''
+    manifest_path = manifest = None
+    if incremental:
+        manifest_path = dest + '.manifest'
 
     for path in expanded_paths:
         # Use the longest common directory name among all the files
@@ -215,7 +473,7 @@ def main():
     # No source files were found but the named archive exists: are we 'compress' or 'archive' now?
     if len(missing) == len(expanded_paths) and dest and os.path.exists(dest):
         # Just check the filename to know if it's an archive or simple compressed file
-        if re.search(r'(\.tar|\.tar\.gz|\.tgz|.tbz2|\.tar\.bz2|\.zip)$', os.path.basename(dest), re.IGNORECASE):
+        if re.search(r'(\.tar|\.tar\.gz|\.tgz|.tbz2|\.tar\.bz2|\.txz|\.tar\.xz|\.zip)$', os.path.basename(dest), re.IGNORECASE):
             state = 'archive'
         else:
             state = 'compress'
@@ -231,13 +489,34 @@ def main():
             state = 'incomplete'
 
         archive = None
+        compressor = None
         size = 0
         errors = []
 
         if os.path.lexists(dest):
             size = os.path.getsize(dest)
 
-        if state != 'archive':
+        # Compare the sources with the manifest of the previous run. Only
+        # added members can be appended, anything else rebuilds the archive.
+        uptodate = False
+        members = None
+        if incremental and state != 'archive':
+            previous = None
+            if os.path.exists(dest):
+                previous = load_manifest(manifest_path)
+            manifest = build_manifest(module, archive_paths, arcroot, previous, (dest, manifest_path))
+
+            if previous is not None:
+                added, modified = manifest_changes(previous, manifest)
+                if not added and not modified:
+                    uptodate = True
+                    # Only mtimes changed: keep them so the files are not hashed again
+                    if manifest != previous and not check_mode:
+                        save_manifest(module, manifest_path, manifest)
+                elif not modified and format in ('tar', 'zip'):
+                    members = set(added)
+
+        if state != 'archive' and not uptodate:
             if check_mode:
                 changed = True
 
@@ -245,12 +524,24 @@ def main():
                 try:
                     # Slightly more difficult (and less efficient!) compression using zipfile module
                     if format == 'zip':
-                        arcfile = zipfile.ZipFile(dest, 'w', zipfile.ZIP_DEFLATED)
+                        arcfile = zipfile.ZipFile(dest, members is None and 'w' or 'a', zipfile.ZIP_DEFLATED)
+
+                    # Append new members to an uncompressed tar
+                    elif format == 'tar' and members is not None:
+                        arcfile = tarfile.open(dest, 'a')
+
+                    # Block-parallel compression of the tar stream
+                    elif threads > 1 and format in ('gz', 'bz2', 'xz'):
+                        compressor = open_compressed(dest, format, threads)
+                        arcfile = tarfile.open(mode='w|', fileobj=compressor)
 
                     # Easier compression using tarfile module
                     elif format == 'gz' or format == 'bz2':
                         arcfile = tarfile.open(dest, 'w|' + format)
 
+                    elif format == 'xz':
+                        arcfile = tarfile.open(dest, 'w:xz')
+
                     # Or plain tar archiving
                     elif format == 'tar':
                         arcfile = tarfile.open(dest, 'w')
@@ -267,6 +558,9 @@ def main():
                                     fullpath = dirpath + dirname
                                     arcname = match_root.sub('', fullpath)
 
+                                    if members is not None and arcname not in members:
+                                        continue
+
                                     try:
                                         if format == 'zip':
                                             arcfile.write(fullpath, arcname)
@@ -281,6 +575,12 @@ def main():
                                     fullpath = dirpath + filename
                                     arcname = match_root.sub('', fullpath)
 
+                                    if members is not None and arcname not in members:
+                                        continue
+
+                                    if manifest_path and os.path.abspath(fullpath) == os.path.abspath(manifest_path):
+                                        continue
+
                                     if not filecmp.cmp(fullpath, dest):
                                         try:
                                             if format == 'zip':
@@ -293,10 +593,15 @@ def main():
                                             e = get_exception()
                                             errors.append('Adding %s: %s' % (path, str(e)))
                         else:
+                            arcname = match_root.sub('', path)
+
+                            if members is not None and arcname not in members:
+                                continue
+
                             if format == 'zip':
-                                arcfile.write(path, match_root.sub('', path))
+                                arcfile.write(path, arcname)
                             else:
-                                arcfile.add(path, match_root.sub('', path), recursive=False)
+                                arcfile.add(path, arcname, recursive=False)
 
                             successes.append(path)
 
@@ -306,11 +611,17 @@ def main():
 
                 if arcfile:
                     arcfile.close()
+                    if compressor:
+                        compressor.close()
                     state = 'archive'
 
                 if len(errors) > 0:
                     module.fail_json(msg='Errors when writing archive at %s: %s' % (dest, '; '.join(errors)))
 
+                if incremental:
+                    save_manifest(module, manifest_path, manifest)
+                    changed = True
+
         if state in ['archive', 'incomplete'] and remove:
             for path in successes:
                 try:
@@ -329,7 +640,7 @@ def main():
         if os.path.getsize(dest) != size:
             changed = True
 
-        if len(successes) and state != 'incomplete':
+        if (len(successes) or uptodate) and state != 'incomplete':
             state = 'archive'
 
     # Simple, single-file compression
@@ -345,7 +656,19 @@ def main():
             state = 'compress'
 
         else:
-            if module.check_mode:
+            uptodate = False
+            if incremental and os.path.exists(path):
+                previous = None
+                if os.path.exists(dest):
+                    previous = load_manifest(manifest_path)
+                manifest = build_manifest(module, [path], arcroot, previous, (dest, manifest_path))
+                uptodate = previous is not None and manifest_changes(previous, manifest) == ([], [])
+                if uptodate and manifest != previous and not check_mode:
+                    save_manifest(module, manifest_path, manifest)
+
+            if uptodate:
+                pass
+            elif module.check_mode:
                 if not os.path.exists(dest):
                     changed = True
             else:
@@ -364,15 +687,9 @@ def main():
 
                     else:
                         f_in = open(path, 'rb')
+                        f_out = open_compressed(dest, format, threads)
 
-                        if format == 'gz':
-                            f_out = gzip.open(dest, 'wb')
-                        elif format == 'bz2':
-                            f_out = bz2.BZ2File(dest, 'wb')
-                        else:
-                            raise OSError("Invalid format")
-
-                        shutil.copyfileobj(f_in, f_out)
+                        shutil.copyfileobj(f_in, f_out, BLOCK_SIZE)
 
                     successes.append(path)
 
@@ -387,6 +704,10 @@ def main():
                 if f_out:
                     f_out.close()
 
+                if incremental:
+                    save_manifest(module, manifest_path, manifest)
+                    changed = True
+
                 # Rudimentary check: If size changed then file changed. Not perfect, but easy.
                 if os.path.getsize(dest) != size:
                     changed = True
@@ -406,7 +727,7 @@ def main():
 
     changed = module.set_fs_attributes_if_different(file_args, changed)
 
-    module.exit_json(archived=successes, dest=dest, changed=changed, state=state, arcroot=arcroot, missing=missing, expanded_paths=expanded_paths)
+    module.exit_json(archived=successes, dest=dest, changed=changed, state=state, arcroot=arcroot, missing=missing, expanded_paths=expanded_paths, manifest=manifest_path)
 
 if __name__ == '__main__':
     main()
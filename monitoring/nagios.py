@@ -43,6 +43,9 @@ options:
   host:
     description:
       - Host to operate on in Nagios.
+      - As of Ansible 2.3 this can be a list of hosts (or a comma separated
+        string). The commands for all hosts and services are built first and
+        written to the command file in one go, in order.
     required: false
     default: null
   cmdfile:
@@ -71,7 +74,7 @@ options:
     default: 30
   services:
     description:
-      - What to manage downtime/alerts for. Separate multiple services with commas.
+      - What to manage downtime/alerts for. Separate multiple services with commas, or give a list.
         C(service) is an alias for C(services).
         B(Required) option when using the C(downtime), C(enable_alerts), and C(disable_alerts) actions.
     aliases: [ "service" ]
@@ -172,6 +175,16 @@ EXAMPLES = '''
     service: host
     host: '{{ inventory_hostname }}'
 
+# schedule an hour of downtime for a few services on a whole batch of hosts
+- nagios:
+    action: downtime
+    minutes: 60
+    services:
+      - httpd
+      - nfs
+    host: "{{ groups['webservers'] }}"
+  run_once: true
+
 # silence ALL alerts
 - nagios:
     action: silence
@@ -200,6 +213,10 @@ import ConfigParser
 import types
 import time
 import os.path
+import select
+
+# Largest write to a FIFO the kernel guarantees not to interleave with other writers
+PIPE_BUF = getattr(select, 'PIPE_BUF', 512)
 
 ######################################################################
 
@@ -261,11 +278,11 @@ def main():
             action=dict(required=True, default=None, choices=ACTION_CHOICES),
             author=dict(default='Ansible'),
             comment=dict(default='Scheduling downtime'),
-            host=dict(required=False, default=None),
+            host=dict(required=False, default=None, type='list'),
             servicegroup=dict(required=False, default=None),
             minutes=dict(default=30),
             cmdfile=dict(default=which_cmdfile()),
-            services=dict(default=None, aliases=['service']),
+            services=dict(default=None, aliases=['service'], type='list'),
             command=dict(required=False, default=None),
             )
         )
@@ -367,18 +384,20 @@ class Nagios(object):
         self.action = kwargs['action']
         self.author = kwargs['author']
         self.comment = kwargs['comment']
-        self.host = kwargs['host']
+        self.hosts = kwargs['host'] or []
+        self.host = self.hosts and self.hosts[0] or None
         self.servicegroup = kwargs['servicegroup']
         self.minutes = int(kwargs['minutes'])
         self.cmdfile = kwargs['cmdfile']
         self.command = kwargs['command']
 
-        if (kwargs['services'] is None) or (kwargs['services'] == 'host') or (kwargs['services'] == 'all'):
-            self.services = kwargs['services']
+        if kwargs['services'] in (['host'], ['all']):
+            self.services = kwargs['services'][0]
         else:
-            self.services = kwargs['services'].split(',')
+            self.services = kwargs['services']
 
         self.command_results = []
+        self.pending_commands = []
 
     def _now(self):
         """
@@ -389,18 +408,47 @@ class Nagios(object):
 
     def _write_command(self, cmd):
         """
-        Write the given command to the Nagios command file
+        Queue the given command for the Nagios command file. Queued
+        commands are written by _flush_commands.
+        """
+
+        self.pending_commands.append(cmd)
+
+    def _flush_commands(self):
+        """
+        Write all the queued commands to the Nagios command file, in
+        order, opening it only once. Commands are grouped in writes of at
+        most PIPE_BUF bytes which end on a command boundary, so they can't
+        be interleaved with commands from other writers of the FIFO.
         """
 
+        if not self.pending_commands:
+            return
+
+        chunks = []
+        chunk = []
+        size = 0
+        for cmd in self.pending_commands:
+            if chunk and size + len(cmd) > PIPE_BUF:
+                chunks.append(chunk)
+                chunk = []
+                size = 0
+            chunk.append(cmd)
+            size += len(cmd)
+        chunks.append(chunk)
+
         try:
             fp = open(self.cmdfile, 'w')
-            fp.write(cmd)
-            fp.flush()
+            for chunk in chunks:
+                fp.write(''.join(chunk))
+                fp.flush()
+                self.command_results.extend(cmd.strip() for cmd in chunk)
             fp.close()
-            self.command_results.append(cmd.strip())
         except IOError:
             self.module.fail_json(msg='unable to write to nagios command file',
-                                  cmdfile=self.cmdfile)
+                                  cmdfile=self.cmdfile,
+                                  nagios_commands=self.command_results)
+        self.pending_commands = []
 
     def _fmt_dt_str(self, cmd, host, duration, author=None,
                     comment=None, start=None,
@@ -1011,24 +1059,40 @@ class Nagios(object):
         Figure out what you want to do from ansible, and then do the
         needful (at the earliest).
         """
+        if self.action in ['downtime', 'delete_downtime', 'silence', 'unsilence',
+                           'enable_alerts', 'disable_alerts']:
+            # queue the commands of every host, they are written at once below
+            for host in self.hosts:
+                self.act_for_host(host)
+        else:
+            self.act_for_host(self.host)
+
+        self._flush_commands()
+        self.module.exit_json(nagios_commands=self.command_results,
+                              changed=True)
+
+    def act_for_host(self, host):
+        """
+        Queue the commands of the requested action for a single host.
+        """
         # host or service downtime?
         if self.action == 'downtime':
             if self.services == 'host':
-                self.schedule_host_downtime(self.host, self.minutes)
+                self.schedule_host_downtime(host, self.minutes)
             elif self.services == 'all':
-                self.schedule_host_svc_downtime(self.host, self.minutes)
+                self.schedule_host_svc_downtime(host, self.minutes)
             else:
-                self.schedule_svc_downtime(self.host,
+                self.schedule_svc_downtime(host,
                                            services=self.services,
                                            minutes=self.minutes)
 
         elif self.action == 'delete_downtime':
             if self.services=='host':
-                self.delete_host_downtime(self.host)
+                self.delete_host_downtime(host)
             elif self.services=='all':
-                self.delete_host_downtime(self.host, comment='')
+                self.delete_host_downtime(host, comment='')
             else:
-                self.delete_host_downtime(self.host, services=self.services)
+                self.delete_host_downtime(host, services=self.services)
 
         elif self.action == "servicegroup_host_downtime":
             if self.servicegroup:
@@ -1039,28 +1103,28 @@ class Nagios(object):
 
         # toggle the host AND service alerts
         elif self.action == 'silence':
-            self.silence_host(self.host)
+            self.silence_host(host)
 
         elif self.action == 'unsilence':
-            self.unsilence_host(self.host)
+            self.unsilence_host(host)
 
         # toggle host/svc alerts
         elif self.action == 'enable_alerts':
             if self.services == 'host':
-                self.enable_host_notifications(self.host)
+                self.enable_host_notifications(host)
             elif self.services == 'all':
-                self.enable_host_svc_notifications(self.host)
+                self.enable_host_svc_notifications(host)
             else:
-                self.enable_svc_notifications(self.host,
+                self.enable_svc_notifications(host,
                                               services=self.services)
 
         elif self.action == 'disable_alerts':
             if self.services == 'host':
-                self.disable_host_notifications(self.host)
+                self.disable_host_notifications(host)
             elif self.services == 'all':
-                self.disable_host_svc_notifications(self.host)
+                self.disable_host_svc_notifications(host)
             else:
-                self.disable_svc_notifications(self.host,
+                self.disable_svc_notifications(host,
                                                services=self.services)
         elif self.action == 'silence_nagios':
             self.silence_nagios()
@@ -1076,9 +1140,6 @@ class Nagios(object):
             self.module.fail_json(msg="unknown action specified: '%s'" % \
                                       self.action)
 
-        self.module.exit_json(nagios_commands=self.command_results,
-                              changed=True)
-
 ######################################################################
 # import module snippets
 from ansible.module_utils.basic import *
@@ -45,8 +45,19 @@ options:
   host:
     description:
       - Name of the backend host to change.
-    required: true
+      - Required unless I(hosts) is given.
+    required: false
+    default: null
+  hosts:
+    description:
+      - List of backend hosts to change in one pass. The stats are fetched
+        once per step and the commands for all the hosts are pipelined over
+        the same connection.
+      - When set, C(state_before) and C(state_after) are dicts keyed by host.
+      - Mutually exclusive with I(host).
+    required: false
     default: null
+    version_added: "2.3"
   shutdown_sessions:
     description:
       - When disabling a server, immediately terminate all the sessions attached
@@ -170,19 +181,35 @@ EXAMPLES = '''
     socket: /var/run/haproxy.sock
     weight: 10
     backend: www
+
+# drain a whole batch of servers from every backend in one task
+- haproxy:
+    state: disabled
+    hosts: "{{ groups['web_canary'] }}"
+    shutdown_sessions: true
+    wait: yes
 '''
 
+import re
 import socket
 import csv
 import time
 from string import Template
 
+from ansible.module_utils._text import to_bytes, to_native
+
 
 DEFAULT_SOCKET_LOCATION="/var/run/haproxy.sock"
 RECV_SIZE = 1024
 ACTION_CHOICES = ['enabled', 'disabled']
 WAIT_RETRIES=25
 WAIT_INTERVAL=5
+# End of every response in interactive mode
+PROMPT = '\n> '
+# Number of commands sent before reading their responses back
+PIPELINE_SIZE = 100
+# Commands on one line are separated by unescaped semicolons
+COMMAND_SEPARATOR = re.compile(r'(?<!\\);')
 
 ######################################################################
 class TimeoutException(Exception):
@@ -205,6 +232,7 @@ class HAProxy(object):
 
         self.state = self.module.params['state']
         self.host = self.module.params['host']
+        self.hosts = self.module.params['hosts']
         self.backend = self.module.params['backend']
         self.weight = self.module.params['weight']
         self.socket = self.module.params['socket']
@@ -214,26 +242,99 @@ class HAProxy(object):
         self.wait_retries = self.module.params['wait_retries']
         self.wait_interval = self.module.params['wait_interval']
         self.command_results = {}
+        self.client = None
+        self.buffer = ''
+
+    def connect(self):
+        """
+        Open a persistent connection to the socket and switch it to
+        interactive mode, so that several commands can be sent over it.
+        """
+        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client.connect(self.socket)
+        self.buffer = ''
+        self.client.sendall(to_bytes('prompt\n'))
+        self._read_response()
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.sendall(to_bytes('quit\n'))
+            except socket.error:
+                pass
+            self.client.close()
+            self.client = None
+
+    def _read_response(self):
+        """
+        Read the output of one command sent in interactive mode.
+        """
+        while PROMPT not in self.buffer:
+            # the very first prompt is not preceded by a newline
+            if self.buffer == '> ':
+                self.buffer = ''
+                return ''
+            buf = self.client.recv(RECV_SIZE * 64)
+            if not buf:
+                raise socket.error('connection closed by HAProxy')
+            self.buffer += to_native(buf)
+        result, self.buffer = self.buffer.split(PROMPT, 1)
+        return result
 
     def execute(self, cmd, timeout=200, capture_output=True):
         """
         Executes a HAProxy command by sending a message to a HAProxy's local
         UNIX socket and waiting up to 'timeout' milliseconds for the response.
+        When a persistent connection is open the command is sent over it.
         """
-        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.client.connect(self.socket)
-        self.client.sendall('%s\n' % cmd)
+        if self.client is not None:
+            return self.execute_batch([cmd], capture_output)[0]
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.socket)
+        client.sendall(to_bytes('%s\n' % cmd))
         result = ''
-        buf = ''
-        buf = self.client.recv(RECV_SIZE)
+        buf = client.recv(RECV_SIZE)
         while buf:
-            result += buf
-            buf = self.client.recv(RECV_SIZE)
+            result += to_native(buf)
+            buf = client.recv(RECV_SIZE)
         if capture_output:
             self.capture_command_output(cmd, result.strip())
-        self.client.close()
+        client.close()
         return result
 
+    def execute_batch(self, cmds, capture_output=True):
+        """
+        Pipeline several commands over the persistent connection and return
+        their outputs in order. Commands are sent in chunks of PIPELINE_SIZE
+        so neither side blocks on a full socket buffer. The connection is
+        reopened once if HAProxy closed it, e.g. after its stats timeout.
+        """
+        results = []
+        for i in range(0, len(cmds), PIPELINE_SIZE):
+            chunk = cmds[i:i + PIPELINE_SIZE]
+            try:
+                outputs = self._send_chunk(chunk)
+            except socket.error:
+                self.close()
+                self.connect()
+                outputs = self._send_chunk(chunk)
+            for cmd, output in zip(chunk, outputs):
+                if capture_output:
+                    self.capture_command_output(cmd, output.strip())
+                results.append(output)
+        return results
+
+    def _send_chunk(self, cmds):
+        self.client.sendall(to_bytes(''.join('%s\n' % cmd for cmd in cmds)))
+        outputs = []
+        for cmd in cmds:
+            # HAProxy runs each ';' separated part of a line as its own
+            # command and prints a prompt after each of them
+            parts = len(COMMAND_SEPARATOR.split(cmd))
+            outputs.append('\n'.join([self._read_response() for i in range(parts)]))
+        return outputs
+
 
     def capture_command_output(self, cmd, output):
         """
@@ -247,14 +348,40 @@ class HAProxy(object):
         self.command_results['output'].append(output)
 
 
+    def get_stat_index(self):
+        """
+        Fetch 'show stat' once and index it by (pxname, svname). Returns
+        the index and the list of backend names, in the order HAProxy
+        reports them.
+        """
+        data = self.execute('show stat', 200, False).lstrip('# ')
+        reader = csv.reader(data.splitlines())
+        index = {}
+        backends = []
+        # the first row is the header
+        for header in reader:
+            break
+        else:
+            return index, backends
+        pxname = header.index('pxname')
+        svname = header.index('svname')
+        status = header.index('status')
+        weight = header.index('weight')
+        for row in reader:
+            if len(row) <= max(pxname, svname, status, weight):
+                continue
+            index[(row[pxname], row[svname])] = { 'status': row[status], 'weight': row[weight] }
+            if row[svname] == 'BACKEND':
+                backends.append(row[pxname])
+        return index, backends
+
+
     def discover_all_backends(self):
         """
         Discover all entries with svname = 'BACKEND' and return a list of their corresponding
         pxnames
         """
-        data = self.execute('show stat', 200, False).lstrip('# ')
-        r = csv.DictReader(data.splitlines())
-        return tuple(map(lambda d: d['pxname'], filter(lambda d: d['svname'] == 'BACKEND', r)))
+        return tuple(self.get_stat_index()[1])
 
 
     def execute_for_backends(self, cmd, pxname, svname, wait_for_status = None):
@@ -262,32 +389,55 @@ class HAProxy(object):
         Run some command on the specified backends. If no backends are provided they will
         be discovered automatically (all backends)
         """
+        self.execute_for_servers(cmd, pxname, [svname], wait_for_status)
+
+
+    def execute_for_servers(self, cmd, pxname, svnames, wait_for_status = None):
+        """
+        Run some command for several servers on the specified backends, using a
+        single stat snapshot to find them and one pipelined batch of commands.
+        If no backends are provided they will be discovered automatically (all backends)
+        """
+        index, backends = self.get_stat_index()
+
         # Discover backends if none are given
-        if pxname is None:
-            backends = self.discover_all_backends()
-        else:
+        if pxname is not None:
             backends = [pxname]
 
-        # Run the command for each requested backend
-        for backend in backends:
-            # Fail when backends were not found
-            state = self.get_state_for(backend, svname)
-            if (self.fail_on_not_found or self.wait) and state is None:
-                self.module.fail_json(msg="The specified backend '%s/%s' was not found!" % (backend, svname))
+        cmds = []
+        servers = []
+        for svname in svnames:
+            for backend in backends:
+                # Fail when backends were not found
+                if (self.fail_on_not_found or self.wait) and (backend, svname) not in index:
+                    self.module.fail_json(msg="The specified backend '%s/%s' was not found!" % (backend, svname))
 
-            self.execute(Template(cmd).substitute(pxname = backend, svname = svname))
-            if self.wait:
-                self.wait_until_status(backend, svname, wait_for_status)
+                cmds.append(Template(cmd).substitute(pxname = backend, svname = svname))
+                servers.append((backend, svname))
+
+        if self.client is not None:
+            self.execute_batch(cmds)
+        else:
+            for command in cmds:
+                self.execute(command)
 
+        if self.wait:
+            self.wait_until_status_all(servers, wait_for_status)
 
-    def get_state_for(self, pxname, svname):
+
+    def get_state_for(self, pxname, svname, index=None):
         """
         Find the state of specific services. When pxname is not set, get all backends for a specific host.
         Returns a list of dictionaries containing the status and weight for those services.
+        The result of get_stat_index can be given to avoid fetching the stats again.
         """
-        data = self.execute('show stat', 200, False).lstrip('# ')
-        r = csv.DictReader(data.splitlines())
-        state = tuple(map(lambda d: { 'status': d['status'], 'weight': d['weight'] }, filter(lambda d: (pxname is None or d['pxname'] == pxname) and d['svname'] == svname, r)))
+        if index is None:
+            index, backends = self.get_stat_index()
+        else:
+            index, backends = index
+        if pxname is not None:
+            backends = [pxname]
+        state = tuple(index[(backend, svname)] for backend in backends if (backend, svname) in index)
         return state or None
 
 
@@ -298,15 +448,24 @@ class HAProxy(object):
         the expected status in that time, the module will fail. If the service was 
         not found, the module will fail.
         """
-        for i in range(1, self.wait_retries):
-            state = self.get_state_for(pxname, svname)
+        return self.wait_until_status_all([(pxname, svname)], status)
 
-            # We can assume there will only be 1 element in state because both svname and pxname are always set when we get here
-            if state[0]['status'] == status:
+
+    def wait_until_status_all(self, servers, status):
+        """
+        Wait for all the (pxname, svname) servers to reach the specified status,
+        polling a single stat snapshot for all of them on every retry.
+        """
+        pending = list(servers)
+        for i in range(1, self.wait_retries):
+            index = self.get_stat_index()[0]
+            pending = [server for server in pending if index.get(server, {}).get('status') != status]
+            if not pending:
                 return True
             else:
                 time.sleep(self.wait_interval)
 
+        pxname, svname = pending[0]
         self.module.fail_json(msg="server %s/%s not status '%s' after %d retries. Aborting." % (pxname, svname, status, self.wait_retries))
 
 
@@ -315,11 +474,12 @@ class HAProxy(object):
         Enabled action, marks server to UP and checks are re-enabled,
         also supports to get current weight for server (default) and
         set the weight for haproxy backend server when provides.
+        host can be a single server or a list of servers.
         """
         cmd = "get weight $pxname/$svname; enable server $pxname/$svname"
         if weight:
             cmd += "; set weight $pxname/$svname %s" % weight
-        self.execute_for_backends(cmd, backend, host, 'UP')
+        self.execute_for_servers(cmd, backend, self._as_list(host), 'UP')
 
 
     def disabled(self, host, backend, shutdown_sessions):
@@ -327,32 +487,59 @@ class HAProxy(object):
         Disabled action, marks server to DOWN for maintenance. In this mode, no more checks will be
         performed on the server until it leaves maintenance,
         also it shutdown sessions while disabling backend host server.
+        host can be a single server or a list of servers.
         """
         cmd = "get weight $pxname/$svname; disable server $pxname/$svname"
         if shutdown_sessions:
             cmd += "; shutdown sessions server $pxname/$svname"
-        self.execute_for_backends(cmd, backend, host, 'MAINT')
+        self.execute_for_servers(cmd, backend, self._as_list(host), 'MAINT')
+
+
+    def _as_list(self, host):
+        if isinstance(host, (list, tuple)):
+            return host
+        return [host]
+
+
+    def get_states(self):
+        """
+        Get the state of the managed server(s) from a single stat snapshot.
+        """
+        index = self.get_stat_index()
+        if self.hosts is None:
+            return self.get_state_for(self.backend, self.host, index)
+        return dict((host, self.get_state_for(self.backend, host, index)) for host in self.hosts)
 
 
     def act(self):
         """
         Figure out what you want to do from ansible, and then do it.
         """
+        hosts = self.hosts or self.host
+
+        # Keep the connection open for the whole run
+        try:
+            self.connect()
+        except socket.error:
+            e = get_exception()
+            self.module.fail_json(msg="unable to connect to haproxy socket %s: %s" % (self.socket, e))
+
         # Get the state before the run
-        state_before = self.get_state_for(self.backend, self.host)
+        state_before = self.get_states()
         self.command_results['state_before'] = state_before
 
         # toggle enable/disbale server
         if self.state == 'enabled':
-            self.enabled(self.host, self.backend, self.weight)
+            self.enabled(hosts, self.backend, self.weight)
         elif self.state == 'disabled':
-            self.disabled(self.host, self.backend, self.shutdown_sessions)
+            self.disabled(hosts, self.backend, self.shutdown_sessions)
         else:
             self.module.fail_json(msg="unknown state specified: '%s'" % self.state)
 
         # Get the state after the run
-        state_after = self.get_state_for(self.backend, self.host)
+        state_after = self.get_states()
         self.command_results['state_after'] = state_after
+        self.close()
 
         # Report change status
         if state_before != state_after:
@@ -369,7 +556,8 @@ def main():
     module = AnsibleModule(
         argument_spec = dict(
             state = dict(required=True, default=None, choices=ACTION_CHOICES),
-            host=dict(required=True, default=None),
+            host=dict(required=False, default=None),
+            hosts=dict(required=False, default=None, type='list'),
             backend=dict(required=False, default=None),
             weight=dict(required=False, default=None),
             socket = dict(required=False, default=DEFAULT_SOCKET_LOCATION),
@@ -379,6 +567,8 @@ def main():
             wait_retries=dict(required=False, default=WAIT_RETRIES, type='int'),
             wait_interval=dict(required=False, default=WAIT_INTERVAL, type='int'),
         ),
+        required_one_of=[['host', 'hosts']],
+        mutually_exclusive=[['host', 'hosts']],
     )
 
     if not socket:
@@ -389,6 +579,7 @@ def main():
 
 # import module snippets
 from ansible.module_utils.basic import *
+from ansible.module_utils.pycompat24 import get_exception
 
 if __name__ == '__main__':
     main()
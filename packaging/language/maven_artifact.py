@@ -24,11 +24,13 @@ __author__ = 'cschmidt'
 from lxml import etree
 import os
 import hashlib
-import sys
 import posixpath
+import tempfile
 import urlparse
 from ansible.module_utils.basic import *
 from ansible.module_utils.urls import *
+from ansible.module_utils._text import to_native
+from ansible.module_utils.pycompat24 import get_exception
 try:
     import boto3
     HAS_BOTO = True
@@ -119,6 +121,25 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: "1.9.3"
+    checksum_alg:
+        description:
+            - The checksum published next to the artifact (C(.md5), C(.sha1) or C(.sha256)) that is used to tell whether
+              I(dest) is up to date and to verify the download.
+            - If the repository does not publish it, downloads are not verified.
+        required: false
+        default: md5
+        choices: ['md5', 'sha1', 'sha256']
+        version_added: "2.3"
+    local_repository:
+        description:
+            - Path of a local repository (like C(~/.m2/repository)) artifacts are cached in, laid out by their maven
+              coordinates. It can be shared by several deploys or, on a network file system, by several hosts.
+            - An artifact found there with the right checksum is copied to I(dest) instead of being downloaded. If the
+              repository publishes no checksum, the artifact is requested with the ETag it was cached with and only
+              downloaded again if it changed.
+        required: false
+        default: null
+        version_added: "2.3"
 '''
 
 EXAMPLES = '''
@@ -151,8 +172,21 @@ EXAMPLES = '''
     extension: war
     repository_url: 'https://repo.company.com/maven'
     dest: /var/lib/tomcat7/webapps/web-app.war
+
+# Verify with SHA-1 and keep a copy in the local maven repository for the next deploy
+- maven_artifact:
+    group_id: com.company
+    artifact_id: web-app
+    extension: war
+    repository_url: 'https://repo.company.com/maven'
+    checksum_alg: sha1
+    local_repository: /var/cache/maven/repository
+    dest: /var/lib/tomcat7/webapps/web-app.war
 '''
 
+# Size of the reads when streaming and hashing artifacts
+CHUNK_SIZE = 1024 * 1024
+
 class Artifact(object):
     def __init__(self, group_id, artifact_id, version, classifier=None, extension='jar'):
         if not group_id:
@@ -223,6 +257,8 @@ class Artifact(object):
 class MavenDownloader:
     def __init__(self, module, base="http://repo1.maven.org/maven2"):
         self.module = module
+        self.checksum_alg = module.params.get('checksum_alg') or 'md5'
+        self.local_repository = module.params.get('local_repository')
         if base.endswith("/"):
             base = base.rstrip("/")
         self.base = base
@@ -261,7 +297,7 @@ class MavenDownloader:
 
         return posixpath.join(self.base, artifact.path(), artifact.artifact_id + "-" + version + "." + artifact.extension)
 
-    def _request(self, url, failmsg, f):
+    def _open(self, url, headers=None):
         url_to_use = url
         parsed_url = urlparse(url)
         if parsed_url.scheme=='s3':
@@ -278,75 +314,185 @@ class MavenDownloader:
         self.module.params['url_password'] = self.module.params.get('password', '')
         self.module.params['http_agent'] = self.module.params.get('user_agent', None)
 
-        response, info = fetch_url(self.module, url_to_use, timeout=req_timeout)
+        response, info = fetch_url(self.module, url_to_use, headers=headers, timeout=req_timeout)
+        info['url'] = url_to_use
+        return response, info
+
+    def _request(self, url, failmsg, f):
+        response, info = self._open(url)
         if info['status'] != 200:
-            raise ValueError(failmsg + " because of " + info['msg'] + "for URL " + url_to_use)
+            raise ValueError(failmsg + " because of " + info['msg'] + "for URL " + info['url'])
         else:
             return f(response)
 
 
     def download(self, artifact, filename=None):
+        """
+        Make filename a copy of the artifact. Returns False if it already was.
+        """
         filename = artifact.get_filename(filename)
         if not artifact.version or artifact.version == "latest":
             artifact = Artifact(artifact.group_id, artifact.artifact_id, self._find_latest_version_available(artifact),
                                 artifact.classifier, artifact.extension)
 
         url = self.find_uri_for_artifact(artifact)
-        if not self.verify_md5(filename, url + ".md5"):
-            response = self._request(url, "Failed to download artifact " + str(artifact), lambda r: r)
-            if response:
-                f = open(filename, 'w')
-                # f.write(response.read())
-                self._write_chunks(response, f, report_hook=self.chunk_report)
-                f.close()
-                return True
-            else:
-                return False
-        else:
-            return True
-
-    def chunk_report(self, bytes_so_far, chunk_size, total_size):
-        percent = float(bytes_so_far) / total_size
-        percent = round(percent * 100, 2)
-        sys.stdout.write("Downloaded %d of %d bytes (%0.2f%%)\r" %
-                         (bytes_so_far, total_size, percent))
-
-        if bytes_so_far >= total_size:
-            sys.stdout.write('\n')
-
-    def _write_chunks(self, response, file, chunk_size=8192, report_hook=None):
-        total_size = response.info().getheader('Content-Length').strip()
-        total_size = int(total_size)
-        bytes_so_far = 0
-
-        while 1:
-            chunk = response.read(chunk_size)
-            bytes_so_far += len(chunk)
-
-            if not chunk:
-                break
+        checksum = self._remote_checksum(url)
+        if checksum and os.path.exists(filename) and self._local_checksum(filename) == checksum:
+            return False
 
-            file.write(chunk)
-            if report_hook:
-                report_hook(bytes_so_far, chunk_size, total_size)
+        if not self.local_repository:
+            current = None
+            if not checksum and os.path.exists(filename):
+                # the repository publishes no checksum, compare the download with filename instead
+                current = self._local_checksum(filename)
+            return self._fetch(url, filename, checksum, failmsg="Failed to download artifact " + str(artifact),
+                               current=current)
+
+        cached = os.path.join(self.local_repository, artifact.path(), posixpath.basename(url))
+        cached_checksum = self._cached_checksum(cached)
+        if not cached_checksum or (checksum and cached_checksum != checksum):
+            self._fetch(url, cached, checksum, failmsg="Failed to download artifact " + str(artifact), shared=True)
+        elif not checksum:
+            # nothing to compare the cached copy with, let the repository tell if it changed
+            self._fetch(url, cached, checksum, failmsg="Failed to download artifact " + str(artifact), shared=True,
+                        etag=self._read_sidecar(cached + ".etag"), current=cached_checksum)
+
+        checksum = self._cached_checksum(cached)
+        if os.path.exists(filename) and self._local_checksum(filename) == checksum:
+            return False
 
-        return bytes_so_far
+        digest = hashlib.new(self.checksum_alg)
+        tmpfd, tmpname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            src = open(cached, 'rb')
+            try:
+                dst = os.fdopen(tmpfd, 'wb')
+                try:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                finally:
+                    dst.close()
+            finally:
+                src.close()
+        except (IOError, OSError):
+            os.remove(tmpname)
+            raise ValueError("Failed to copy %s to %s: %s" % (cached, filename, str(get_exception())))
+
+        if not checksum or digest.hexdigest() != checksum:
+            # another deploy replaced the cached copy while it was read, download it directly
+            os.remove(tmpname)
+            self._fetch(url, filename, checksum, failmsg="Failed to download artifact " + str(artifact))
+            return True
 
-    def verify_md5(self, file, remote_md5):
-        if not os.path.exists(file):
+        self.module.atomic_move(tmpname, filename)
+        return True
+
+    def _fetch(self, url, filename, checksum, failmsg, shared=False, etag=None, current=None):
+        """
+        Stream url to filename, hashing it on the way, and check the result
+        against checksum. With an etag the request is made conditional, and
+        an unchanged artifact is not downloaded again. A download matching
+        current, the checksum of filename, leaves it untouched. Files in the
+        shared local repository get their checksum and ETag stored next to
+        them. Returns False if filename was not changed.
+        """
+        headers = None
+        if etag:
+            headers = {'If-None-Match': etag}
+        response, info = self._open(url, headers=headers)
+        if etag and info['status'] == 304:
+            return False
+        if info['status'] != 200:
+            raise ValueError(failmsg + " because of " + info['msg'] + "for URL " + info['url'])
+
+        dirname = os.path.dirname(os.path.abspath(filename))
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        digest = hashlib.new(self.checksum_alg)
+        tmpfd, tmpname = tempfile.mkstemp(dir=dirname)
+        try:
+            f = os.fdopen(tmpfd, 'wb')
+            try:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            finally:
+                f.close()
+        except (IOError, OSError):
+            os.remove(tmpname)
+            raise ValueError(failmsg + ": " + str(get_exception()))
+
+        if checksum and digest.hexdigest() != checksum:
+            os.remove(tmpname)
+            raise ValueError(failmsg + ": %s checksum is %s instead of %s" % (self.checksum_alg, digest.hexdigest(), checksum))
+
+        if current and digest.hexdigest() == current:
+            os.remove(tmpname)
+            if shared:
+                self._write_sidecar(filename + ".etag", info.get('etag') or '')
             return False
+
+        if shared:
+            # other deploys may be reading the local repository, so files appear there in a
+            # single rename, and the checksum is only written once the artifact it describes
+            # is in place; readers still verify their copy against it
+            checksum_file = filename + "." + self.checksum_alg
+            try:
+                os.remove(checksum_file)
+            except OSError:
+                pass
+            os.chmod(tmpname, 0o644)
+            os.rename(tmpname, filename)
+            self._write_sidecar(checksum_file, digest.hexdigest())
+            self._write_sidecar(filename + ".etag", info.get('etag') or '')
         else:
-            local_md5 = self._local_md5(file)
-            remote = self._request(remote_md5, "Failed to download MD5", lambda r: r.read())
-            return local_md5 == remote
+            self.module.atomic_move(tmpname, filename)
+        return True
+
+    def _remote_checksum(self, url):
+        response, info = self._open(url + "." + self.checksum_alg)
+        if info['status'] != 200:
+            return None
+        # some repositories append the file name to the hash
+        content = to_native(response.read()).split()
+        if not content:
+            return None
+        return content[0].lower()
 
-    def _local_md5(self, file):
-        md5 = hashlib.md5()
+    def _local_checksum(self, file):
+        digest = hashlib.new(self.checksum_alg)
         f = open(file, 'rb')
-        for chunk in iter(lambda: f.read(8192), ''):
-            md5.update(chunk)
+        try:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        finally:
+            f.close()
+        return digest.hexdigest()
+
+    def _cached_checksum(self, cached):
+        if not os.path.exists(cached):
+            return None
+        return self._read_sidecar(cached + "." + self.checksum_alg) or None
+
+    def _read_sidecar(self, path):
+        try:
+            f = open(path)
+            try:
+                return f.read().strip()
+            finally:
+                f.close()
+        except IOError:
+            return None
+
+    def _write_sidecar(self, path, content):
+        tmpfd, tmpname = tempfile.mkstemp(dir=os.path.dirname(path))
+        f = os.fdopen(tmpfd, 'w')
+        f.write(content)
         f.close()
-        return md5.hexdigest()
+        os.chmod(tmpname, 0o644)
+        os.rename(tmpname, path)
 
 
 def main():
@@ -364,6 +510,8 @@ def main():
             timeout = dict(default=10, type='int'),
             dest = dict(type="path", default=None),
             validate_certs = dict(required=False, default=True, type='bool'),
+            checksum_alg = dict(default='md5', choices=['md5', 'sha1', 'sha256']),
+            local_repository = dict(type='path', default=None),
         )
     )
 
@@ -397,24 +545,18 @@ def main():
     except ValueError as e:
         module.fail_json(msg=e.args[0])
 
-    prev_state = "absent"
     if os.path.isdir(dest):
         dest = posixpath.join(dest, artifact_id + "-" + version + "." + extension)
-    if os.path.lexists(dest) and downloader.verify_md5(dest, downloader.find_uri_for_artifact(artifact) + '.md5'):
-        prev_state = "present"
     else:
         path = os.path.dirname(dest)
         if not os.path.exists(path):
             os.makedirs(path)
 
-    if prev_state == "present":
-        module.exit_json(dest=dest, state=state, changed=False)
-
     try:
         if downloader.download(artifact, dest):
             module.exit_json(state=state, dest=dest, group_id=group_id, artifact_id=artifact_id, version=version, classifier=classifier, extension=extension, repository_url=repository_url, changed=True)
         else:
-            module.fail_json(msg="Unable to download the artifact")
+            module.exit_json(dest=dest, state=state, changed=False)
     except ValueError as e:
         module.fail_json(msg=e.args[0])
 
@@ -139,38 +139,195 @@ import os
 import re
 import sys
 
-def get_version(pacman_output):
-    """Take pacman -Qi or pacman -Si output and get the Version"""
-    lines = pacman_output.split('\n')
-    for line in lines:
-        if 'Version' in line:
-            return line.split(':')[1].strip()
-    return None
-
-def query_package(module, pacman_path, name, state="present"):
-    """Query the package status in both the local system and the repository. Returns a boolean to indicate if the package is installed, a second boolean to indicate if the package is up-to-date and a third boolean to indicate whether online information were available"""
-    if state == "present":
-        lcmd = "%s -Qi %s" % (pacman_path, name)
-        lrc, lstdout, lstderr = module.run_command(lcmd, check_rc=False)
-        if lrc != 0:
+NON_ALNUM = ''.join(chr(c) for c in range(256) if not chr(c).isalnum())
+DIGIT_SEGMENT = re.compile(r'[0-9]+')
+ALPHA_SEGMENT = re.compile(r'[a-zA-Z]+')
+
+def split_evr(version):
+    """Split a pacman version into (epoch, version, release) like libalpm's parseEVR"""
+    epoch = '0'
+    digits = len(version) - len(version.lstrip('0123456789'))
+    if version[digits:digits + 1] == ':':
+        epoch = version[:digits] or '0'
+        version = version[digits + 1:]
+
+    release = None
+    if '-' in version:
+        version, release = version.rsplit('-', 1)
+
+    return epoch, version, release
+
+def rpmvercmp(a, b):
+    """Compare two version segments the way libalpm's rpmvercmp does. Returns -1, 0 or 1"""
+    if a == b:
+        return 0
+
+    one, two = a, b
+    while one and two:
+        stripped_one = one.lstrip(NON_ALNUM)
+        stripped_two = two.lstrip(NON_ALNUM)
+        sep_one = len(one) - len(stripped_one)
+        sep_two = len(two) - len(stripped_two)
+        one, two = stripped_one, stripped_two
+
+        if not one or not two:
+            break
+
+        # If the separator lengths were different, we are also finished
+        if sep_one != sep_two:
+            return sep_one < sep_two and -1 or 1
+
+        # Grab the first completely numeric or alpha segment of both strings
+        isnum = one[0].isdigit()
+        segment = isnum and DIGIT_SEGMENT or ALPHA_SEGMENT
+        seg_one = segment.match(one).group(0)
+        match_two = segment.match(two)
+        seg_two = match_two and match_two.group(0) or ''
+        one, two = one[len(seg_one):], two[len(seg_two):]
+
+        # Numeric segments are always newer than alpha segments
+        if not seg_two:
+            return isnum and 1 or -1
+
+        if isnum:
+            seg_one = seg_one.lstrip('0')
+            seg_two = seg_two.lstrip('0')
+            # Whichever number has more digits wins
+            if len(seg_one) != len(seg_two):
+                return len(seg_one) > len(seg_two) and 1 or -1
+
+        if seg_one != seg_two:
+            return seg_one < seg_two and -1 or 1
+
+    if not one and not two:
+        return 0
+
+    # A remaining alpha string never beats an empty string
+    if (not one and not two[:1].isalpha()) or one[:1].isalpha():
+        return -1
+    return 1
+
+def vercmp(a, b):
+    """Python implementation of vercmp(8). Returns -1, 0 or 1 if a is older, equal or newer than b"""
+    if a == b:
+        return 0
+
+    epoch_a, version_a, release_a = split_evr(a)
+    epoch_b, version_b, release_b = split_evr(b)
+
+    ret = rpmvercmp(epoch_a, epoch_b)
+    if ret == 0:
+        ret = rpmvercmp(version_a, version_b)
+        if ret == 0 and release_a and release_b:
+            ret = rpmvercmp(release_a, release_b)
+    return ret
+
+def get_local_versions(module, pacman_path):
+    """Return a dict of the installed packages and their version, using a single pacman -Q"""
+    rc, stdout, stderr = module.run_command([pacman_path, '-Q'], check_rc=False)
+    if rc != 0:
+        module.fail_json(msg="could not list installed packages", stderr=stderr)
+    return dict(line.split()[:2] for line in stdout.split('\n') if len(line.split()) >= 2)
+
+def get_sync_versions(module, pacman_path):
+    """Return a dict of the packages available in the sync databases and their version, using a single pacman -Sl"""
+    rc, stdout, stderr = module.run_command([pacman_path, '-Sl'], check_rc=False)
+    versions = {}
+    if rc != 0:
+        return versions
+    for line in stdout.split('\n'):
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        repo, name, version = fields[:3]
+        # The first repository listing a package is the one pacman installs from
+        versions.setdefault(name, version)
+        versions['%s/%s' % (repo, name)] = version
+    return versions
+
+def get_provided_versions(module, pacman_path, names):
+    """Resolve names that are not installed packages, such as virtual packages satisfied through
+    provides, with a single pacman -T and a single pacman -Qi call.
+
+    Returns a dict mapping each satisfied name to the name and version of the installed provider.
+    """
+    rc, stdout, stderr = module.run_command([pacman_path, '-T'] + names, check_rc=False)
+    if rc not in (0, 127):
+        return {}
+    missing = set(stdout.split())
+    satisfied = [name for name in names if name not in missing]
+    if not satisfied:
+        return {}
+
+    rc, stdout, stderr = module.run_command([pacman_path, '-Qi'] + satisfied, check_rc=False)
+    providers = []
+    fields = {}
+    key = None
+    for line in stdout.split('\n') + ['']:
+        if not line.strip():
+            # Each package is described in its own block
+            if 'Name' in fields:
+                providers.append(fields)
+            fields = {}
+            key = None
+        elif line[0].isspace() and key:
+            fields[key] += ' ' + line.strip()
+        elif ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip()
+            fields[key] = value.strip()
+
+    results = {}
+    for fields in providers:
+        provides = [re.split('[<>=]', p)[0] for p in fields.get('Provides', '').split() if p != 'None']
+        for name in satisfied:
+            if name not in results and (name == fields['Name'] or name in provides):
+                results[name] = (fields['Name'], fields.get('Version'))
+    for name in satisfied:
+        # Installed according to pacman -T, even if its provider could not be found
+        results.setdefault(name, (name, None))
+    return results
+
+def query_packages(module, pacman_path, names):
+    """Query the status of all the given packages at once, in both the local system and the repositories.
+
+    Returns a dict mapping each package name to a tuple of three booleans: whether the package
+    is installed, whether it is up-to-date and whether the repository version could not be found.
+    """
+    local = get_local_versions(module, pacman_path)
+    sync = None
+    results = {}
+
+    # Names that are not installed packages may still be satisfied by one, e.g. through provides
+    unknown = [name for name in names if name.split('/')[-1] not in local]
+    provided = {}
+    if unknown:
+        provided = get_provided_versions(module, pacman_path, [name.split('/')[-1] for name in unknown])
+
+    for name in names:
+        pkgname = name.split('/')[-1]
+        lversion = local.get(pkgname)
+        sync_name = name
+        if lversion is None and pkgname in provided:
+            # Compare the installed provider with its repository version instead
+            sync_name, lversion = provided[pkgname]
+        elif lversion is None:
             # package is not installed locally
-            return False, False, False
-
-        # get the version installed locally (if any)
-        lversion = get_version(lstdout)
+            results[name] = (False, False, False)
+            continue
 
-        rcmd = "%s -Si %s" % (pacman_path, name)
-        rrc, rstdout, rstderr = module.run_command(rcmd, check_rc=False)
-        # get the version in the repository
-        rversion = get_version(rstdout)
+        if sync is None:
+            sync = get_sync_versions(module, pacman_path)
+        rversion = sync.get(sync_name)
 
-        if rrc == 0:
-            # Return True to indicate that the package is installed locally, and the result of the version number comparison
-            # to determine if the package is up-to-date.
-            return True, (lversion == rversion), False
+        if rversion is None or lversion is None:
+            # package is installed but cannot fetch remote Version. Last True stands for the error
+            results[name] = (True, True, True)
+        else:
+            # Installed locally, up-to-date unless the repository holds a newer version
+            results[name] = (True, vercmp(lversion, rversion) >= 0, False)
 
-    # package is installed but cannot fetch remote Version. Last True stands for the error
-        return True, True, True
+    return results
 
 
 def update_package_db(module, pacman_path):
@@ -215,21 +372,19 @@ def remove_packages(module, pacman_path, packages):
     else:
         args = "R"
 
-    remove_c = 0
-    # Using a for loop incase of error, we can report the package that failed
-    for package in packages:
-        # Query the package first, to see if we even need to remove
-        installed, updated, unknown = query_package(module, pacman_path, package)
-        if not installed:
-            continue
+    # Query the packages first, to see if we even need to remove
+    status = query_packages(module, pacman_path, packages)
+    targets = [package for package in packages if status[package][0]]
+    remove_c = len(targets)
 
-        cmd = "%s -%s %s --noconfirm" % (pacman_path, args, package)
+    if targets:
+        # Remove all the targets in a single transaction: with recurse, removing
+        # one package may already take away a later target it depends on
+        cmd = "%s -%s %s --noconfirm" % (pacman_path, args, " ".join(targets))
         rc, stdout, stderr = module.run_command(cmd, check_rc=False)
 
         if rc != 0:
-            module.fail_json(msg="failed to remove %s" % (package))
-
-        remove_c += 1
+            module.fail_json(msg="failed to remove %s" % (", ".join(targets)), stderr=stderr)
 
     if remove_c > 0:
 
@@ -243,9 +398,10 @@ def install_packages(module, pacman_path, state, packages, package_files):
     package_err = []
     message = ""
 
+    status = query_packages(module, pacman_path, packages)
     for i, package in enumerate(packages):
         # if the package is installed and state == present or state == latest and is up-to-date then skip
-        installed, updated, latestError = query_package(module, pacman_path, package)
+        installed, updated, latestError = status[package]
         if latestError and state == 'latest':
             package_err.append(package)
 
@@ -275,8 +431,9 @@ def install_packages(module, pacman_path, state, packages, package_files):
 
 def check_packages(module, pacman_path, packages, state):
     would_be_changed = []
+    status = query_packages(module, pacman_path, packages)
     for package in packages:
-        installed, updated, unknown = query_package(module, pacman_path, package)
+        installed, updated, unknown = status[package]
         if ((state in ["present", "latest"] and not installed) or
                 (state == "absent" and installed) or
                 (state == "latest" and not updated)):
@@ -290,19 +447,27 @@ def check_packages(module, pacman_path, packages, state):
         module.exit_json(changed=False, msg="package(s) already %s" % state)
 
 
+def get_package_groups(module, pacman_path):
+    """Return a dict of the groups of the sync databases and their members, using a single pacman -Sgg"""
+    rc, stdout, stderr = module.run_command([pacman_path, '-Sgg'], check_rc=False)
+    groups = {}
+    if rc != 0:
+        return groups
+    for line in stdout.split('\n'):
+        fields = line.split()
+        if len(fields) == 2:
+            groups.setdefault(fields[0], []).append(fields[1])
+    return groups
+
+
 def expand_package_groups(module, pacman_path, pkgs):
     expanded = []
+    groups = get_package_groups(module, pacman_path)
 
     for pkg in pkgs:
-        cmd = "%s -Sgq %s" % (pacman_path, pkg)
-        rc, stdout, stderr = module.run_command(cmd, check_rc=False)
-
-        if rc == 0:
+        if pkg in groups:
             # A group was found matching the name, so expand it
-            for name in stdout.split('\n'):
-                name = name.strip()
-                if name:
-                    expanded.append(name)
+            expanded.extend(groups[pkg])
         else:
             expanded.append(pkg)
 
@@ -77,7 +77,8 @@ options:
   state:
     description:
       - "Should this port accept(enabled) or reject(disabled) connections."
-    required: true
+      - "Required unless I(zone_settings) is given."
+    required: false
     choices: [ "enabled", "disabled" ]
   timeout:
     description:
@@ -90,6 +91,14 @@ options:
     required: false
     default: null
     version_added: "2.1"
+  zone_settings:
+    description:
+      - 'The complete desired state of the zone, as a dict with any of the C(ports), C(services), C(sources) and C(rich_rules) lists and the C(masquerade) boolean. Items of a given list which are present in the zone but not in the list are removed; keys which are not given are left untouched.'
+      - 'The zone settings are fetched once, compared in memory and all the permanent changes are committed with a single update of the zone. Runtime changes only touch the items which differ.'
+      - 'When set, I(state) is not required and can not be combined with I(service), I(port), I(rich_rule), I(interface) or I(masquerade).'
+    required: false
+    default: null
+    version_added: "2.3"
 notes:
   - Not tested on any Debian based system.
   - Requires the python2 bindings of firewalld, which may not be installed by default if the distribution switched to python 3
@@ -140,6 +149,17 @@ EXAMPLES = '''
     state: enabled
     permanent: true
     zone: dmz
+
+- firewalld:
+    zone: public
+    permanent: true
+    immediate: true
+    zone_settings:
+      services: [ ssh, https ]
+      ports: [ 8081/tcp, 161-162/udp ]
+      rich_rules:
+        - 'rule service name="ftp" audit limit value="1/m" accept'
+      masquerade: no
 '''
 
 from ansible.module_utils.basic import AnsibleModule
@@ -435,6 +455,152 @@ def set_rich_rule_disabled_permanent(zone, rule):
     fw_settings.removeRichRule(rule)
     update_fw_settings(fw_zone, fw_settings)
 
+####################
+# zone settings handling
+#
+ZONE_SETTINGS_KEYS = ['ports', 'services', 'sources', 'rich_rules', 'masquerade']
+
+def normalize_zone_settings(settings):
+    """
+    Turn the zone_settings parameter into sets comparable with the output
+    of FirewallClientZoneSettings
+    """
+    unknown = set(settings) - set(ZONE_SETTINGS_KEYS)
+    if unknown:
+        module.fail_json(msg='unsupported zone_settings keys: %s' % ', '.join(sorted(unknown)))
+
+    desired = {}
+    for key, value in settings.items():
+        if key == 'masquerade':
+            desired[key] = module.boolean(value)
+            continue
+        if value is None:
+            value = []
+        elif not isinstance(value, list):
+            value = [value]
+        if key == 'ports':
+            ports = set()
+            for item in value:
+                try:
+                    port, protocol = item.split('/')
+                except ValueError:
+                    module.fail_json(msg='improper port format %s (missing protocol?)' % item)
+                ports.add((port, protocol))
+            value = ports
+        elif key == 'rich_rules':
+            # Convert the rule strings to standard format
+            value = set(str(Rich_Rule(rule_str=rule)) for rule in value)
+        else:
+            value = set(value)
+        desired[key] = value
+    return desired
+
+def read_zone_settings(fw_settings):
+    return dict(
+        ports=set(tuple(port) for port in fw_settings.getPorts()),
+        services=set(fw_settings.getServices()),
+        sources=set(fw_settings.getSources()),
+        rich_rules=set(fw_settings.getRichRules()),
+        masquerade=bool(fw_settings.getMasquerade()),
+    )
+
+def diff_zone_settings(current, desired):
+    """
+    Returns a dict of the items to add and remove for each key of desired,
+    and the new masquerade value if it has to change
+    """
+    diff = {}
+    for key, value in desired.items():
+        if key == 'masquerade':
+            if current[key] != value:
+                diff[key] = value
+        else:
+            to_add = sorted(value - current[key])
+            to_remove = sorted(current[key] - value)
+            if to_add or to_remove:
+                diff[key] = (to_add, to_remove)
+    return diff
+
+def describe_zone_settings_diff(diff):
+    msgs = []
+    for key in ZONE_SETTINGS_KEYS:
+        if key not in diff:
+            continue
+        if key == 'masquerade':
+            msgs.append('masquerade %s' % (diff[key] and 'enabled' or 'disabled'))
+            continue
+        to_add, to_remove = diff[key]
+        if key == 'ports':
+            to_add = ['/'.join(port) for port in to_add]
+            to_remove = ['/'.join(port) for port in to_remove]
+        if to_add:
+            msgs.append('added %s %s' % (key, ', '.join(to_add)))
+        if to_remove:
+            msgs.append('removed %s %s' % (key, ', '.join(to_remove)))
+    return msgs
+
+def get_zone_settings(zone):
+    return read_zone_settings(fw.getZoneSettings(zone))
+
+def set_zone_settings_permanent(fw_zone, fw_settings, diff):
+    """
+    Apply all the changes to the settings fetched by get_fw_zone_settings
+    and commit them with a single update of the zone
+    """
+    to_add, to_remove = diff.get('ports', ([], []))
+    for port, protocol in to_remove:
+        fw_settings.removePort(port, protocol)
+    for port, protocol in to_add:
+        fw_settings.addPort(port, protocol)
+    to_add, to_remove = diff.get('services', ([], []))
+    for service in to_remove:
+        fw_settings.removeService(service)
+    for service in to_add:
+        fw_settings.addService(service)
+    to_add, to_remove = diff.get('sources', ([], []))
+    for source in to_remove:
+        fw_settings.removeSource(source)
+    for source in to_add:
+        fw_settings.addSource(source)
+    to_add, to_remove = diff.get('rich_rules', ([], []))
+    for rule in to_remove:
+        fw_settings.removeRichRule(rule)
+    for rule in to_add:
+        fw_settings.addRichRule(rule)
+    if 'masquerade' in diff:
+        fw_settings.setMasquerade(diff['masquerade'])
+    update_fw_settings(fw_zone, fw_settings)
+
+def set_zone_settings(zone, diff, timeout):
+    """
+    Apply only the changed items to the runtime configuration
+    """
+    to_add, to_remove = diff.get('ports', ([], []))
+    for port, protocol in to_remove:
+        fw.removePort(zone, port, protocol)
+    for port, protocol in to_add:
+        fw.addPort(zone, port, protocol, timeout)
+    to_add, to_remove = diff.get('services', ([], []))
+    for service in to_remove:
+        fw.removeService(zone, service)
+    for service in to_add:
+        fw.addService(zone, service, timeout)
+    to_add, to_remove = diff.get('sources', ([], []))
+    for source in to_remove:
+        fw.removeSource(zone, source)
+    for source in to_add:
+        fw.addSource(zone, source)
+    to_add, to_remove = diff.get('rich_rules', ([], []))
+    for rule in to_remove:
+        fw.removeRichRule(zone, rule)
+    for rule in to_add:
+        fw.addRichRule(zone, rule, timeout)
+    if 'masquerade' in diff:
+        if diff['masquerade']:
+            fw.addMasquerade(zone)
+        else:
+            fw.removeMasquerade(zone)
+
 def main():
     global module
 
@@ -450,11 +616,12 @@ def main():
             immediate=dict(type='bool',default=False),
             source=dict(required=False,default=None),
             permanent=dict(type='bool',required=False,default=None),
-            state=dict(choices=['enabled', 'disabled'], required=True),
+            state=dict(choices=['enabled', 'disabled'], required=False, default=None),
             timeout=dict(type='int',required=False,default=0),
             interface=dict(required=False,default=None),
             masquerade=dict(required=False,default=None),
             offline=dict(type='bool',required=False,default=None),
+            zone_settings=dict(type='dict',required=False,default=None),
         ),
         supports_check_mode=True
     )
@@ -515,6 +682,9 @@ def main():
 
 
     ## Verify required params are provided
+    if module.params['state'] == None and module.params['zone_settings'] == None:
+        module.fail_json(msg='state is a required parameter')
+
     if module.params['source'] == None and module.params['permanent'] == None:
         module.fail_json(msg='permanent is a required parameter')
 
@@ -552,8 +722,11 @@ def main():
     timeout = module.params['timeout']
     interface = module.params['interface']
     masquerade = module.params['masquerade']
+    zone_settings = module.params['zone_settings']
 
     modification_count = 0
+    if zone_settings != None:
+        modification_count += 1
     if service != None:
         modification_count += 1
     if port != None:
@@ -566,7 +739,31 @@ def main():
         modification_count += 1
 
     if modification_count > 1:
-        module.fail_json(msg='can only operate on port, service, rich_rule or interface at once')
+        module.fail_json(msg='can only operate on port, service, rich_rule, interface or zone_settings at once')
+
+    if zone_settings != None:
+        desired = normalize_zone_settings(zone_settings)
+        diff_permanent = {}
+        diff_immediate = {}
+
+        if permanent:
+            fw_zone, fw_settings = action_handler(get_fw_zone_settings, (zone,))
+            diff_permanent = diff_zone_settings(read_zone_settings(fw_settings), desired)
+        if immediate or not permanent:
+            current = action_handler(get_zone_settings, (zone,))
+            diff_immediate = diff_zone_settings(current, desired)
+
+        if diff_permanent or diff_immediate:
+            if module.check_mode:
+                module.exit_json(changed=True)
+            changed = True
+
+        if diff_permanent:
+            action_handler(set_zone_settings_permanent, (fw_zone, fw_settings, diff_permanent))
+            msgs.append('Permanent operation: %s' % ', '.join(describe_zone_settings_diff(diff_permanent)))
+        if diff_immediate:
+            action_handler(set_zone_settings, (zone, diff_immediate, timeout))
+            msgs.append('Non-permanent operation: %s' % ', '.join(describe_zone_settings_diff(diff_immediate)))
 
     if service != None:
         if immediate and permanent:
@@ -23,6 +23,44 @@ BINS = dict(
     ipv6='ip6tables',
 )
 
+SAVE_BINS = dict(
+    ipv4='iptables-save',
+    ipv6='ip6tables-save',
+)
+
+RESTORE_BINS = dict(
+    ipv4='iptables-restore',
+    ipv6='ip6tables-restore',
+)
+
+# Long options and their short form as printed by iptables-save
+OPTION_ALIASES = {
+    '--protocol': '-p',
+    '--source': '-s',
+    '--destination': '-d',
+    '--match': '-m',
+    '--jump': '-j',
+    '--goto': '-g',
+    '--in-interface': '-i',
+    '--out-interface': '-o',
+    '--fragment': '-f',
+    '--source-port': '--sport',
+    '--destination-port': '--dport',
+}
+
+# Port options, as printed by iptables-save
+PORT_OPTIONS = ('--sport', '--dport', '--sports', '--dports', '--ports')
+
+# Rule options allowed in the items of the rules list
+RULE_OPTIONS = (
+    'table', 'state', 'action', 'chain', 'protocol', 'source', 'to_source',
+    'destination', 'to_destination', 'match', 'jump', 'goto', 'in_interface',
+    'out_interface', 'fragment', 'set_counters', 'source_port',
+    'destination_port', 'to_ports', 'set_dscp_mark', 'set_dscp_mark_class',
+    'comment', 'ctstate', 'limit', 'limit_burst', 'uid_owner', 'reject_with',
+    'icmp_type',
+)
+
 ANSIBLE_METADATA = {'status': ['preview'],
                     'supported_by': 'core',
                     'version': '1.0'}
@@ -295,6 +333,25 @@ options:
         ACCEPT, DROP, QUEUE, RETURN. Only built in chains can have policies.
         This parameter requires the chain parameter. Ignores all other
         parameters."
+  rules:
+    version_added: "2.3"
+    description:
+      - "A list of rules to manage in a single transaction. Each item is a
+        dict taking the same rule options as the module (C(chain),
+        C(protocol), C(jump), ...) plus C(table), C(state) and C(action),
+        which default to the module level values."
+      - "The current ruleset is read once with iptables-save, the rules are
+        compared against it in memory and all the changes are applied at
+        once with iptables-restore --noflush."
+      - "Rules to add that are not found in the saved ruleset are double
+        checked with iptables -C first, so a rule is never added twice."
+      - "iptables-save prints some options differently than they are
+        written: REJECT targets, DSCP marks, limits, ICMP types, port and
+        user names, host names and addresses with host bits. Rules to
+        remove using them that are not found in the saved ruleset are also
+        double checked with iptables -C."
+      - "Ignores all other rule options, as well as C(flush) and C(policy)."
+    required: false
 '''
 
 EXAMPLES = '''
@@ -340,8 +397,31 @@ EXAMPLES = '''
     table: mangle
     set_dscp_mark_class: CS1
     protocol: tcp
+
+# Converge several rules in a single iptables-restore transaction
+- iptables:
+    rules:
+      - chain: INPUT
+        protocol: tcp
+        destination_port: 22
+        jump: ACCEPT
+      - chain: INPUT
+        protocol: tcp
+        destination_port: 80
+        jump: ACCEPT
+      - chain: INPUT
+        source: 8.8.8.8
+        jump: DROP
+        state: absent
+  become: yes
 '''
 
+import re
+import shlex
+import socket
+import binascii
+
+
 def append_param(rule, param, flag, is_list):
     if is_list:
         for item in param:
@@ -445,6 +525,247 @@ def set_chain_policy(iptables_path, module, params):
     module.run_command(cmd, check_rc=True)
 
 
+def tokenize_rule(rule):
+    """Split a rule in (option, values) pairs, negation being part of the option"""
+    pairs = []
+    negate = False
+    for token in rule:
+        if token == '!':
+            if pairs and not pairs[-1][1]:
+                # Old style negation placed after the option, e.g. "-s ! 10.0.0.1"
+                pairs[-1] = ('!' + pairs[-1][0], pairs[-1][1])
+            else:
+                negate = True
+        elif len(token) > 1 and token[0] == '-' and not token[1].isdigit():
+            pairs.append(((negate and '!' or '') + token, []))
+            negate = False
+        elif pairs:
+            pairs[-1][1].append(token)
+    return pairs
+
+
+def canonical_rule(rule, ip_version):
+    """Return an order independent form of a rule spec, normalized the
+    way iptables-save prints it, so rules can be compared in memory."""
+    pairs = []
+    protocol = None
+    for option, values in tokenize_rule(rule):
+        negate = option.startswith('!') and '!' or ''
+        option = negate + OPTION_ALIASES.get(option.lstrip('!'), option.lstrip('!'))
+        values = list(values)
+
+        if option.lstrip('!') == '-p' and values:
+            values[0] = values[0].lower()
+            protocol = values[0]
+            if option == '-p' and protocol == 'all':
+                # Matching any protocol is the default, iptables-save omits it
+                continue
+        elif option.lstrip('!') in ('-s', '-d') and values:
+            if '/' not in values[0]:
+                if ip_version == 'ipv6' and ':' in values[0]:
+                    values[0] += '/128'
+                elif ip_version == 'ipv4' and re.match(r'^[0-9.]+$', values[0]):
+                    values[0] += '/32'
+            if not negate and values[0] in ('0.0.0.0/0', '0/0', '::/0'):
+                # Matching any address is the default, iptables-save omits it
+                continue
+        elif option.lstrip('!') in PORT_OPTIONS and values:
+            # iptables-save prints open ended port ranges with both bounds
+            ports = []
+            for port in values[0].split(','):
+                if port.startswith(':'):
+                    port = '0' + port
+                if port.endswith(':'):
+                    port += '65535'
+                ports.append(port)
+            values[0] = ','.join(ports)
+        elif option.lstrip('!') in ('--state', '--ctstate') and values:
+            values[0] = ','.join(sorted(values[0].split(',')))
+        elif option == '-c':
+            # Counters are not part of the rule itself
+            continue
+        pairs.append((option, tuple(values)))
+
+    # The protocol match is implied by -p and always printed by iptables-save
+    pairs = [pair for pair in pairs if pair != ('-m', (protocol,))]
+    return tuple(sorted(pairs))
+
+
+def is_saved_address(address, ip_version):
+    """Tell whether iptables-save prints an address, with an optional
+    prefix length, the same way it is written in the rule."""
+    prefix = None
+    if '/' in address:
+        address, prefix = address.split('/', 1)
+
+    try:
+        if ip_version == 'ipv6':
+            packed = socket.inet_pton(socket.AF_INET6, address)
+            if socket.inet_ntop(socket.AF_INET6, packed) != address:
+                return False
+        else:
+            packed = socket.inet_aton(address)
+            if socket.inet_ntoa(packed) != address:
+                return False
+    except (socket.error, ValueError, AttributeError):
+        # Host names are resolved by iptables
+        return False
+
+    if prefix is None:
+        return True
+    bits = len(packed) * 8
+    if not prefix.isdigit() or int(prefix) > bits:
+        return False
+    # iptables-save prints the network address, without the host bits
+    host_mask = (1 << (bits - int(prefix))) - 1
+    return (int(binascii.hexlify(packed), 16) & host_mask) == 0
+
+
+def needs_live_check(params, ip_version):
+    """Tell whether a rule holds options that iptables-save prints
+    differently than canonical_rule normalizes them, so that not finding
+    the rule in the saved ruleset proves nothing and iptables -C has to
+    be asked before removing it:
+
+    - REJECT targets, printed with their default --reject-with
+    - DSCP marks and classes, printed as hexadecimal --set-dscp values
+    - limit matches, printed with normalized units and bursts
+    - ICMP types, port and user names, printed as numbers
+    - host names and addresses with host bits or non canonical notation
+    """
+    if params['jump'] == 'REJECT' or params['reject_with']:
+        return True
+    if params['set_dscp_mark'] or params['set_dscp_mark_class']:
+        return True
+    if params['limit'] or params['limit_burst'] or params['icmp_type']:
+        return True
+    if params['uid_owner'] and not params['uid_owner'].isdigit():
+        return True
+    for option in ('source_port', 'destination_port', 'to_ports'):
+        if params[option] and re.search(r'[^0-9:,-]', params[option]):
+            return True
+    for option in ('source', 'destination'):
+        if params[option] and not is_saved_address(params[option], ip_version):
+            return True
+    return False
+
+
+def get_saved_rules(module, ip_version, table):
+    """Read the rules of a table with one iptables-save call, as a dict
+    mapping each chain to a dict of canonical rules and their count."""
+    iptables_save_path = module.get_bin_path(SAVE_BINS[ip_version], True)
+    rc, stdout, stderr = module.run_command([iptables_save_path, '-t', table], check_rc=True)
+    chains = {}
+    for line in stdout.splitlines():
+        if line.startswith(':'):
+            chains.setdefault(line[1:].split()[0], {})
+        elif line.startswith('-A '):
+            tokens = shlex.split(line)
+            rules = chains.setdefault(tokens[1], {})
+            key = canonical_rule(tokens[2:], ip_version)
+            rules[key] = rules.get(key, 0) + 1
+    return chains
+
+
+def quote_restore_arg(arg):
+    if arg and not re.search(r'[\s"\'\\]', arg):
+        return arg
+    return '"%s"' % arg.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def apply_rules(iptables_path, module, ip_version, rules):
+    """Converge a list of rules with one iptables-save per table and a
+    single iptables-restore --noflush for all the changes."""
+    saved = {}
+    changes = {}
+    tables = []
+    results = []
+
+    for item in rules:
+        if not isinstance(item, dict):
+            module.fail_json(msg="Each item of rules must be a dict, got %r" % (item,))
+        unknown = set(item) - set(RULE_OPTIONS)
+        if unknown:
+            module.fail_json(msg="Unsupported rule options: %s" % ', '.join(sorted(unknown)))
+
+        params = dict((option, None) for option in RULE_OPTIONS)
+        params['match'] = []
+        params['ctstate'] = []
+        for option in ('table', 'state', 'action'):
+            params[option] = module.params[option]
+        for option, value in item.items():
+            if option in ('match', 'ctstate'):
+                if not isinstance(value, list):
+                    value = str(value).split(',')
+            elif value is not None:
+                value = str(value)
+            params[option] = value
+
+        if not params['chain']:
+            module.fail_json(msg="Each item of rules requires a chain.")
+        if params['table'] not in ('filter', 'nat', 'mangle', 'raw', 'security'):
+            module.fail_json(msg="Invalid table %s" % params['table'])
+        if params['state'] not in ('present', 'absent'):
+            module.fail_json(msg="Invalid state %s" % params['state'])
+        if params['action'] not in ('append', 'insert'):
+            module.fail_json(msg="Invalid action %s" % params['action'])
+
+        table = params['table']
+        if table not in saved:
+            saved[table] = get_saved_rules(module, ip_version, table)
+            tables.append(table)
+        chain_rules = saved[table].setdefault(params['chain'], {})
+
+        rule = construct_rule(params)
+        key = canonical_rule(rule, ip_version)
+        should_be_present = (params['state'] == 'present')
+        rule_is_present = chain_rules.get(key, 0) > 0
+        # A rule is never added without iptables -C agreeing it is missing,
+        # iptables-save may have printed it differently than we normalized it
+        if (
+                not rule_is_present and
+                (should_be_present or needs_live_check(params, ip_version)) and
+                check_present(iptables_path, module, params)):
+            rule_is_present = True
+            chain_rules[key] = 1
+
+        changed = (rule_is_present != should_be_present)
+        results.append(dict(
+            table=table,
+            chain=params['chain'],
+            rule=' '.join(rule),
+            state=params['state'],
+            changed=changed,
+        ))
+        if not changed:
+            continue
+
+        if should_be_present:
+            chain_rules[key] = chain_rules.get(key, 0) + 1
+            if params['action'] == 'insert':
+                command = ['-I', params['chain'], '1']
+            else:
+                command = ['-A', params['chain']]
+        else:
+            chain_rules[key] -= 1
+            command = ['-D', params['chain']]
+        changes.setdefault(table, []).append(command + rule)
+
+    if changes and not module.check_mode:
+        lines = []
+        for table in tables:
+            if table not in changes:
+                continue
+            lines.append('*%s' % table)
+            for command in changes[table]:
+                lines.append(' '.join(quote_restore_arg(arg) for arg in command))
+            lines.append('COMMIT')
+        iptables_restore_path = module.get_bin_path(RESTORE_BINS[ip_version], True)
+        module.run_command([iptables_restore_path, '--noflush'], data='\n'.join(lines) + '\n', check_rc=True)
+
+    return results
+
+
 def main():
     module = AnsibleModule(
         supports_check_mode=True,
@@ -497,10 +818,13 @@ def main():
                 default=None,
                 type='str',
                 choices=['ACCEPT', 'DROP', 'QUEUE', 'RETURN']),
+            rules=dict(required=False, default=None, type='list'),
         ),
         mutually_exclusive=(
             ['set_dscp_mark', 'set_dscp_mark_class'],
             ['flush', 'policy'],
+            ['rules', 'flush'],
+            ['rules', 'policy'],
         ),
     )
     args = dict(
@@ -517,6 +841,19 @@ def main():
     ip_version = module.params['ip_version']
     iptables_path = module.get_bin_path(BINS[ip_version], True)
 
+    # Converge a list of rules in one transaction
+    if module.params['rules'] is not None:
+        results = apply_rules(iptables_path, module, ip_version, module.params['rules'])
+        changed = False
+        for result in results:
+            if result['changed']:
+                changed = True
+                break
+        module.exit_json(
+            changed=changed,
+            ip_version=ip_version,
+            results=results)
+
     # Check if chain option is required
     if args['flush'] is False and args['chain'] is None:
         module.fail_json(
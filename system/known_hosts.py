@@ -30,20 +30,31 @@ description:
    - The M(known_hosts) module lets you add or remove a host keys from the C(known_hosts) file.
    - Starting at Ansible 2.2, multiple entries per host are allowed, but only one for each key type supported by ssh.
      This is useful if you're going to want to use the M(git) module over ssh, for example.
-   - If you have a very large number of host keys to manage, you will find the M(template) module more useful.
+   - If you have a large number of host keys to manage, pass them all at once with I(keys); they are applied
+     in a single rewrite of the file.
 version_added: "1.9"
 options:
   name:
     aliases: [ 'host' ]
     description:
       - The host to add or remove (must match a host specified in key)
-    required: true
+      - Required unless I(keys) is given.
+    required: false
     default: null
   key:
     description:
       - The SSH public host key, as a string (required if state=present, optional when state=absent, in which case all keys for the host are removed). The key must be in the right format for ssh (see sshd(1), section "SSH_KNOWN_HOSTS FILE FORMAT")
     required: false
     default: null
+  keys:
+    description:
+      - A list of dicts with C(name), C(key) and optionally C(state) and C(hash_host) keys, to add or remove
+        many host keys in one task. C(state) and C(hash_host) default to the module level options.
+      - All entries are applied to the file in a single atomic rewrite.
+      - Mutually exclusive with I(name).
+    required: false
+    default: null
+    version_added: "2.3"
   path:
     description:
       - The known_hosts file to edit
@@ -52,6 +63,8 @@ options:
   hash_host:
     description:
       - Hash the hostname in the known_hosts file
+      - Like C(ssh-keygen -H), a key listing several comma separated hosts is
+        written as one hashed line per host.
     required: no
     default: no
     version_added: "2.3"
@@ -71,6 +84,18 @@ EXAMPLES = '''
     path: /etc/ssh/ssh_known_hosts
     name: foo.com.invalid
     key: "{{ lookup('file', 'pubkeys/foo.com.invalid') }}"
+
+- name: add the keys of a whole fleet in one pass
+  known_hosts:
+    path: /etc/ssh/ssh_known_hosts
+    hash_host: yes
+    keys:
+      - name: web1.example.com
+        key: "web1.example.com ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIB..."
+      - name: web2.example.com
+        key: "web2.example.com ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIC..."
+      - name: old.example.com
+        state: absent
 '''
 
 # Makes sure public host keys are present or absent in the given known_hosts
@@ -80,6 +105,7 @@ EXAMPLES = '''
 # =========
 #    name = hostname whose key should be added (alias: host)
 #    key = line(s) to add to known_hosts file
+#    keys = list of name/key/state/hash_host dicts to apply in one go
 #    path = the known_hosts file to edit (default: ~/.ssh/known_hosts)
 #    hash_host = yes|no (default: no) hash the hostname in the known_hosts file
 #    state = absent|present (default: present)
@@ -88,10 +114,151 @@ import os
 import os.path
 import tempfile
 import errno
-import re
+import base64
+import fnmatch
+import hmac
+
+try:
+    from hashlib import sha1 as HASH_SHA1
+except ImportError:
+    # Python 2.4, where hmac takes the digest module itself
+    import sha as HASH_SHA1
 from ansible.module_utils.pycompat24 import get_exception
+from ansible.module_utils._text import to_bytes, to_native
 from ansible.module_utils.basic import *
 
+HASH_MAGIC = '|1|'
+
+
+def hash_host_name(host, salt=None):
+    """Hash host the way ssh-keygen -H does: |1|base64(salt)|base64(HMAC-SHA1(salt, host))"""
+    if salt is None:
+        salt = os.urandom(20)
+    digest = hmac.new(salt, to_bytes(host), HASH_SHA1).digest()
+    return HASH_MAGIC + to_native(base64.b64encode(salt)) + '|' + to_native(base64.b64encode(digest))
+
+
+def match_host_field(field, host):
+    """Check whether host matches the host field of a known_hosts line.
+
+    The field is either a hashed host or a comma separated list of
+    patterns, which may use the '*' and '?' wildcards and be negated with '!'.
+    """
+    if field.startswith(HASH_MAGIC):
+        try:
+            salt, digest = field[len(HASH_MAGIC):].split('|')
+            salt = base64.b64decode(salt)
+            digest = base64.b64decode(digest)
+        except (ValueError, TypeError):
+            return False
+        return hmac.new(salt, to_bytes(host), HASH_SHA1).digest() == digest
+
+    host = host.lower()
+    matched = False
+    for pattern in field.lower().split(','):
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        if '*' in pattern or '?' in pattern:
+            # only '*' and '?' are wildcards in known_hosts, so the
+            # brackets of [host]:port entries must stay literal
+            matches = fnmatch.fnmatchcase(host, pattern.replace('[', '[[]'))
+        else:
+            matches = pattern == host
+        if matches:
+            if negate:
+                return False
+            matched = True
+    return matched
+
+
+class KnownHosts(object):
+    """In-memory copy of a known_hosts file, indexed by host.
+
+    Plain host names are looked up in a dict; hashed hosts and wildcard
+    patterns have to be matched one by one, which is done natively with
+    HMAC-SHA1 instead of forking ssh-keygen for every lookup.
+    Lines are kept verbatim so that rewriting the file only touches the
+    entries that were actually added, replaced or removed.
+    """
+
+    def __init__(self, lines=None):
+        self.lines = []
+        self.entries = {}
+        self.names = {}
+        self.patterns = []
+        self.changed = False
+        for line in lines or []:
+            self._append(line)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            f = open(path, 'r')
+        except IOError:
+            e = get_exception()
+            if e.errno == errno.ENOENT:
+                return cls()
+            raise
+        try:
+            return cls(f.readlines())
+        finally:
+            f.close()
+
+    def _append(self, line):
+        if not line.endswith('\n'):
+            line += '\n'
+        lnum = len(self.lines)
+        self.lines.append(line)
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            return
+        try:
+            entry = normalize_known_hosts_key(stripped)
+        except IndexError:
+            return
+        self.entries[lnum] = entry
+
+        field = entry['host']
+        if field.startswith(HASH_MAGIC) or '*' in field or '?' in field or '!' in field:
+            self.patterns.append(lnum)
+        else:
+            for name in field.lower().split(','):
+                self.names.setdefault(name, []).append(lnum)
+
+    def find(self, host):
+        """Return the line numbers of all entries matching host, in file order."""
+        found = [lnum for lnum in self.names.get(host.lower(), []) if self.lines[lnum] is not None]
+        for lnum in self.patterns:
+            if self.lines[lnum] is not None and match_host_field(self.entries[lnum]['host'], host):
+                found.append(lnum)
+        return sorted(found)
+
+    def add(self, line):
+        self._append(line)
+        self.changed = True
+
+    def replace(self, lnum, line):
+        self.remove(lnum)
+        self.add(line)
+
+    def remove(self, lnum):
+        self.lines[lnum] = None
+        self.changed = True
+
+    def write(self, module, path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        f = os.fdopen(fd, 'w')
+        try:
+            for line in self.lines:
+                if line is not None:
+                    f.write(line)
+        finally:
+            f.close()
+        module.atomic_move(tmp_path, path)
+
+
 def enforce_state(module, params):
     """
     Add or remove key.
@@ -99,175 +266,134 @@ def enforce_state(module, params):
 
     host = params["name"]
     key = params.get("key",None)
-    port = params.get("port",None)
     path = params.get("path")
     hash_host = params.get("hash_host")
     state = params.get("state")
-    #Find the ssh-keygen binary
-    sshkeygen = module.get_bin_path("ssh-keygen",True)
+    keys = params.get("keys")
 
-    # Trailing newline in files gets lost, so re-add if necessary
-    if key and key[-1] != '\n':
-        key+='\n'
-
-    if key is None and state != "absent":
-        module.fail_json(msg="No key specified when adding a host")
-
-    sanity_check(module,host,key,sshkeygen)
-
-    found,replace_or_add,found_line,key=search_for_host_key(module,host,key,hash_host,path,sshkeygen)
+    if keys is None:
+        keys = [dict(name=host, key=key, state=state, hash_host=hash_host)]
 
-    #We will change state if found==True & state!="present"
-    #or found==False & state=="present"
-    #i.e found XOR (state=="present")
-    #Alternatively, if replace is true (i.e. key present, and we must change it)
-    if module.check_mode:
-        module.exit_json(changed = replace_or_add or (state=="present") != found)
-
-    #Now do the work.
+    try:
+        known_hosts = KnownHosts.load(path)
+    except IOError:
+        e = get_exception()
+        module.fail_json(msg="Failed to read %s: %s" % (path,str(e)))
+
+    results = []
+    for item in keys:
+        if not isinstance(item, dict) or not item.get('name'):
+            module.fail_json(msg="Each entry of keys must be a dict with at least a name")
+        item_state = item.get('state') or state
+        if item_state not in ('present', 'absent'):
+            module.fail_json(msg="Invalid state %s for host %s" % (item_state, item['name']))
+        item_hash = item.get('hash_host')
+        if item_hash is None:
+            item_hash = hash_host
+        else:
+            item_hash = module.boolean(item_hash)
 
-    #Only remove whole host if found and no key provided
-    if found and key is None and state=="absent":
-        module.run_command([sshkeygen,'-R',host,'-f',path], check_rc=True)
-        params['changed'] = True
+        changed = update_host_key(module, known_hosts, item['name'], item.get('key'), item_state, item_hash)
+        results.append(dict(name=item['name'], state=item_state, changed=changed))
 
-    #Next, add a new (or replacing) entry
-    if replace_or_add or found != (state=="present"):
-        try:
-            inf=open(path,"r")
-        except IOError:
-            e = get_exception()
-            if e.errno == errno.ENOENT:
-                inf=None
-            else:
-                module.fail_json(msg="Failed to read %s: %s" % \
-                                     (path,str(e)))
+    if known_hosts.changed and not module.check_mode:
         try:
-            outf=tempfile.NamedTemporaryFile(dir=os.path.dirname(path))
-            if inf is not None:
-                for line_number, line in enumerate(inf, start=1):
-                    if found_line==line_number and (replace_or_add or state=='absent'):
-                        continue # skip this line to replace its key
-                    outf.write(line)
-                inf.close()
-            if state == 'present':
-                outf.write(key)
-            outf.flush()
-            module.atomic_move(outf.name,path)
+            known_hosts.write(module, path)
         except (IOError,OSError):
             e = get_exception()
             module.fail_json(msg="Failed to write to file %s: %s" % \
                                  (path,str(e)))
 
-        try:
-            outf.close()
-        except:
-            pass
+    params['changed'] = known_hosts.changed
+    if params.get("keys") is not None:
+        params['results'] = results
+    return params
 
-        params['changed'] = True
+def update_host_key(module, known_hosts, host, key, state, hash_host):
+    """
+    Add, replace or remove the key of host in known_hosts. Returns whether
+    anything was changed.
+    """
 
-    return params
+    # Trailing newline in files gets lost, so re-add if necessary
+    if key and key[-1] != '\n':
+        key+='\n'
 
-def sanity_check(module,host,key,sshkeygen):
-    '''Check supplied key is sensible
+    if key is None and state != "absent":
+        module.fail_json(msg="No key specified when adding host %s" % host)
 
-    host and key are parameters provided by the user; If the host
-    provided is inconsistent with the key supplied, then this function
-    quits, providing an error to the user.
-    sshkeygen is the path to ssh-keygen, found earlier with get_bin_path
-    '''
-    #If no key supplied, we're doing a removal, and have nothing to check here.
+    new_key = sanity_check(module,host,key)
+    found_lines = known_hosts.find(host)
+
+    #Only remove whole host if no key provided
     if key is None:
-        return
-    #Rather than parsing the key ourselves, get ssh-keygen to do it
-    #(this is essential for hashed keys, but otherwise useful, as the
-    #key question is whether ssh-keygen thinks the key matches the host).
+        for lnum in found_lines:
+            known_hosts.remove(lnum)
+        return len(found_lines) > 0
+
+    if state == 'absent':
+        for lnum in found_lines:
+            found_key = known_hosts.entries[lnum]
+            if found_key.get('options') == new_key.get('options') and found_key['type'] == new_key['type']:
+                known_hosts.remove(lnum)
+                return True
+        return False
+
+    if hash_host and not new_key['host'].startswith(HASH_MAGIC):
+        # like ssh-keygen -H, write one hashed line per host name or address
+        lines = []
+        for alias in new_key['host'].split(','):
+            lines.append((alias, key.replace(new_key['host'], hash_host_name(alias), 1)))
+    else:
+        lines = [(host, key)]
 
-    #The approach is to write the key to a temporary file,
-    #and then attempt to look up the specified host in that file.
-    try:
-        outf=tempfile.NamedTemporaryFile()
-        outf.write(key)
-        outf.flush()
-    except IOError:
-        e = get_exception()
-        module.fail_json(msg="Failed to write to temporary file %s: %s" % \
-                             (outf.name,str(e)))
-    rc,stdout,stderr=module.run_command([sshkeygen,'-F',host,
-                                         '-f',outf.name],
-                                        check_rc=True)
-    try:
-        outf.close()
-    except:
-        pass
+    changed = False
+    for alias, line in lines:
+        if alias != host:
+            found_lines = known_hosts.find(alias)
+        changed |= set_host_key(known_hosts, found_lines, new_key, line, hash_host)
+    return changed
 
-    if stdout=='': #host not found
-        module.fail_json(msg="Host parameter does not match hashed host field in supplied key")
+def set_host_key(known_hosts, found_lines, new_key, line, hash_host):
+    """
+    Make line the entry for the key type of new_key among found_lines.
+    """
+    for lnum in found_lines:
+        found_key = known_hosts.entries[lnum]
+        if found_key.get('options') != new_key.get('options') or found_key['type'] != new_key['type']:
+            continue
 
-def search_for_host_key(module,host,key,hash_host,path,sshkeygen):
-    '''search_for_host_key(module,host,key,path,sshkeygen) -> (found,replace_or_add,found_line)
+        if found_key['key'] == new_key['key'] and \
+                (not hash_host or found_key['host'].startswith(HASH_MAGIC)):
+            return False #found exactly the same key, don't replace
 
-    Looks up host and keytype in the known_hosts file path; if it's there, looks to see
-    if one of those entries matches key. Returns:
-    found (Boolean): is host found in path?
-    replace_or_add (Boolean): is the key in path different to that supplied by user?
-    found_line (int or None): the line where a key of the same type was found
-    if found=False, then replace is always False.
-    sshkeygen is the path to ssh-keygen, found earlier with get_bin_path
-    '''
-    if os.path.exists(path)==False:
-        return False, False, None, key
+        # found a different key for the same key type, or the host needs hashing
+        known_hosts.replace(lnum, line)
+        return True
 
-    sshkeygen_command=[sshkeygen,'-F',host,'-f',path]
+    known_hosts.add(line)
+    return True
 
-    #openssh >=6.4 has changed ssh-keygen behaviour such that it returns
-    #1 if no host is found, whereas previously it returned 0
-    rc,stdout,stderr=module.run_command(sshkeygen_command,
-                                 check_rc=False)
-    if stdout=='' and stderr=='' and (rc==0 or rc==1):
-        return False, False, None, key #host not found, no other errors
-    if rc!=0: #something went wrong
-        module.fail_json(msg="ssh-keygen failed (rc=%d,stdout='%s',stderr='%s')" % (rc,stdout,stderr))
+def sanity_check(module,host,key):
+    '''Check supplied key is sensible
 
-    #If user supplied no key, we don't want to try and replace anything with it
+    host and key are parameters provided by the user; If the host
+    provided is inconsistent with the key supplied, then this function
+    quits, providing an error to the user. Returns the normalized key.
+    '''
+    #If no key supplied, we're doing a removal, and have nothing to check here.
     if key is None:
-        return True, False, None, key
+        return None
 
-    lines=stdout.split('\n')
-    new_key = normalize_known_hosts_key(key)
+    try:
+        new_key = normalize_known_hosts_key(key)
+    except IndexError:
+        module.fail_json(msg="Invalid key specified for host %s" % host)
 
-    sshkeygen_command.insert(1,'-H')
-    rc,stdout,stderr=module.run_command(sshkeygen_command,check_rc=False)
-    if rc!=0: #something went wrong
-        module.fail_json(msg="ssh-keygen failed to hash host (rc=%d,stdout='%s',stderr='%s')" % (rc,stdout,stderr))
-    hashed_lines=stdout.split('\n')
+    if not match_host_field(new_key['host'], host):
+        module.fail_json(msg="Host parameter does not match hashed host field in supplied key")
 
-    for lnum,l in enumerate(lines):
-        if l=='':
-            continue
-        elif l[0]=='#': # info output from ssh-keygen; contains the line number where key was found
-            try:
-                # This output format has been hardcoded in ssh-keygen since at least OpenSSH 4.0
-                # It always outputs the non-localized comment before the found key
-                found_line = int(re.search(r'found: line (\d+)', l).group(1))
-            except IndexError:
-                e = get_exception()
-                module.fail_json(msg="failed to parse output of ssh-keygen for line number: '%s'" % l)
-        else:
-            found_key = normalize_known_hosts_key(l)
-            if hash_host==True:
-                if found_key['host'][:3]=='|1|':
-                    new_key['host']=found_key['host']
-                else:
-                    hashed_host=normalize_known_hosts_key(hashed_lines[lnum])
-                    found_key['host']=hashed_host['host']
-                key=key.replace(host,found_key['host'])
-            if new_key==found_key: #found a match
-                return True, False, found_line, key #found exactly the same key, don't replace
-            elif new_key['type'] == found_key['type']: # found a different key for the same key type
-                return True, True, found_line, key
-    #No match found, return found and replace, but no line
-    return True, True, None, key
+    return new_key
 
 def normalize_known_hosts_key(key):
     '''
@@ -279,7 +405,7 @@ def normalize_known_hosts_key(key):
     absent in known_hosts files)
     '''
     k=key.strip() #trim trailing newline
-    k=key.split()
+    k=k.split()
     d = dict()
     #The optional "marker" field, used for @cert-authority or @revoked
     if k[0][0] == '@':
@@ -297,12 +423,15 @@ def main():
 
     module = AnsibleModule(
         argument_spec = dict(
-            name      = dict(required=True,  type='str', aliases=['host']),
+            name      = dict(required=False,  type='str', aliases=['host']),
             key       = dict(required=False,  type='str'),
+            keys      = dict(required=False,  type='list'),
             path      = dict(default="~/.ssh/known_hosts", type='path'),
             hash_host = dict(required=False, type='bool' ,default=False),
             state     = dict(default='present', choices=['absent','present']),
             ),
+        required_one_of = [['name', 'keys']],
+        mutually_exclusive = [['name', 'keys']],
         supports_check_mode = True
         )
 
@@ -116,6 +116,34 @@ options:
       - the number of old releases to keep when cleaning. Used in C(finalize) and C(clean). Any unfinished builds
         will be deleted first, so only correct releases will count. The current version will not count.
 
+  link_previous:
+    required: False
+    default: False
+    version_added: "2.3"
+    description:
+      - Seed the new release folder during C(state=present) with hard links to every file of the release the
+        'current' symlink points to (like C(cp -al) or rsync's C(--link-dest)). Unchanged files then take no extra
+        disk space and need not be copied again.
+      - Only use this with tools that replace files instead of writing into them (rsync and the M(synchronize),
+        M(copy) and M(unarchive) modules do), otherwise the previous release would be modified as well.
+
+  cleanup_threads:
+    required: False
+    default: 1
+    version_added: "2.3"
+    description:
+      - Number of old releases deleted in parallel when cleaning. Used in C(finalize) and C(clean).
+      - Values greater than 1 require Python 2.6 or later on the target.
+
+  background_cleanup:
+    required: False
+    default: False
+    version_added: "2.3"
+    description:
+      - Instead of deleting old and unfinished releases before returning, move them into a trash folder next to
+        the releases folder (a rename, which is instant) and delete them in a detached background process.
+        Used in C(finalize) and C(clean).
+
 notes:
   - Facts are only returned for C(state=query) and C(state=present). If you use both, you should pass any overridden
     parameters to both calls, otherwise the second call will overwrite the facts of the first one.
@@ -174,6 +202,15 @@ procedure to remove it during cleanup.
     repo: 'git://foosball.example.org/path/to/repo.git'
     dest: '{{ deploy_helper.new_release_path }}'
     version: 'v1.1.1'
+- name: Alternatively, seed the new release with hard links to the current one and only sync the changes
+  deploy_helper:
+    path: /path/to/root
+    release: '{{ deploy_helper.new_release }}'
+    link_previous: True
+- synchronize:
+    src: build/
+    dest: '{{ deploy_helper.new_release_path }}'
+    delete: yes
 - name: Add an unfinished file, to allow cleanup on successful finalize
   file:
     path: '{{ deploy_helper.new_release_path }}/{{ deploy_helper.unfinished_filename }}'
@@ -270,6 +307,13 @@ procedure to remove it during cleanup.
     state: clean
     keep_releases: 10
 
+# Switching releases without waiting for the old ones to be deleted from disk:
+- deploy_helper:
+    path: /path/to/root
+    release: '{{ deploy_helper.new_release }}'
+    state: finalize
+    background_cleanup: True
+
 # Removing the entire project root folder
 - deploy_helper:
     path: /path/to/root
@@ -286,6 +330,9 @@ procedure to remove it during cleanup.
 from ansible.module_utils.basic import *
 from ansible.module_utils.pycompat24 import get_exception
 
+import errno
+import subprocess
+
 class DeployHelper(object):
 
     def __init__(self, module):
@@ -303,6 +350,12 @@ class DeployHelper(object):
         self.shared_path         = module.params['shared_path']
         self.state               = module.params['state']
         self.unfinished_filename = module.params['unfinished_filename']
+        self.link_previous       = module.params['link_previous']
+        self.cleanup_threads     = module.params['cleanup_threads']
+        self.background_cleanup  = module.params['background_cleanup']
+
+        # releases queued for deletion by delete_release
+        self.doomed_releases     = []
 
     def gather_facts(self):
         current_path   = os.path.join(self.path, self.current_path)
@@ -347,6 +400,114 @@ class DeployHelper(object):
 
         return True
 
+    def delete_release(self, path):
+        """
+        Like delete_path, but the deletion is postponed until delete_releases
+        is called, so that several releases can be deleted at once.
+        """
+        if not os.path.lexists(path):
+            return False
+
+        if not os.path.isdir(path):
+            self.module.fail_json(msg="%s exists but is not a directory" % path)
+
+        self.doomed_releases.append(path)
+
+        return True
+
+    def delete_releases(self, releases_path):
+        """
+        Delete the releases queued by delete_release, either in parallel
+        or, with background_cleanup, by moving them to a trash folder and
+        deleting them from a detached process.
+        """
+        doomed, self.doomed_releases = self.doomed_releases, []
+
+        if self.module.check_mode or not doomed:
+            return
+
+        if self.background_cleanup:
+            trash_path = os.path.join(os.path.dirname(os.path.normpath(releases_path)),
+                                      '.' + os.path.basename(os.path.normpath(releases_path)) + '.trash')
+            try:
+                os.makedirs(trash_path)
+            except OSError:
+                e = get_exception()
+                if e.errno != errno.EEXIST:
+                    self.module.fail_json(msg="cannot create %s: %s" % (trash_path, str(e)))
+
+            for path in doomed:
+                trashed = os.path.join(trash_path, '%s.%s' % (os.path.basename(path), time.time()))
+                try:
+                    os.rename(path, trashed)
+                except OSError:
+                    e = get_exception()
+                    if e.errno != errno.EXDEV:
+                        self.module.fail_json(msg="cannot move %s to %s: %s" % (path, trash_path, str(e)))
+                    # not on the same filesystem, delete it right away
+                    self.delete_path(path)
+
+            devnull = open(os.devnull, 'r+')
+            subprocess.Popen([self.module.get_bin_path('rm', True), '-rf', trash_path],
+                             stdin=devnull, stdout=devnull, stderr=devnull,
+                             close_fds=True, preexec_fn=os.setsid)
+            devnull.close()
+            return
+
+        if self.cleanup_threads > 1:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(self.cleanup_threads, len(doomed)))
+            try:
+                errors = [error for error in pool.map(_rmtree, doomed) if error]
+            finally:
+                pool.close()
+                pool.join()
+            if errors:
+                self.module.fail_json(msg="rmtree failed: %s" % '; '.join(errors))
+        else:
+            for path in doomed:
+                self.delete_path(path)
+
+    def seed_release(self, previous_release_path, new_release_path):
+        """
+        Populate a new release with hard links to the files of the previous
+        one, recreating directories and symlinks.
+        """
+        if not previous_release_path or not os.path.isdir(previous_release_path):
+            return False
+
+        if os.path.normpath(previous_release_path) == os.path.normpath(new_release_path):
+            return False
+
+        if os.path.lexists(new_release_path):
+            return False
+
+        if self.module.check_mode:
+            return True
+
+        try:
+            for dirpath, dirnames, filenames in os.walk(previous_release_path):
+                # os.walk paths always start with the top directory
+                relative_path = dirpath[len(previous_release_path):].lstrip(os.sep)
+                target_dir = os.path.normpath(os.path.join(new_release_path, relative_path))
+                os.mkdir(target_dir)
+                shutil.copystat(dirpath, target_dir)
+
+                for name in dirnames + filenames:
+                    source = os.path.join(dirpath, name)
+                    if os.path.islink(source):
+                        os.symlink(os.readlink(source), os.path.join(target_dir, name))
+                        if name in dirnames:
+                            # os.walk does not follow symlinks to directories
+                            dirnames.remove(name)
+                    elif name in filenames and name != self.unfinished_filename:
+                        os.link(source, os.path.join(target_dir, name))
+        except (IOError, OSError):
+            e = get_exception()
+            self.module.fail_json(msg="failed to seed %s from %s: %s" % (new_release_path, previous_release_path, str(e)))
+
+        return True
+
     def create_path(self, path):
         changed = False
 
@@ -410,7 +571,7 @@ class DeployHelper(object):
                 if self.module.check_mode:
                     changes += 1
                 else:
-                    changes += self.delete_path(os.path.join(releases_path, release))
+                    changes += self.delete_release(os.path.join(releases_path, release))
 
         return changes
 
@@ -428,19 +589,24 @@ class DeployHelper(object):
         changes = 0
 
         if os.path.lexists(releases_path):
-            releases = [ f for f in os.listdir(releases_path) if os.path.isdir(os.path.join(releases_path,f)) ]
+            releases = [ f for f in os.listdir(releases_path) if os.path.isdir(os.path.join(releases_path,f))
+                         and os.path.join(releases_path,f) not in self.doomed_releases ]
             try:
                 releases.remove(reserve_version)
             except ValueError:
                 pass
 
             if not self.module.check_mode:
-                releases.sort( key=lambda x: os.path.getctime(os.path.join(releases_path,x)), reverse=True)
-                for release in releases[self.keep_releases:]:
-                    changes += self.delete_path(os.path.join(releases_path, release))
+                # stat every release only once
+                releases = [ (os.path.getctime(os.path.join(releases_path, f)), f) for f in releases ]
+                releases.sort(reverse=True)
+                for ctime, release in releases[self.keep_releases:]:
+                    changes += self.delete_release(os.path.join(releases_path, release))
             elif len(releases) > self.keep_releases:
                 changes += (len(releases) - self.keep_releases)
 
+        self.delete_releases(releases_path)
+
         return changes
 
     def _get_file_args(self, path):
@@ -458,6 +624,17 @@ class DeployHelper(object):
 
         return previous_release, previous_release_path
 
+def _rmtree(path):
+    """
+    shutil.rmtree for a ThreadPool, returning the error instead of raising it
+    """
+    try:
+        shutil.rmtree(path, ignore_errors=False)
+    except Exception:
+        e = get_exception()
+        return "%s: %s" % (path, str(e))
+    return None
+
 def main():
 
     module = AnsibleModule(
@@ -470,6 +647,9 @@ def main():
             keep_releases       = dict(required=False, type='int', default=5),
             clean               = dict(required=False, type='bool', default=True),
             unfinished_filename = dict(required=False, type='str', default='DEPLOY_UNFINISHED'),
+            link_previous       = dict(required=False, type='bool', default=False),
+            cleanup_threads     = dict(required=False, type='int', default=1),
+            background_cleanup  = dict(required=False, type='bool', default=False),
             state               = dict(required=False, choices=['present', 'absent', 'clean', 'finalize', 'query'], default='present')
         ),
         add_file_common_args = True,
@@ -494,6 +674,8 @@ def main():
         changes += deploy_helper.create_path(facts['releases_path'])
         if deploy_helper.shared_path:
             changes += deploy_helper.create_path(facts['shared_path'])
+        if deploy_helper.link_previous:
+            changes += deploy_helper.seed_release(facts['previous_release_path'], facts['new_release_path'])
 
         result['ansible_facts'] = { 'deploy_helper': facts }
 
@@ -22,6 +22,7 @@
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.pycompat24 import get_exception
 from ansible.module_utils.urls import fetch_url
+from ansible.module_utils.urls import open_url
 from ansible.module_utils.urls import url_argument_spec
 import base64
 import hashlib
@@ -30,6 +31,7 @@ import os
 import tempfile
 import time
 import urllib
+from multiprocessing.pool import ThreadPool
 
 
 ANSIBLE_METADATA = {'status': ['preview'],
@@ -62,9 +64,31 @@ options:
     description:
       - File mode applied on versioned plugins.
   name:
-    required: true
+    required: false
     description:
       - Plugin name.
+      - Required unless I(plugins) is given.
+  plugins:
+    required: false
+    default: null
+    version_added: '2.3'
+    description:
+      - List of plugins to install in a single task. Items are either plugin
+        names or dicts with a C(name) and an optional C(version) key.
+      - The installed plugins are listed once, the dependencies are resolved
+        from a single read of the update centre index and the plugin files
+        are downloaded in parallel into the I(jenkins_home) plugins directory.
+      - The plugin files are written directly and not deployed through the
+        update centre, so Jenkins must be restarted before they are loaded.
+        The module returns I(restart_required) for this purpose.
+      - Only C(present) and C(latest) states are supported with this option.
+      - Mutually exclusive with I(name).
+  download_threads:
+    required: false
+    default: 4
+    version_added: '2.3'
+    description:
+      - Number of plugins downloaded in parallel when I(plugins) is used.
   owner:
     required: false
     default: jenkins
@@ -96,6 +120,9 @@ options:
       - Number of seconds after which a new copy of the I(update-center.json)
         file is downloaded. This is used to avoid the need to download the
         plugin to calculate its checksum when C(latest) is specified.
+      - The file is stored as a compact index with one line per plugin in
+        I(~/.ansible/tmp/jenkins-plugin-index), so looking up a plugin
+        doesn't require to parse the whole update centre data.
       - Set it to C(0) if no cache file should be used. In that case, the
         plugin file will always be downloaded to calculate its checksum when
         C(latest) is specified.
@@ -181,6 +208,22 @@ EXAMPLES = '''
     name: token-macro
     state: disabled
 
+- name: Install many plugins and their dependencies at once
+  jenkins_plugin:
+    plugins:
+      - git
+      - workflow-aggregator
+      - name: token-macro
+        version: 1.15
+    state: latest
+  register: my_jenkins_plugins_list
+
+- name: Restart Jenkins to load the plugins installed from the list
+  service:
+    name: jenkins
+    state: restarted
+  when: my_jenkins_plugins_list.restart_required
+
 - name: Uninstall plugin
   jenkins_plugin:
     name: build-pipeline-plugin
@@ -297,6 +340,16 @@ plugin:
     returned: success
     type: string
     sample: build-pipeline-plugin
+plugins:
+    description: names of the plugins installed or updated, including dependencies
+    returned: when plugins is used
+    type: list
+    sample: ["git", "git-client", "scm-api"]
+restart_required:
+    description: whether Jenkins must be restarted to load the plugins written to disk
+    returned: when plugins is used
+    type: bool
+    sample: true
 state:
     description: state of the target, after execution
     returned: success
@@ -305,6 +358,11 @@ state:
 '''
 
 
+UPDATES_DIR = os.path.expanduser('~/.ansible/tmp')
+UPDATES_INDEX = 'jenkins-plugin-index'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
 class JenkinsPlugin(object):
     def __init__(self, module):
         # To be able to call fail_json
@@ -318,6 +376,9 @@ class JenkinsPlugin(object):
         # Crumb
         self.crumb = {}
 
+        # Update centre index, loaded on demand
+        self.updates_index = None
+
         if self._csrf_enabled():
             self.crumb = self._get_crumb()
 
@@ -392,22 +453,25 @@ class JenkinsPlugin(object):
         if 'plugins' not in plugins_data:
             self.module.fail_json(msg="No valid plugin data found.")
 
+        # Index the installed plugins by name
+        self.installed_plugins = dict(
+            (p['shortName'], p) for p in plugins_data['plugins'])
+
         # Create final list of installed/pined plugins
         self.is_installed = False
         self.is_pinned = False
         self.is_enabled = False
 
-        for p in plugins_data['plugins']:
-            if p['shortName'] == self.params['name']:
-                self.is_installed = True
+        p = self.installed_plugins.get(self.params['name'])
 
-                if p['pinned']:
-                    self.is_pinned = True
+        if p is not None:
+            self.is_installed = True
 
-                if p['enabled']:
-                    self.is_enabled = True
+            if p['pinned']:
+                self.is_pinned = True
 
-                break
+            if p['enabled']:
+                self.is_enabled = True
 
     def install(self):
         changed = False
@@ -501,7 +565,7 @@ class JenkinsPlugin(object):
                         changed = True
             else:
                 # Check for update from the updates JSON file
-                plugin_data = self._download_updates()
+                plugin_data = self._get_plugin_data(self.params['name'])
 
                 try:
                     sha1_old = hashlib.sha1(open(plugin_file, 'rb').read())
@@ -539,99 +603,324 @@ class JenkinsPlugin(object):
 
         return changed
 
-    def _download_updates(self):
-        updates_filename = 'jenkins-plugin-cache.json'
-        updates_dir = os.path.expanduser('~/.ansible/tmp')
-        updates_file = "%s/%s" % (updates_dir, updates_filename)
-        download_updates = True
+    def _get_updates_index(self):
+        """
+        Return a dict mapping each plugin name to its (still serialized)
+        entry of the update centre. The index is cached on disk and only
+        rebuilt when it's older than updates_expiration.
+        """
+        if self.updates_index is not None:
+            return self.updates_index
 
-        # Check if we need to download new updates file
-        if os.path.isfile(updates_file):
-            # Get timestamp when the file was changed last time
-            ts_file = os.stat(updates_file).st_mtime
-            ts_now = time.time()
+        index_file = os.path.join(UPDATES_DIR, UPDATES_INDEX)
 
-            if ts_now - ts_file < self.params['updates_expiration']:
-                download_updates = False
+        if (
+                not os.path.isfile(index_file) or
+                time.time() - os.stat(index_file).st_mtime >=
+                self.params['updates_expiration']):
+            self._build_updates_index(index_file)
 
-        updates_file_orig = updates_file
+        try:
+            f = open(index_file)
+        except IOError:
+            e = get_exception()
+            self.module.fail_json(
+                msg="Cannot open the updates index file.",
+                details=str(e))
 
-        # Download the updates file if needed
-        if download_updates:
-            url = "%s/update-center.json" % self.params['updates_url']
+        # Only split the lines, the entries are parsed on lookup
+        self.updates_index = {}
 
-            # Get the data
-            r = self._get_url_data(
-                url,
-                msg_status="Remote updates not found.",
-                msg_exception="Updates download failed.")
+        for line in f:
+            name, _, entry = line.rstrip('\n').partition('\t')
+            self.updates_index[name] = entry
 
-            # Write the updates file
-            updates_file = tempfile.mkstemp()
+        f.close()
 
-            try:
-                fd = open(updates_file, 'wb')
-            except IOError:
-                e = get_exception()
-                self.module.fail_json(
-                    msg="Cannot open the tmp updates file %s." % updates_file,
-                    details=str(e))
+        return self.updates_index
+
+    def _build_updates_index(self, index_file):
+        url = "%s/update-center.json" % self.params['updates_url']
+
+        # Get the data
+        r = self._get_url_data(
+            url,
+            msg_status="Remote updates not found.",
+            msg_exception="Updates download failed.")
 
-            fd.write(r.read())
+        # The JSON data are on the second line of the file
+        lines = r.read().splitlines()
 
+        try:
+            data = json.loads(lines[1])
+        except Exception:
+            e = get_exception()
+            self.module.fail_json(
+                msg="Cannot load JSON data from the updates file.",
+                details=str(e))
+
+        if 'plugins' not in data:
+            self.module.fail_json(
+                msg="Cannot find plugin data in the updates file.")
+
+        # Make sure the destination directory exists
+        if not os.path.isdir(UPDATES_DIR):
             try:
-                fd.close()
-            except IOError:
+                os.makedirs(UPDATES_DIR, int('0700', 8))
+            except OSError:
                 e = get_exception()
                 self.module.fail_json(
-                    msg="Cannot close the tmp updates file %s." % updates_file,
-                    detail=str(e))
+                    msg="Cannot create temporal directory.",
+                    details=str(e))
+
+        # Write one line per plugin with only the fields we need
+        fd, tmp_file = tempfile.mkstemp(dir=UPDATES_DIR)
 
-        # Open the updates file
         try:
-            f = open(updates_file)
-        except IOError:
+            f = os.fdopen(fd, 'w')
+
+            for name in sorted(data['plugins']):
+                plugin = data['plugins'][name]
+                entry = {
+                    'version': plugin.get('version'),
+                    'sha1': plugin.get('sha1'),
+                    'url': plugin.get('url'),
+                    'dependencies': [
+                        {
+                            'name': d['name'],
+                            'optional': d.get('optional', False)
+                        } for d in plugin.get('dependencies', [])],
+                }
+                f.write("%s\t%s\n" % (
+                    name, json.dumps(entry, separators=(',', ':'))))
+
+            f.close()
+        except (IOError, OSError):
             e = get_exception()
             self.module.fail_json(
-                msg="Cannot open temporal updates file.",
+                msg="Cannot write the updates index file %s." % tmp_file,
                 details=str(e))
 
-        i = 0
-        for line in f:
-            # Read only the second line
-            if i == 1:
-                try:
-                    data = json.loads(line)
-                except Exception:
-                    e = get_exception()
-                    self.module.fail_json(
-                        msg="Cannot load JSON data from the tmp updates file.",
-                        details=e.message)
+        self.module.atomic_move(tmp_file, index_file)
 
-                break
+    def _get_plugin_data(self, name):
+        index = self._get_updates_index()
 
-            i += 1
+        # Check if we have the plugin data available
+        if name not in index:
+            self.module.fail_json(
+                msg="Cannot find plugin data in the updates file.",
+                plugin=name)
+
+        return json.loads(index[name])
+
+    def install_plugins(self, plugins):
+        """
+        Install a list of plugins, resolving their dependencies from the
+        update centre index and downloading the missing or outdated plugin
+        files in parallel. Returns the list of changed plugins.
+        """
+        # Check if the plugin directory exists
+        if not os.path.isdir(self.params['jenkins_home']):
+            self.module.fail_json(
+                msg="Jenkins home directory doesn't exist.")
 
-        # Move the updates file to the right place if we could read it
-        if download_updates:
-            # Make sure the destination directory exists
-            if not os.path.isdir(updates_dir):
-                try:
-                    os.makedirs(updates_dir, int('0700', 8))
-                except OSError:
-                    e = get_exception()
-                    self.module.fail_json(
-                        msg="Cannot create temporal directory.",
-                        details=e.message)
+        wanted = []
+        versions = {}
 
-            self.module.atomic_move(updates_file, updates_file_orig)
+        for item in plugins:
+            if isinstance(item, dict):
+                name = item.get('name')
+                version = item.get('version', self.params['version'])
+            else:
+                name = item
+                version = self.params['version']
 
-        # Check if we have the plugin data available
-        if 'plugins' not in data or self.params['name'] not in data['plugins']:
+            if not name:
+                self.module.fail_json(
+                    msg="Each item of plugins needs a name.", item=item)
+
+            if name not in versions:
+                wanted.append(name)
+
+            versions[name] = version is not None and str(version) or None
+
+        # Resolve the dependencies of the unversioned plugins
+        if self.params['with_dependencies']:
+            i = 0
+
+            while i < len(wanted):
+                name = wanted[i]
+                i += 1
+
+                if versions[name] not in [None, 'latest']:
+                    continue
+
+                for dep in self._get_plugin_data(name)['dependencies']:
+                    if (
+                            not dep['optional'] and
+                            dep['name'] not in versions and
+                            dep['name'] not in self.installed_plugins):
+                        wanted.append(dep['name'])
+                        versions[dep['name']] = None
+
+        downloads = []
+
+        for name in wanted:
+            version = versions[name]
+            installed = self.installed_plugins.get(name)
+            plugin_file = self._find_plugin_file(name)
+
+            if version not in [None, 'latest']:
+                # Take specific version
+                if installed is not None and installed['version'] == version:
+                    continue
+
+                plugin_url = (
+                    "{0}/download/plugins/"
+                    "{1}/{2}/{1}.hpi".format(
+                        self.params['updates_url'], name, version))
+                sha1sum = None
+            elif version is None:
+                # Any installed version will do
+                if installed is not None:
+                    continue
+
+                plugin_url = "%s/latest/%s.hpi" % (
+                    self.params['updates_url'], name)
+                sha1sum = self._get_plugin_data(name)['sha1']
+            else:
+                # Take latest version
+                plugin_data = self._get_plugin_data(name)
+
+                if installed is not None:
+                    if os.path.isfile(plugin_file):
+                        if self._sha1sum(plugin_file) == plugin_data['sha1']:
+                            continue
+                    elif installed['version'] == plugin_data['version']:
+                        # No plugin file to compare with (e.g. bundled)
+                        continue
+
+                plugin_url = "%s/latest/%s.hpi" % (
+                    self.params['updates_url'], name)
+                sha1sum = plugin_data['sha1']
+
+            downloads.append((name, plugin_url, sha1sum, plugin_file))
+
+        if self.module.check_mode or not downloads:
+            return [d[0] for d in downloads]
+
+        # Download all plugins in parallel
+        pool = ThreadPool(
+            max(1, min(self.params['download_threads'], len(downloads))))
+
+        try:
+            results = pool.map(self._fetch_plugin, downloads)
+        finally:
+            pool.close()
+            pool.join()
+
+        errors = [r for r in results if r[1] is None]
+
+        for name, tmp_file, error in results:
+            if tmp_file is not None and errors:
+                os.remove(tmp_file)
+
+        if errors:
             self.module.fail_json(
-                msg="Cannot find plugin data in the updates file.")
+                msg="Plugin download failed.",
+                details=dict((name, error) for name, _, error in errors))
+
+        # Move the files onto the right place
+        for (name, tmp_file, _), download in zip(results, downloads):
+            plugin_file = download[3]
+            self.module.atomic_move(tmp_file, plugin_file)
 
-        return data['plugins'][self.params['name']]
+            params = {
+                'dest': plugin_file
+            }
+            params.update(self.params)
+            file_args = self.module.load_file_common_arguments(params)
+            self.module.set_fs_attributes_if_different(file_args, True)
+
+        return [name for name, _, _ in results]
+
+    def _find_plugin_file(self, name):
+        """
+        Return the path of the installed plugin file, which can have either
+        the .jpi or the .hpi extension. Defaults to the .jpi file.
+        """
+        jpi_file = '%s/plugins/%s.jpi' % (self.params['jenkins_home'], name)
+        hpi_file = '%s/plugins/%s.hpi' % (self.params['jenkins_home'], name)
+
+        if not os.path.isfile(jpi_file) and os.path.isfile(hpi_file):
+            return hpi_file
+
+        return jpi_file
+
+    def _fetch_plugin(self, download):
+        """
+        Download a plugin into a temporary file next to its final location,
+        verifying its checksum on the fly. Runs in a worker thread, so it
+        downloads with open_url, which raises exceptions instead of failing
+        the module like fetch_url does, and returns the errors.
+        Returns a (name, tmp_file, error) tuple.
+        """
+        name, plugin_url, sha1sum, plugin_file = download
+
+        try:
+            response = open_url(
+                plugin_url,
+                timeout=self.timeout,
+                validate_certs=self.params['validate_certs'],
+                use_proxy=self.params['use_proxy'],
+                http_agent=self.params['http_agent'],
+                url_username=self.params['url_username'],
+                url_password=self.params['url_password'],
+                force_basic_auth=self.params['force_basic_auth'])
+        except Exception:
+            e = get_exception()
+            return (name, None, "Plugin download from %s failed: %s" % (
+                plugin_url, str(e)))
+
+        try:
+            fd, tmp_file = tempfile.mkstemp(
+                dir=os.path.dirname(plugin_file))
+            f = os.fdopen(fd, 'wb')
+            sha1 = hashlib.sha1()
+
+            data = response.read(DOWNLOAD_CHUNK_SIZE)
+
+            while data:
+                sha1.update(data)
+                f.write(data)
+                data = response.read(DOWNLOAD_CHUNK_SIZE)
+
+            f.close()
+        except Exception:
+            e = get_exception()
+            return (name, None, str(e))
+
+        if (
+                sha1sum is not None and
+                base64.b64encode(sha1.digest()).decode('ascii') != sha1sum):
+            os.remove(tmp_file)
+            return (name, None, "Checksum mismatch of %s" % plugin_url)
+
+        return (name, tmp_file, None)
+
+    def _sha1sum(self, plugin_file):
+        sha1 = hashlib.sha1()
+        f = open(plugin_file, 'rb')
+        data = f.read(DOWNLOAD_CHUNK_SIZE)
+
+        while data:
+            sha1.update(data)
+            data = f.read(DOWNLOAD_CHUNK_SIZE)
+
+        f.close()
+
+        return base64.b64encode(sha1.digest()).decode('ascii')
 
     def _download_plugin(self, plugin_url):
         # Download the plugin
@@ -750,8 +1039,10 @@ def main():
         group=dict(default='jenkins'),
         jenkins_home=dict(default='/var/lib/jenkins'),
         mode=dict(default='0644', type='raw'),
-        name=dict(required=True),
+        name=dict(),
         owner=dict(default='jenkins'),
+        plugins=dict(type='list'),
+        download_threads=dict(default=4, type='int'),
         params=dict(type='dict'),
         state=dict(
             choices=[
@@ -775,6 +1066,8 @@ def main():
     module = AnsibleModule(
         argument_spec=argument_spec,
         add_file_common_args=True,
+        required_one_of=[['name', 'plugins']],
+        mutually_exclusive=[['name', 'plugins']],
         supports_check_mode=True,
     )
 
@@ -811,6 +1104,19 @@ def main():
     # Instantiate the JenkinsPlugin object
     jp = JenkinsPlugin(module)
 
+    # Install a list of plugins at once
+    if module.params['plugins'] is not None:
+        if state != 'present':
+            module.fail_json(
+                msg="Only the present and latest states are supported "
+                    "with plugins.")
+
+        changed_plugins = jp.install_plugins(module.params['plugins'])
+        module.exit_json(
+            changed=len(changed_plugins) > 0, plugins=changed_plugins,
+            restart_required=len(changed_plugins) > 0,
+            state=module.params['state'])
+
     # Perform action depending on the requested state
     if state == 'present':
         changed = jp.install()